@@ -1,156 +1,443 @@
-from flask import Flask, request
+import time
+# Startup is timed from here: imports and setup, then background loading
+# until the server is ready (see /readyz)
+startup_started = time.perf_counter()
+
+from flask import Flask, Response, request
 from flask_cors import CORS
 import eventlet
 import socketio
 import os
+import threading
 from dotenv import load_dotenv
-import whisper
-import google.generativeai as genai
-import json
 from audio_processor import AudioProcessor
 from bible_service import bible_service
+from reference_parser import ReferenceParser, CHAPTER_COUNTS
+from reference_tracker import ReferenceTracker, format_passage
+from semantic_index import SemanticIndex
+from llm_references import extract_references_llm
+from transcription_session import TranscriptionSession
+from vad import SpeechGate, create_vad
+from cache import create_cache
+from message_queue import create_client_manager
+from inference_pool import InferenceExecutor, JobDropped
+from batch_scheduler import BatchScheduler
+from asr_backends import create_backend
+from metrics import (
+    registry, stage_seconds, chunks_total, errors_total, dropped_total, utterances_total, references_total
+)
+from eventlet import tpool
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+load_dotenv()
+
+# Configure logging. DEBUG also logs every incoming chunk.
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+flask_app = Flask(__name__)
+CORS(flask_app)
+# With several worker processes (serve.py), emits are shared through a
+# message queue so any worker can reach any client
+message_queue_url = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+sio = socketio.Server(
+    cors_allowed_origins='*',
+    client_manager=create_client_manager(message_queue_url) if message_queue_url else None
+)
+app = socketio.WSGIApp(sio, flask_app)
+
+# Speech recognition backend and model size come from config. The model loads
+# in a background thread so the server accepts connections right away;
+# transcription waits for it.
+asr_backend = create_backend(
+    os.getenv('ASR_BACKEND', 'whisper'),
+    model_size=os.getenv('WHISPER_MODEL', 'large'),
+    device=os.getenv('ASR_DEVICE') or None,
+    quantize=os.getenv('ASR_QUANTIZE', 'false').lower() in ('1', 'true', 'yes')
+)
+asr_backend.load_async()
+
+# Gemini is only used by the optional LLM fallback, and google.generativeai
+# is slow to import, so the model is created on first use
+model = None
+llm_fallback_enabled = os.getenv('REFERENCE_LLM_FALLBACK', 'false').lower() in ('1', 'true', 'yes')
+
+def get_llm_model():
+    global model
+    if model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv('GOOGLE_AI_KEY'))
+        created = genai.GenerativeModel('gemini-pro')
+        # Keep a model set while this one was importing (e.g. a benchmark stub)
+        if model is None:
+            model = created
+    return model
+
+# Local reference grammar built from the book tables
+reference_parser = ReferenceParser(bible_service.book_names, bible_service.book_abbreviations)
+
+# The same phrases come up again and again in a sermon; keep their extracted
+# references (including LLM answers) keyed by normalized transcript text.
+reference_cache = create_cache(
+    'references',
+    maxsize=int(os.getenv('REFERENCE_CACHE_SIZE', 2048)),
+    ttl=float(os.getenv('REFERENCE_CACHE_TTL', 3600)),
+    shared=True
+)
+
+# Semantic retrieval of verses quoted or paraphrased without a citation, from
+# an index built offline (python semantic_index.py). The sentence model loads
+# in the background; until it is ready, uncited quotes are skipped.
+semantic_index = None
+semantic_index_path = os.getenv('SEMANTIC_INDEX', os.path.join(os.path.dirname(__file__), 'verses.emb'))
+semantic_min_score = float(os.getenv('SEMANTIC_MIN_SCORE', 0.6))
+if semantic_index_path and os.path.exists(semantic_index_path):
+    semantic_index = SemanticIndex.load(semantic_index_path, nprobe=int(os.getenv('SEMANTIC_NPROBE', 16)))
+    threading.Thread(target=semantic_index.warm_up, name='semantic-loader', daemon=True).start()
+
+# Streaming transcription state per socket session
+sessions = {}
+
+# Passages each client has already been sent; only new and extended ones go out
+reference_trackers = {}
+reference_window_size = int(os.getenv('REFERENCE_WINDOW_SIZE', 8))
+reference_window_seconds = float(os.getenv('REFERENCE_WINDOW_SECONDS', 300))
+chapter_counts = {name: CHAPTER_COUNTS.get(book_id) for book_id, name in bible_service.book_names.items()}
+
+# Silence gating in front of the ASR engine: 'energy' (built in) or 'webrtc'
+vad_backend = os.getenv('VAD_BACKEND', 'energy')
+vad_energy_threshold = float(os.getenv('VAD_ENERGY_THRESHOLD', 0.01))
+vad_hangover_ms = int(os.getenv('VAD_HANGOVER_MS', 600))
+
+# Optional micro-batching: windows from several sessions arriving within
+# WHISPER_BATCH_WAIT_MS share one batched forward pass.
+batch_size = int(os.getenv('WHISPER_BATCH_SIZE', 1))
+batch_scheduler = None
+if batch_size > 1 and not asr_backend.supports_batching:
+    logger.warning(f"ASR backend {asr_backend} does not support batching, ignoring WHISPER_BATCH_SIZE")
+    batch_size = 1
+if batch_size > 1:
+    batch_scheduler = BatchScheduler(
+        asr_backend.decode_batch,
+        max_batch=batch_size,
+        max_wait_ms=float(os.getenv('WHISPER_BATCH_WAIT_MS', 20))
+    )
+    batch_scheduler.start()
 
-app = Flask(__name__)
-CORS(app)
-sio = socketio.Server(cors_allowed_origins='*')
-app = socketio.WSGIApp(sio, app)
+# Whisper runs on a native thread behind a fair, bounded queue so the eventlet
+# hub keeps serving other sockets while a chunk is transcribed. With batching,
+# enough workers run concurrently to fill a batch.
+inference = InferenceExecutor(
+    workers=max(int(os.getenv('INFERENCE_WORKERS', 1)), batch_size),
+    max_queue=int(os.getenv('INFERENCE_MAX_QUEUE', 32))
+)
+inference.start()
 
-# Initialize Whisper model (we'll load it only once)
-logger.info("Loading Whisper model...")
-whisper_model = whisper.load_model("large")
-logger.info("Whisper model loaded successfully")
+def readiness():
+    """Which of the parts needed to serve transcriptions have finished loading"""
+    return {
+        'asr': asr_backend.ready.is_set() and asr_backend.load_error is None,
+        'verses': bible_service.verses_ready.is_set(),
+    }
 
-# Configure Gemini
-genai.configure(api_key=os.getenv('GOOGLE_AI_KEY'))
-model = genai.GenerativeModel('gemini-pro')
+# Seconds from startup_started: 'import' once this module has run, 'ready'
+# once readiness() first passes
+startup_seconds = registry.gauge('bible_app_startup_seconds', 'Time from process start to each startup phase', labels=('phase',))
+startup = {'import_seconds': None, 'ready_seconds': None}
 
-def process_audio_chunk(audio_data):
-    logger.debug("Processing audio chunk...")
-    processed_audio = AudioProcessor.process_base64_audio(audio_data)
-    if processed_audio is not None:
+def warm_up():
+    """Background startup: preload the optional models, then record when the server became ready.
+
+    Readiness only depends on the ASR model and the verses; an optional
+    warmup that fails is logged and the server starts without it.
+    """
+    if llm_fallback_enabled:
         try:
-            logger.debug("Running Whisper transcription...")
-            result = whisper_model.transcribe(processed_audio)
-            logger.info(f"Transcription result: {result['text']}")
-            return result["text"]
-        except Exception as e:
-            logger.error(f"Error transcribing audio: {e}")
-    else:
-        logger.error("Failed to process audio data")
-    return None
+            get_llm_model()
+        except Exception:
+            logger.exception("Preloading the LLM fallback failed, it will be created on first use")
+    asr_backend.ready.wait()
+    bible_service.verses_ready.wait()
+    if not all(readiness().values()):
+        logger.error(f"Startup failed, not ready: {readiness()}")
+        return
+    startup['ready_seconds'] = time.perf_counter() - startup_started
+    startup_seconds.set(startup['ready_seconds'], phase='ready')
+    warmup = f"{asr_backend.warmup_seconds:.1f}s" if asr_backend.warmup_seconds is not None else 'skipped'
+    logger.info(
+        f"Ready in {startup['ready_seconds']:.1f}s: imports and setup {startup['import_seconds']:.1f}s, "
+        f"ASR load {asr_backend.load_seconds:.1f}s, warmup {warmup}"
+    )
 
-def extract_bible_references(text):
+registry.gauge('bible_app_sessions', 'Connected socket sessions', fn=lambda: len(sessions))
+registry.gauge('bible_app_inference_queue_depth', 'Inference jobs waiting for a worker', fn=lambda: inference.depth)
+registry.gauge('bible_app_ready', 'Whether the server is ready to transcribe', fn=lambda: int(all(readiness().values())))
+
+@flask_app.route('/metrics')
+def metrics():
+    return Response(registry.render(), content_type=registry.content_type)
+
+@flask_app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving requests, models may still be loading"""
+    return {'status': 'ok'}
+
+@flask_app.route('/readyz')
+def readyz():
+    """Readiness: 200 once ASR and the verses are loaded, 503 until then"""
+    checks = readiness()
+    ready = all(checks.values())
+    body = {'ready': ready, 'checks': checks, 'startup': startup}
+    if semantic_index is not None:
+        body['semantic_index'] = semantic_index.ready.is_set()
+    return body, 200 if ready else 503
+
+def transcribe_audio(audio, prompt=None):
     try:
-        logger.debug(f"Extracting Bible references from: {text}")
-        prompt = f"""Extract all Bible references from the text. Return ONLY valid Bible references in JSON format.
-        Text: {text}
-        Return format:
-        {{"references": [
-            {{"book": "BookName", "chapter": Number, "verse": Number}}
-        ]}}
-        Rules:
-        1. Handle both formal ("John 3:16") and informal ("John chapter 3 verse 16") formats
-        2. Convert ordinal words to numbers ("First John" → "1 John")
-        3. Handle chapter and verse mentioned separately ("reading from Genesis chapter one verse one")
-        4. Use proper book name format ("1 John" not "First John" or "1st John")
-        
-        Examples:
-        - "John 3:16" → {{"references": [{{"book": "John", "chapter": 3, "verse": 16}}]}}
-        - "First John chapter 2 verse 15" → {{"references": [{{"book": "1 John", "chapter": 2, "verse": 15}}]}}
-        - "reading from Genesis chapter one verse one" → {{"references": [{{"book": "Genesis", "chapter": 1, "verse": 1}}]}}
-        - "Second Chronicles 7:14" → {{"references": [{{"book": "2 Chronicles", "chapter": 7, "verse": 14}}]}}
-        - "Third John verse 4" → {{"references": [{{"book": "3 John", "chapter": 1, "verse": 4}}]}}
-        
-        Note: If no valid Bible reference is found, return an empty references array.
-        """
-        response = model.generate_content(prompt)
-        try:
-            result = json.loads(response.text)
-            logger.info(f"Extracted references: {result}")
-            return result
-        except json.JSONDecodeError:
-            # If the response isn't valid JSON, try to extract just the JSON part
-            import re
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if json_match:
-                result = json.loads(json_match.group())
-                logger.info(f"Extracted references (after cleanup): {result}")
-                return result
-            logger.warning("No valid references found in text")
-            return {"references": []}
+        logger.debug(f"Running Whisper transcription on {len(audio) / 16000:.2f}s of audio...")
+        with stage_seconds.time(stage='asr', backend=asr_backend.name):
+            if batch_scheduler is not None:
+                text = batch_scheduler.transcribe(audio, prompt)
+            else:
+                text = asr_backend.transcribe(audio, prompt)
+        logger.debug(f"Transcription result: {text}")
+        return text
     except Exception as e:
-        logger.error(f"Error extracting references: {e}")
-        return {"references": []}
+        errors_total.inc(stage='asr')
+        logger.error(f"Error transcribing audio: {e}")
+        return None
+
+def create_session():
+    if vad_backend == 'energy':
+        vad = create_vad(vad_backend, energy_threshold=vad_energy_threshold)
+    else:
+        vad = create_vad(vad_backend)
+    return TranscriptionSession(transcribe_audio, gate=SpeechGate(vad, hangover_ms=vad_hangover_ms))
+
+def create_tracker():
+    return ReferenceTracker(reference_window_size, reference_window_seconds, chapter_counts)
+
+def process_audio_chunk(sid, samples, trace_id=None):
+    session = sessions.get(sid)
+    if session is None:
+        # Chunk handled after the client disconnected
+        logger.debug(f"Dropping audio for disconnected client {sid}")
+        return []
+    dropped_before = session.dropped_samples
+    with stage_seconds.time(stage='vad', backend=vad_backend):
+        queued = session.enqueue(samples, trace_id)
+    if session.dropped_samples > dropped_before:
+        dropped_total.inc((session.dropped_samples - dropped_before) / session.sample_rate, kind='speech_seconds')
+    if not queued:
+        # Only silence so far, nothing for the model to do
+        return []
+    try:
+        # Coalesces into this session's queued job if it has one; that job
+        # will pick up the chunk we just enqueued.
+        return inference.run(sid, session.feed_pending, key='audio') or []
+    except JobDropped:
+        dropped_total.inc(kind='jobs')
+        logger.warning(f"Dropped stale audio job for {sid}, client is outrunning the model")
+        return []
+
+def extract_bible_references(text):
+    key = ' '.join(text.lower().split()).strip('.,!?;')
+    with stage_seconds.time(stage='extract', backend='cache') as labels:
+        result = reference_cache.get(key)
+        if result is None:
+            labels['backend'], result = _extract_bible_references(text)
+            if 'error' in result:
+                # Don't remember a failed LLM call, the next mention should retry it
+                errors_total.inc(stage='extract')
+            else:
+                reference_cache.set(key, result)
+    return result
+
+def _extract_bible_references(text):
+    """(backend, result): the local grammar first, then the LLM if enabled"""
+    logger.debug(f"Extracting Bible references from: {text}")
+    # Relative references ("verse 17") are resolved per session by its ReferenceTracker
+    references = reference_parser.parse(text, relative=True)
+    if references:
+        return 'grammar', {"references": references}
+    # Only pay for an LLM round trip when a book is named but the grammar
+    # could not make sense of the rest of the reference.
+    if llm_fallback_enabled and reference_parser.mentions_book(text):
+        return 'llm', tpool.execute(lambda: extract_references_llm(get_llm_model(), text))
+    return 'grammar', {"references": []}
+
+def find_quoted_verses(text, book=None, limit=2):
+    """References to verses text quotes or paraphrases, best first (book: search only that book id)"""
+    if semantic_index is None or not semantic_index.ready.is_set():
+        return []
+    with stage_seconds.time(stage='semantic', backend='book' if book else 'ivf'):
+        hits = tpool.execute(semantic_index.search, text, limit, book)
+    return [
+        {
+            'book': bible_service.book_names.get(hit['book_id']), 'chapter': hit['chapter'],
+            'verse': hit['verse'], 'end_verse': None, 'source': 'quoted'
+        }
+        for hit in hits if hit['score'] >= semantic_min_score
+    ]
+
+def get_bible_verses(changes, text=''):
+    with stage_seconds.time(stage='lookup', backend='store' if bible_service.verse_store else 'sqlite'):
+        return _get_bible_verses(changes, text)
 
-def get_bible_verses(references):
-    verses = []
+def _get_bible_verses(changes, text=''):
+    """Verses not yet sent for each changed passage from a ReferenceTracker"""
     translations = ['kjv', 'asv', 'web', 'ylt', 'bbe']  # Try multiple translations
-    
-    for ref in references:
-        logger.debug(f"Looking up verse: {ref}")
-        verse = None
-        # Try each translation until we find the verse
-        for translation in translations:
-            verse = bible_service.get_verse(
-                book=ref['book'],
-                chapter=ref['chapter'],
-                verse=ref['verse'],
-                translation=translation
-            )
-            if verse:
-                logger.info(f"Found verse in {translation}: {verse}")
-                verses.append(verse)
-                break
-        
-        if not verse:
-            logger.warning(f"No exact match found for {ref}, trying text search")
-            # If no exact match found, try searching
-            search_results = bible_service.search_text(ref['book'])
-            if search_results:
-                verses.extend(search_results[:1])  # Add the first matching verse
-                logger.info(f"Found similar verse: {search_results[0]}")
-    
+    lookups = []
+    owners = []
+    for index, change in enumerate(changes):
+        for start, end in change['spans']:
+            # Whole-chapter references start at the first verse
+            lookups.append({'book': change['book'], 'chapter': change['chapter'], 'verse': start or 1, 'end_verse': end})
+            owners.append(index)
+    verses = [[] for _ in changes]
+
+    # One lookup for every reference and translation
+    for index, passage in zip(owners, bible_service.get_verses(lookups, translations)):
+        if passage['verses']:
+            logger.info(f"Found {format_passage(changes[index])} in {passage['translation']} ({len(passage['verses'])} verses)")
+            verses[index].extend(passage['verses'])
+
+    for change, found in zip(changes, verses):
+        if found or change['status'] != 'added':
+            continue
+        # No such verse, usually a misheard number: look in the same book for
+        # the verse the speaker actually quoted
+        book_id = bible_service.resolve_book(change['book'])
+        quoted = find_quoted_verses(text, book_id, limit=1) if book_id else []
+        if not quoted:
+            logger.warning(f"No verse found for {format_passage(change)}")
+            continue
+        found.extend(bible_service.get_verses(quoted, translations)[0]['verses'])
+        logger.info(f"No verse found for {format_passage(change)}, the transcript quotes {format_passage(quoted[0])}")
+
     return verses
 
 @sio.on('connect')
 def connect(sid, environ):
     logger.info(f'Client connected: {sid}')
+    sessions[sid] = create_session()
+    reference_trackers[sid] = create_tracker()
 
 @sio.on('disconnect')
 def disconnect(sid):
-    logger.info(f'Client disconnected: {sid}')
+    session = sessions.pop(sid, None)
+    tracker = reference_trackers.pop(sid, None)
+    inference.cancel_session(sid)
+    logger.info(f'Client disconnected: {sid} {session.stats() if session else ""}')
+    if tracker is not None:
+        logger.info(f'References: {tracker.stats()}')
+    logger.info(f'Inference queue: {inference.stats()}')
+    if batch_scheduler is not None:
+        logger.info(f'Whisper batching: {batch_scheduler.stats()}')
+    logger.info(f'Caches: {dict(bible_service.cache_stats(), references=reference_cache.stats())}')
 
-@sio.on('audio_data')
-def handle_audio_data(sid, data):
-    logger.debug(f'Received audio data from {sid}')
-    # Process incoming audio data
-    transcript = process_audio_chunk(data)
-    if transcript:
-        logger.info(f"Transcript: {transcript}")
+def emit(event, data, sid):
+    with stage_seconds.time(stage='emit', backend='socketio'):
+        sio.emit(event, data, room=sid)
+
+def emit_transcripts(sid, events):
+    for event in events:
+        transcript = event['text']
+        trace_id = event.get('trace_id')
+        if event['type'] == 'partial':
+            emit('transcription_partial', {'text': transcript, 'trace_id': trace_id}, sid)
+            continue
+
+        started = time.perf_counter()
         # Extract references
         result = extract_bible_references(transcript)
-        logger.info(f"Extracted references: {result}")
-        # Fetch actual verses
-        verses = get_bible_verses(result['references'])
-        logger.info(f"Found verses: {verses}")
-        # Send back transcript and verses
+        tracker = reference_trackers.get(sid)
+        if tracker is None:
+            # The client disconnected while this utterance was being transcribed
+            logger.debug(f"Dropping transcripts for disconnected client {sid}")
+            return
+        references = result['references']
+        if not references:
+            # Nothing cited; the speaker may be quoting a verse anyway
+            references = find_quoted_verses(transcript)
+        duplicates = tracker.duplicates
+        changes = tracker.update(references)
+        references_total.inc(tracker.duplicates - duplicates, status='duplicate')
+        for change in changes:
+            references_total.inc(status=change['status'])
+        extracted = time.perf_counter()
+        # Fetch only the verses the client doesn't have yet
+        found = get_bible_verses(changes, transcript)
+        looked_up = time.perf_counter()
+        # Send back the transcript and what changed: 'added' passages carry
+        # their verses, 'updated' ones (same id, longer range) only the new verses
+        passages = [
+            {
+                'id': change['id'], 'status': change['status'], 'source': change['source'],
+                'reference': format_passage(change), 'verses': verses
+            }
+            for change, verses in zip(changes, found)
+        ]
+        verses = [verse for passage in passages for verse in passage['verses']]
         response_data = {
-            'text': transcript, 
-            'verses': verses
+            'text': transcript,
+            'verses': verses,
+            'passages': passages,
+            'final': True,
+            'trace_id': trace_id
         }
-        logger.debug(f"Sending response to client: {response_data}")
-        sio.emit('transcription', response_data, room=sid)
-    else:
-        logger.warning("No transcript generated from audio")
+        emit('transcription', response_data, sid)
+        utterances_total.inc()
+        logger.info(
+            f"[{trace_id}] {transcript!r}: {len(result['references'])} references, {len(changes)} changed, {len(verses)} verses; "
+            f"asr {event.get('asr_seconds', 0) * 1000:.0f} ms, extract {(extracted - started) * 1000:.1f} ms, "
+            f"lookup {(looked_up - extracted) * 1000:.1f} ms, emit {(time.perf_counter() - looked_up) * 1000:.1f} ms, "
+            f"end of speech -> transcript {event['latency'] * 1000:.0f} ms"
+        )
 
-if __name__ == '__main__':
+@sio.on('audio_data')
+def handle_audio_data(sid, data):
+    """Legacy transport: base64 data-URL chunks of 16kHz int16 PCM"""
+    logger.debug(f'Received audio data from {sid}')
+    chunks_total.inc(transport='base64')
+    with stage_seconds.time(stage='decode', backend='base64'):
+        samples = AudioProcessor.process_base64_audio(data)
+    if samples is None:
+        errors_total.inc(stage='decode')
+        logger.error("Failed to process audio data")
+        return
+    emit_transcripts(sid, process_audio_chunk(sid, samples))
+
+@sio.on('audio_pcm')
+def handle_audio_pcm(sid, data):
+    """Binary transport: raw int16 mono PCM bytes, or {'pcm': bytes, 'sample_rate': int, 'trace_id': str}"""
+    chunks_total.inc(transport='pcm')
+    try:
+        pcm, sample_rate, trace_id = AudioProcessor.pcm_payload(data)
+    except ValueError as e:
+        errors_total.inc(stage='decode')
+        logger.warning(f"Dropping malformed PCM frame from {sid}: {e}")
+        return
+    with stage_seconds.time(stage='decode', backend='pcm'):
+        samples = AudioProcessor.process_pcm16(pcm, sample_rate)
+    if samples is None:
+        errors_total.inc(stage='decode')
+        logger.error("Failed to process PCM audio")
+        return
+    emit_transcripts(sid, process_audio_chunk(sid, samples, trace_id))
+
+startup['import_seconds'] = time.perf_counter() - startup_started
+startup_seconds.set(startup['import_seconds'], phase='import')
+threading.Thread(target=warm_up, name='warmup', daemon=True).start()
+
+def main():
+    # Bind straight away: /healthz answers while the models are still loading
     port = int(os.getenv('PORT', 5001))
-    logger.info(f"Starting server on port {port}")
-    eventlet.wsgi.server(eventlet.listen(('', port)), app)
\ No newline at end of file
+    logger.info(
+        f"Starting server on port {port} after {time.perf_counter() - startup_started:.1f}s "
+        f"(worker {os.getenv('WORKER_ID', 0)}, pid {os.getpid()})"
+    )
+    eventlet.wsgi.server(eventlet.listen(('', port)), app)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
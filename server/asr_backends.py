@@ -0,0 +1,256 @@
+import logging
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_SIZES = ('tiny', 'base', 'small', 'medium', 'large')
+SAMPLE_RATE = 16000
+
+
+class ASRBackend:
+    """Speech recognition engine behind a common interface.
+
+    Models load in a background thread (``load_async``) so the server can
+    accept connections straight away, and run one dummy inference before
+    they count as ready; ``transcribe`` waits until then. Subclasses implement
+    ``_load`` and ``_transcribe``, and optionally ``decode_batch`` for the
+    BatchScheduler.
+    """
+
+    name = None
+    supports_batching = False
+
+    def __init__(self, model_size='base', device=None, quantize=False):
+        if model_size not in MODEL_SIZES:
+            raise ValueError(f"Unknown model size {model_size!r}, expected one of {MODEL_SIZES}")
+        self.model_size = model_size
+        self.device = device
+        self.quantize = quantize
+        self.model = None
+        self.ready = threading.Event()
+        self.load_error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+
+    def __repr__(self):
+        return f"{self.name}:{self.model_size}{' int8' if self.quantize else ''}"
+
+    def load(self):
+        started = time.monotonic()
+        logger.info(f"Loading ASR backend {self}...")
+        try:
+            self._load()
+            self.load_seconds = time.monotonic() - started
+        except Exception as e:
+            self.load_error = e
+            logger.error(f"Failed to load ASR backend {self}: {e}")
+            self.ready.set()
+            raise
+        # The model works without the warmup, the first request just pays for it
+        try:
+            self.warm_up()
+            self.warmup_seconds = time.monotonic() - started - self.load_seconds
+        except Exception:
+            logger.exception(f"Warming up ASR backend {self} failed, continuing without it")
+        self.ready.set()
+        warmed = f", warmed up in {self.warmup_seconds:.1f}s" if self.warmup_seconds is not None else ''
+        logger.info(f"ASR backend {self} loaded in {self.load_seconds:.1f}s{warmed}")
+
+    def warm_up(self):
+        """Transcribe a second of silence, so the first real request doesn't pay for lazy setup"""
+        self._transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), None)
+
+    def load_async(self):
+        thread = threading.Thread(target=self._load_quietly, name='asr-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def _load_quietly(self):
+        try:
+            self.load()
+        except Exception:
+            pass
+
+    def wait_until_ready(self):
+        self.ready.wait()
+        if self.load_error is not None:
+            raise RuntimeError(f"ASR backend {self} failed to load: {self.load_error}")
+
+    def transcribe(self, audio, prompt=None):
+        """Transcribe float32 16kHz audio, waiting for the model if it is still loading"""
+        self.wait_until_ready()
+        return self._transcribe(audio, prompt)
+
+    def decode_batch(self, audios):
+        raise NotImplementedError(f"{self.name} does not support batched decoding")
+
+    def real_time_factor(self, audio, repeat=3):
+        """Processing time divided by audio duration (below 1.0 is faster than real time)"""
+        self.transcribe(audio)  # warm up
+        started = time.perf_counter()
+        for _ in range(repeat):
+            self.transcribe(audio)
+        elapsed = (time.perf_counter() - started) / repeat
+        return elapsed / (len(audio) / SAMPLE_RATE)
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _transcribe(self, audio, prompt):
+        raise NotImplementedError
+
+
+class WhisperBackend(ASRBackend):
+    """openai-whisper, optionally with int8 dynamic quantization of the Linear layers on CPU"""
+
+    name = 'whisper'
+    supports_batching = True
+
+    def _load(self):
+        import torch
+        import whisper
+
+        device = self.device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        model = whisper.load_model(self.model_size, device=device)
+        if self.quantize:
+            if device != 'cpu':
+                logger.warning("int8 dynamic quantization is CPU-only, keeping full precision on GPU")
+            else:
+                model = self._quantize(model)
+        self.model = model
+        self.device = device
+
+    @staticmethod
+    def _quantize(model):
+        """int8 dynamic quantization of every Linear layer, including whisper's own Linear subclass"""
+        import torch
+        import whisper
+        from torch.ao.nn.quantized.dynamic import Linear as DynamicQuantizedLinear
+
+        # quantize_dynamic matches module types exactly, and from_float only
+        # accepts torch.nn.Linear itself. whisper.model.Linear only differs in
+        # casting its weights to the input dtype, a no-op in fp32 on CPU.
+        for module in model.modules():
+            if type(module) is whisper.model.Linear:
+                module.__class__ = torch.nn.Linear
+        model = torch.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8,
+            mapping={torch.nn.Linear: DynamicQuantizedLinear},
+        )
+        quantized = sum(isinstance(module, DynamicQuantizedLinear) for module in model.modules())
+        if not quantized:
+            raise RuntimeError("int8 quantization left no quantized Linear layers in the whisper model")
+        logger.info(f"Quantized {quantized} Linear layers to int8")
+        return model
+
+    def _transcribe(self, audio, prompt):
+        result = self.model.transcribe(
+            audio, initial_prompt=prompt, condition_on_previous_text=False, fp16=self.device == 'cuda'
+        )
+        return result['text']
+
+    def decode_batch(self, audios):
+        """Run the encoder/decoder once over a stacked batch of mel spectrograms"""
+        import torch
+        import whisper
+
+        self.wait_until_ready()
+        options = whisper.DecodingOptions(fp16=self.device == 'cuda', without_timestamps=True)
+        mels = torch.stack([
+            whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)), self.model.dims.n_mels)
+            for audio in audios
+        ]).to(self.device)
+        with torch.no_grad():
+            results = whisper.decode(self.model, mels, options)
+        return [result.text for result in results]
+
+
+class FasterWhisperBackend(ASRBackend):
+    """CTranslate2-based faster-whisper; int8 compute when quantize is set"""
+
+    name = 'faster-whisper'
+
+    def _load(self):
+        from faster_whisper import WhisperModel
+
+        device = self.device or 'auto'
+        compute_type = 'int8' if self.quantize else 'default'
+        # faster-whisper names the largest model "large-v2"/"large-v3"
+        size = 'large-v2' if self.model_size == 'large' else self.model_size
+        self.model = WhisperModel(size, device=device, compute_type=compute_type)
+
+    def _transcribe(self, audio, prompt):
+        segments, _ = self.model.transcribe(
+            audio, initial_prompt=prompt, condition_on_previous_text=False, beam_size=1
+        )
+        return ''.join(segment.text for segment in segments)
+
+
+class RemoteBackend(ASRBackend):
+    """Hands audio to ASR worker processes (asr_worker.py) over the job queue at ASR_QUEUE.
+
+    The model size and device are the workers' business; this side only
+    waits for the reply, up to ASR_TIMEOUT seconds.
+    """
+
+    name = 'remote'
+
+    def __init__(self, model_size='base', device=None, quantize=False):
+        super().__init__(model_size, device, quantize)
+        self.url = os.getenv('ASR_QUEUE', 'local://127.0.0.1:6399')
+        self.timeout = float(os.getenv('ASR_TIMEOUT', 30))
+
+    def __repr__(self):
+        return f"{self.name}:{self.url}"
+
+    def _load(self):
+        from message_queue import connect_queue
+
+        self.model = connect_queue(self.url)
+
+    def warm_up(self):
+        # The model lives in the ASR workers, which warm up on their own
+        pass
+
+    def _transcribe(self, audio, prompt):
+        from message_queue import ASR_JOB_QUEUE
+
+        job_id = uuid.uuid4().hex
+        reply_to = f"asr:reply:{job_id}"
+        self.model.push(ASR_JOB_QUEUE, {
+            'id': job_id,
+            'reply_to': reply_to,
+            # float32 samples from the session's ring buffer
+            'audio': audio.tobytes(),
+            'prompt': prompt,
+            # Workers skip jobs nobody is waiting for any more
+            'deadline': time.time() + self.timeout,
+        })
+        reply = self.model.pop(reply_to, self.timeout)
+        self.model.discard(reply_to)
+        if reply is None:
+            raise TimeoutError(f"No ASR worker answered within {self.timeout:.0f}s")
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply['text']
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+    RemoteBackend.name: RemoteBackend,
+}
+
+
+def create_backend(name='whisper', model_size='base', device=None, quantize=False):
+    """Instantiate an ASR backend by name without loading its model"""
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown ASR backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return backend_class(model_size=model_size, device=device, quantize=quantize)
@@ -0,0 +1,111 @@
+"""ASR worker process: pulls transcription jobs off the shared queue and runs the model.
+
+Started by serve.py, or by hand on any machine that can reach the queue:
+
+    python asr_worker.py --queue redis://queue-host:6379/0 --backend faster-whisper --model small --quantize
+
+Socket workers (ASR_BACKEND=remote) push audio windows; any idle worker
+takes the next one, so adding workers adds transcription throughput. With
+--batch-size above 1, jobs already waiting are decoded together when the
+backend supports batching.
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+from asr_backends import MODEL_SIZES, BACKENDS, create_backend
+from message_queue import ASR_JOB_QUEUE, connect_queue
+
+logger = logging.getLogger(__name__)
+
+STATS_INTERVAL = 60.0
+# Replies outlive their job's deadline by this long before the queue deletes them
+REPLY_GRACE = 5.0
+
+
+def take_jobs(job_queue, batch_size, timeout=1.0):
+    """Wait for one job, then take up to batch_size - 1 more that are already queued"""
+    job = job_queue.pop(ASR_JOB_QUEUE, timeout)
+    if job is None:
+        return []
+    jobs = [job]
+    while len(jobs) < batch_size:
+        job = job_queue.pop(ASR_JOB_QUEUE, 0)
+        if job is None:
+            break
+        jobs.append(job)
+    return jobs
+
+
+def transcribe_jobs(backend, jobs):
+    audios = [np.frombuffer(job['audio'], dtype=np.float32) for job in jobs]
+    if len(jobs) > 1 and backend.supports_batching:
+        return backend.decode_batch(audios)
+    return [backend.transcribe(audio, job['prompt']) for audio, job in zip(audios, jobs)]
+
+
+def run(backend, job_queue, batch_size=1):
+    """Serve jobs until the process is stopped"""
+    backend.load()
+    done = expired = failed = 0
+    busy = 0.0
+    last_report = time.monotonic()
+    while True:
+        jobs = take_jobs(job_queue, batch_size)
+        now = time.time()
+        live = [job for job in jobs if job['deadline'] >= now]
+        expired += len(jobs) - len(live)
+
+        if live:
+            started = time.monotonic()
+            try:
+                replies = [{'text': text} for text in transcribe_jobs(backend, live)]
+            except Exception as e:
+                logger.error(f"Transcription failed for {len(live)} job(s): {e}")
+                replies = [{'error': str(e)}] * len(live)
+                failed += len(live)
+            busy += time.monotonic() - started
+            now = time.time()
+            for job, reply in zip(live, replies):
+                # A caller that gave up has discarded its reply queue; pushing
+                # would recreate it with nobody left to read or delete it
+                if job['deadline'] < now:
+                    expired += 1
+                    continue
+                job_queue.push(job['reply_to'], reply, ttl=job['deadline'] - now + REPLY_GRACE)
+                done += 1
+
+        elapsed = time.monotonic() - last_report
+        if elapsed >= STATS_INTERVAL:
+            logger.info(
+                f"ASR worker {os.getpid()}: {done} jobs, {expired} expired, {failed} failed, "
+                f"busy {busy / elapsed:.0%} over the last {elapsed:.0f}s"
+            )
+            done = expired = failed = 0
+            busy = 0.0
+            last_report = time.monotonic()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queue', default=os.getenv('ASR_QUEUE', 'local://127.0.0.1:6399'))
+    parser.add_argument('--backend', default=os.getenv('ASR_BACKEND', 'whisper'),
+                        choices=sorted(name for name in BACKENDS if name != 'remote'))
+    parser.add_argument('--model', default=os.getenv('WHISPER_MODEL', 'large'), choices=MODEL_SIZES)
+    parser.add_argument('--device', default=os.getenv('ASR_DEVICE') or None)
+    parser.add_argument('--quantize', action='store_true',
+                        default=os.getenv('ASR_QUANTIZE', 'false').lower() in ('1', 'true', 'yes'))
+    parser.add_argument('--batch-size', type=int, default=int(os.getenv('WHISPER_BATCH_SIZE', 1)))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+    backend = create_backend(args.backend, model_size=args.model, device=args.device, quantize=args.quantize)
+    logger.info(f"ASR worker {os.getpid()} serving {args.queue} with {backend}")
+    run(backend, connect_queue(args.queue), args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,39 +2,90 @@ import numpy as np
 import io
 import base64
 import wave
-import torch
+
+SAMPLE_RATE = 16000
+# int16 PCM -> float32 in [-1, 1)
+PCM_SCALE = np.float32(1.0 / 32768.0)
+# Sample rates a binary-transport client may declare
+MIN_SAMPLE_RATE, MAX_SAMPLE_RATE = 8000, 192000
 
 class AudioProcessor:
     @staticmethod
     def process_base64_audio(base64_audio):
         """Convert base64 audio data to format compatible with Whisper"""
         try:
-            # Decode base64 audio data
-            audio_data = base64.b64decode(base64_audio.split(',')[1])
-            
-            # Create in-memory wave file
-            wav_file = io.BytesIO()
-            with wave.open(wav_file, 'wb') as wav:
-                wav.setnchannels(1)  # Mono
-                wav.setsampwidth(2)  # 16-bit
-                wav.setframerate(16000)  # 16kHz
-                wav.writeframes(audio_data)
-            
-            # Convert to numpy array
-            wav_file.seek(0)
-            with wave.open(wav_file, 'rb') as wav:
-                audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
-                # Normalize to float32 range [-1, 1]
-                audio = audio.astype(np.float32) / 32768.0
-            
-            # Return numpy array for CPU processing
-            # The calling function will convert to tensor if GPU is available
-            return audio
+            # Skip the data-URL header and decode straight to PCM samples;
+            # there is no need to round-trip through an in-memory WAV file.
+            audio_data = base64.b64decode(base64_audio[base64_audio.find(',') + 1:])
+            return AudioProcessor.pcm16_to_float32(AudioProcessor.pcm16_view(audio_data))
+
+        except Exception as e:
+            print(f"Error processing audio: {e}")
+            return None
+
+    @staticmethod
+    def pcm_payload(data):
+        """Unpack a binary-transport frame -> (pcm, sample_rate, trace_id).
+
+        Accepts raw PCM bytes, or {'pcm': bytes, 'sample_rate': int, 'trace_id': str}
+        with the last two optional. Raises ValueError for anything else.
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return data, SAMPLE_RATE, None
+        if not isinstance(data, dict):
+            raise ValueError(f"expected PCM bytes or a dict, got {type(data).__name__}")
+        pcm = data.get('pcm', b'')
+        if not isinstance(pcm, (bytes, bytearray, memoryview)):
+            raise ValueError(f"'pcm' must be bytes, got {type(pcm).__name__}")
+        sample_rate = data.get('sample_rate', SAMPLE_RATE)
+        # bool is an int, and NaN fails both comparisons
+        if isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float)) \
+                or not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"bad sample_rate {sample_rate!r}")
+        trace_id = data.get('trace_id')
+        return pcm, int(sample_rate), trace_id if isinstance(trace_id, str) else None
+
+    @staticmethod
+    def process_pcm16(pcm_data, sample_rate=SAMPLE_RATE):
+        """Convert raw little-endian int16 mono PCM from the binary transport.
+
+        At 16kHz this returns a zero-copy int16 view of the received bytes; the
+        speech gate classifies it as int16 and the transcription session's
+        ring buffer normalizes the speech to float32 as it copies it in.
+        Other rates are normalized and resampled here.
+        """
+        try:
+            samples = AudioProcessor.pcm16_view(pcm_data)
+            if sample_rate != SAMPLE_RATE:
+                return AudioProcessor.resample(AudioProcessor.pcm16_to_float32(samples), sample_rate)
+            return samples
 
         except Exception as e:
             print(f"Error processing audio: {e}")
             return None
 
+    @staticmethod
+    def pcm16_view(pcm_data):
+        """View little-endian 16-bit PCM bytes as int16 samples without copying"""
+        return np.frombuffer(pcm_data, dtype='<i2', count=len(pcm_data) // 2)
+
+    @staticmethod
+    def pcm16_to_float32(samples, out=None):
+        """Normalize int16 samples into a (preallocated) float32 array in one pass"""
+        if out is None:
+            out = np.empty(len(samples), dtype=np.float32)
+        np.multiply(samples, PCM_SCALE, out=out, casting='unsafe')
+        return out
+
+    @staticmethod
+    def resample(audio, orig_rate, target_rate=SAMPLE_RATE):
+        """Vectorized linear-interpolation resampling of float32 audio"""
+        if orig_rate == target_rate or len(audio) == 0:
+            return audio
+        length = int(round(len(audio) * target_rate / orig_rate))
+        positions = np.arange(length) * (orig_rate / target_rate)
+        return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
     @staticmethod
     def create_temp_wav(audio_data):
         """Create a temporary WAV file from audio data"""
@@ -44,4 +95,4 @@ class AudioProcessor:
             wav.setsampwidth(2)
             wav.setframerate(16000)
             wav.writeframes(audio_data)
-        return temp_wav.getvalue()
\ No newline at end of file
+        return temp_wav.getvalue()
@@ -0,0 +1,93 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    __slots__ = ('audio', 'done', 'text', 'error', 'submitted')
+
+    def __init__(self, audio):
+        self.audio = audio
+        self.done = threading.Event()
+        self.text = None
+        self.error = None
+        self.submitted = time.monotonic()
+
+
+class BatchScheduler:
+    """Micro-batches transcription requests from many sessions into one forward pass.
+
+    ``transcribe`` may be called from several native threads at once (one per
+    session job in the InferenceExecutor). The first request opens a batch,
+    the runner thread waits up to ``max_wait_ms`` for more, then calls
+    ``decode_batch`` with up to ``max_batch`` audio windows and hands each
+    caller its own text.
+    """
+
+    def __init__(self, decode_batch, max_batch=8, max_wait_ms=20):
+        self.decode_batch = decode_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._requests = queue.Queue()
+        self.batch_sizes = deque(maxlen=500)
+        self.batch_times = deque(maxlen=500)
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='whisper-batcher', daemon=True)
+        self._thread.start()
+
+    def transcribe(self, audio, prompt=None):
+        """Blocking, thread-safe transcription of one audio window.
+
+        Prompts are not supported by batched decoding and are ignored.
+        """
+        request = _Request(audio)
+        self._requests.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.text
+
+    def _collect(self):
+        batch = [self._requests.get()]
+        deadline = batch[0].submitted + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            try:
+                texts = self.decode_batch([request.audio for request in batch])
+                for request, text in zip(batch, texts):
+                    request.text = text
+            except Exception as e:
+                logger.error(f"Batched decode of {len(batch)} windows failed: {e}")
+                for request in batch:
+                    request.error = e
+            finally:
+                self.batch_sizes.append(len(batch))
+                self.batch_times.append(time.monotonic() - started)
+                for request in batch:
+                    request.done.set()
+
+    def stats(self):
+        if not self.batch_sizes:
+            return {'batches': 0}
+        return {
+            'batches': len(self.batch_sizes),
+            'mean_batch_size': sum(self.batch_sizes) / len(self.batch_sizes),
+            'mean_batch_time': sum(self.batch_times) / len(self.batch_times),
+        }
+
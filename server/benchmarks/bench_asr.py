@@ -0,0 +1,43 @@
+"""Report load time and real-time factor for each ASR backend and model size.
+
+Real-time factor (RTF) is processing time divided by audio duration; below
+1.0 keeps up with a live speaker. Run from the server directory:
+
+    python -m benchmarks.bench_asr --sizes tiny,base,small
+    python -m benchmarks.bench_asr --backends whisper,faster-whisper --quantize both --clip sermon.wav
+"""
+import argparse
+
+from asr_backends import create_backend
+from benchmarks.clips import benchmark_clip
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='whisper')
+    parser.add_argument('--sizes', default='tiny,base')
+    parser.add_argument('--quantize', choices=('no', 'yes', 'both'), default='both')
+    parser.add_argument('--device')
+    parser.add_argument('--clip', help='16-bit mono WAV (default: bundled synthetic clip)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    audio = benchmark_clip(args.clip)
+    quantize_options = {'no': [False], 'yes': [True], 'both': [False, True]}[args.quantize]
+    print(f"Clip: {len(audio) / 16000:.1f}s")
+    print(f"{'backend':<28} {'load s':>7} {'RTF':>6}")
+    for name in args.backends.split(','):
+        for size in args.sizes.split(','):
+            for quantize in quantize_options:
+                backend = create_backend(name, model_size=size, device=args.device, quantize=quantize)
+                try:
+                    backend.load()
+                except Exception as e:
+                    print(f"{str(backend):<28} unavailable: {e}")
+                    continue
+                rtf = backend.real_time_factor(audio, repeat=args.repeat)
+                print(f"{str(backend):<28} {backend.load_seconds:>7.1f} {rtf:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
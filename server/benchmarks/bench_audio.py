@@ -0,0 +1,77 @@
+"""Bytes/sec through AudioProcessor for the base64 and binary PCM transports.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_audio
+
+The "-> speech gate -> ring buffer" rows follow a chunk the way a session
+takes it: the gate classifies it in its own dtype and passes speech on,
+and the ring buffer normalizes int16 as it copies it in. The test signal
+is loud noise, so the gate passes all of it.
+"""
+import argparse
+import base64
+import io
+import time
+import wave
+
+import numpy as np
+
+from audio_processor import AudioProcessor
+from transcription_session import AudioRingBuffer
+from vad import SpeechGate
+
+
+def legacy_process_base64_audio(base64_audio):
+    """The original WAV round-trip implementation, for comparison"""
+    audio_data = base64.b64decode(base64_audio.split(',')[1])
+    wav_file = io.BytesIO()
+    with wave.open(wav_file, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(audio_data)
+    wav_file.seek(0)
+    with wave.open(wav_file, 'rb') as wav:
+        audio = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+        return audio.astype(np.float32) / 32768.0
+
+
+def measure(name, process, payload, wire_bytes, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        process(payload)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<40} {wire_bytes * iterations / elapsed / 1e6:>8.1f} MB/s wire "
+          f"({elapsed / iterations * 1e6:>7.1f} us/chunk, {wire_bytes} bytes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--chunk-seconds', type=float, default=1.0)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pcm = (rng.standard_normal(int(16000 * args.chunk_seconds)) * 3000).astype('<i2').tobytes()
+    data_url = 'data:audio/webm;base64,' + base64.b64encode(pcm).decode('ascii')
+    ring = AudioRingBuffer(16000 * 30)
+    gate = SpeechGate()
+
+    def gated(samples):
+        for audio, _ in gate.process(samples):
+            ring.write(audio)
+
+    measure('base64, legacy WAV round trip', legacy_process_base64_audio, data_url, len(data_url), args.iterations)
+    measure('base64 (audio_data)', AudioProcessor.process_base64_audio, data_url, len(data_url), args.iterations)
+    measure('binary PCM (audio_pcm)', AudioProcessor.process_pcm16, pcm, len(pcm), args.iterations)
+    measure('base64 -> speech gate -> ring buffer', lambda data: gated(AudioProcessor.process_base64_audio(data)),
+            data_url, len(data_url), args.iterations)
+    measure('binary PCM -> speech gate -> ring buffer', lambda data: gated(AudioProcessor.process_pcm16(data)),
+            pcm, len(pcm), args.iterations)
+    measure('binary PCM 48kHz -> resampled', lambda data: AudioProcessor.process_pcm16(data, 48000),
+            pcm, len(pcm), args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""Check and time BookResolver against the old linear-scan book lookup.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_book_resolver
+    python -m benchmarks.bench_book_resolver --db bible-sqlite.db   # with the database abbreviations
+
+Prints a correctness table with one row per book (canonical name, ordinal
+spellings, a short prefix and a one-letter typo), then lookup latency for
+both implementations per kind of case. Typos take the fuzzy path; in the
+server BibleService caches resolved names, so each distinct typo pays it once.
+"""
+import argparse
+import sqlite3
+import time
+
+from book_resolver import BookResolver, edit_distance
+from reference_parser import BOOKS
+
+
+def legacy_mappings(book_names, abbreviations):
+    """book_mappings as BibleService built it"""
+    mappings = {}
+    for abbr, book_id in abbreviations:
+        if book_id in book_names:
+            mappings[abbr.lower()] = book_id
+            mappings[book_names[book_id].lower()] = book_id
+    for book_id, name in book_names.items():
+        mappings.setdefault(name.lower(), book_id)
+    return mappings
+
+
+def legacy_normalize(mappings, book_name):
+    """The original BibleService._normalize_book_name"""
+    book_name = book_name.lower().strip()
+    book_name = book_name.replace('1st', '1').replace('2nd', '2').replace('3rd', '3')
+    book_name = book_name.replace('first', '1').replace('second', '2').replace('third', '3')
+    book_id = mappings.get(book_name)
+    if book_id:
+        return book_id
+    for stored_name, stored_id in mappings.items():
+        if stored_name.startswith(book_name):
+            return stored_id
+    return None
+
+
+def load_tables(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        book_names = dict(conn.execute("SELECT b, n FROM key_english"))
+        abbreviations = list(conn.execute("SELECT a, b FROM key_abbreviations_english"))
+    finally:
+        conn.close()
+    return book_names, abbreviations
+
+
+def typo(name):
+    """Drop one letter from the middle of the last word ("Genesis" -> "Geesis")"""
+    head, _, word = name.rpartition(' ')
+    if len(word) < 5:
+        return None
+    middle = len(word) // 2
+    return f"{head} {word[:middle]}{word[middle + 1:]}".strip()
+
+
+def unique_prefix_owner(book_names, prefix):
+    owners = {book_id for book_id, name in book_names.items() if name.lower().startswith(prefix)}
+    return owners.pop() if len(owners) == 1 else None
+
+
+def closest_book(book_names, query):
+    """Brute-force nearest canonical name within two edits, None on a tie"""
+    distances = {book_id: edit_distance(query.lower(), name.lower(), 2) for book_id, name in book_names.items()}
+    best = min(distances.values())
+    owners = [book_id for book_id, distance in distances.items() if distance == best]
+    return owners[0] if best <= 2 and len(owners) == 1 else None
+
+
+def cases_for(book_id, name, book_names):
+    """(label, query, expected book id) triples for one book"""
+    cases = [('name', name, book_id)]
+    number, _, rest = name.partition(' ')
+    if number in ('1', '2', '3') and rest:
+        ordinal = {'1': 'First', '2': 'Second', '3': 'Third'}[number]
+        suffix = {'1': '1st', '2': '2nd', '3': '3rd'}[number]
+        cases.append(('ordinal', f"{ordinal} {rest}", book_id))
+        cases.append(('ordinal', f"{suffix} {rest}", book_id))
+        cases.append(('roman', f"{'I' * int(number)} {rest}", book_id))
+    prefix = name[:5] if name[0].isdigit() else name[:4]
+    if len(prefix) < len(name):
+        # A shared prefix ("Phil") must come back ambiguous, not as a guess
+        cases.append(('prefix', prefix, unique_prefix_owner(book_names, prefix.lower())))
+    misspelled = typo(name)
+    if misspelled:
+        # "Judes" is one edit from both Judges and Jude and must not be guessed
+        cases.append(('typo', misspelled, closest_book(book_names, misspelled)))
+    return cases
+
+
+def correctness_table(resolver, mappings, book_names):
+    rows = []
+    for book_id, name in sorted(book_names.items()):
+        for label, query, expected in cases_for(book_id, name, book_names):
+            match = resolver.match(query)
+            legacy = legacy_normalize(mappings, query)
+            rows.append((book_id, label, query, expected, match, legacy))
+    # Words that start like ordinals or books but are neither
+    for query in ('firstborn', 'secondly', 'thirdly', 'chapter', 'amen', 'joyful'):
+        rows.append((None, 'negative', query, None, resolver.match(query), legacy_normalize(mappings, query)))
+    return rows
+
+
+def describe(book_names, match):
+    if match.kind == 'ambiguous':
+        return 'ambiguous: ' + '/'.join(book_names[b] for b in match.candidates)
+    if match.book_id is None:
+        return '-'
+    return f"{book_names[match.book_id]} ({match.kind})"
+
+
+def print_table(rows, book_names):
+    print(f"{'#':>3}  {'case':<8} {'query':<22} {'expected':<18} {'resolver':<34} {'legacy':<18}")
+    failures = legacy_failures = 0
+    for book_id, label, query, expected, match, legacy in rows:
+        ok = match.book_id == expected
+        legacy_ok = legacy == expected
+        failures += not ok
+        legacy_failures += not legacy_ok
+        print(
+            f"{book_id or '':>3}  {label:<8} {query:<22} {book_names.get(expected, '-'):<18} "
+            f"{('' if ok else '!! ') + describe(book_names, match):<34} "
+            f"{('' if legacy_ok else '!! ') + book_names.get(legacy, '-'):<18}"
+        )
+    print(f"\n{len(rows)} cases: resolver {len(rows) - failures} correct, legacy {len(rows) - legacy_failures} correct")
+    return failures
+
+
+def time_lookups(resolve, queries, iterations):
+    """Mean microseconds per lookup"""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for query in queries:
+            resolve(query)
+    return (time.perf_counter() - started) / (iterations * len(queries)) * 1e6
+
+
+def print_timings(rows, resolver, mappings, iterations):
+    groups = {}
+    for _, label, query, _, _, _ in rows:
+        groups.setdefault(label, []).append(query)
+    groups['all'] = [query for _, _, query, _, _, _ in rows]
+
+    print(f"{'case':<10} {'legacy us':>10} {'resolver us':>12}")
+    for label, queries in groups.items():
+        legacy = time_lookups(lambda q: legacy_normalize(mappings, q), queries, iterations)
+        resolved = time_lookups(resolver.resolve, queries, iterations)
+        print(f"{label:<10} {legacy:>10.2f} {resolved:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help='bible-sqlite.db to take book names and abbreviations from')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    if args.db:
+        book_names, abbreviations = load_tables(args.db)
+    else:
+        book_names = {book_id: name for book_id, (name, _) in enumerate(BOOKS, start=1)}
+        abbreviations = []
+
+    t0 = time.perf_counter()
+    resolver = BookResolver(book_names, abbreviations)
+    print(f"BookResolver build: {(time.perf_counter() - t0) * 1000:.2f} ms\n")
+    mappings = legacy_mappings(book_names, abbreviations)
+
+    rows = correctness_table(resolver, mappings, book_names)
+    failures = print_table(rows, book_names)
+
+    print()
+    print_timings(rows, resolver, mappings, args.iterations)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark local reference parsing against the Gemini extraction path.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_references
+    python -m benchmarks.bench_references --llm   # also time Gemini (needs GOOGLE_AI_KEY)
+"""
+import argparse
+import os
+import time
+
+from reference_parser import ReferenceParser
+
+# Sermon-style transcript chunks; roughly half contain a reference
+TRANSCRIPTS = [
+    "For God so loved the world, John 3:16 tells us.",
+    "Turn with me to First John chapter two verse fifteen.",
+    "We are reading from Genesis one one this morning.",
+    "Romans 8, verses 28 through 30, is our text.",
+    "If my people, Second Chronicles 7:14, who are called by my name.",
+    "Third John verse 4, I have no greater joy.",
+    "Let us sing together as the choir comes forward.",
+    "Psalm one hundred and nineteen verse one hundred five.",
+    "The Lord is my shepherd, Psalm chapter 23.",
+    "Please be seated and greet the person next to you.",
+    "In First Corinthians 13 verse 4 to 7 love is patient.",
+    "And that is why we keep coming back to the word every week.",
+    "Isaiah fifty three five, by his stripes we are healed.",
+    "Philippians 4:13, I can do all things through Christ.",
+    "The offering baskets are at the back of the room.",
+    "Hebrews eleven one, now faith is the substance of things hoped for.",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(name, extract, iterations):
+    latencies = []
+    references = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        text = TRANSCRIPTS[i % len(TRANSCRIPTS)]
+        t0 = time.perf_counter()
+        references += len(extract(text))
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    print(f"{name}: {iterations} chunks, {references} references in {elapsed:.3f}s")
+    print(f"  references/sec: {references / elapsed:,.0f}")
+    print(f"  p50 latency: {percentile(latencies, 50) * 1000:.3f} ms")
+    print(f"  p99 latency: {percentile(latencies, 99) * 1000:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--llm', action='store_true', help='also benchmark the Gemini path')
+    parser.add_argument('--llm-iterations', type=int, default=len(TRANSCRIPTS))
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    reference_parser = ReferenceParser()
+    print(f"ReferenceParser build: {(time.perf_counter() - t0) * 1000:.2f} ms")
+    run('local parser', reference_parser.parse, args.iterations)
+
+    if args.llm:
+        import google.generativeai as genai
+        from llm_references import extract_references_llm
+
+        genai.configure(api_key=os.getenv('GOOGLE_AI_KEY'))
+        model = genai.GenerativeModel('gemini-pro')
+        run('gemini', lambda text: extract_references_llm(model, text)['references'], args.llm_iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare the FTS5 search index with the LIKE scan used by search_text.
+
+Build the index first (python search_index.py), then run from the server
+directory:
+
+    python -m benchmarks.bench_search --db bible-sqlite.db
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+from search_index import SearchIndex
+
+QUERIES = [
+    'loved the world',
+    'shepherd',
+    'faith',
+    'in the beginning',
+    'light',
+    'grace',
+    'strength',
+    'peace',
+]
+
+
+def time_queries(name, search, queries, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(f"{name}: mean {sum(latencies) / len(latencies) * 1000:.2f} ms, "
+          f"p99 {latencies[int(0.99 * (len(latencies) - 1))] * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bible-sqlite.db'))
+    parser.add_argument('--translation', default='kjv')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    index = SearchIndex(args.db)
+    if not index.has_translation(args.translation):
+        raise SystemExit(f"fts_{args.translation} not found, run: python search_index.py --db {args.db}")
+
+    conn = sqlite3.connect(args.db)
+
+    def like_search(query, offset=0):
+        return conn.execute(
+            f"SELECT ke.n, v.c, v.v, v.t FROM t_{args.translation} v JOIN key_english ke ON ke.b = v.b "
+            "WHERE v.t LIKE ? LIMIT 10 OFFSET ?", (f'%{query}%', offset)
+        ).fetchall()
+
+    time_queries('LIKE scan, page 1', like_search, QUERIES, args.repeat)
+    time_queries('LIKE scan, page 2', lambda q: like_search(q, 10), QUERIES, args.repeat)
+    def fts_search(query, offset=0, translations=(args.translation,), mode='phrase', cached=False):
+        if not cached:
+            index._hits.clear()
+        return index.search(query, translations, offset=offset, mode=mode)
+
+    time_queries('FTS5 phrase, page 1', fts_search, QUERIES, args.repeat)
+    time_queries('FTS5 phrase, page 2 (cached ranking)', lambda q: fts_search(q, 10, cached=True),
+                 QUERIES, args.repeat)
+    time_queries('FTS5 any-term, all translations', lambda q: fts_search(q, translations=None, mode='any'),
+                 QUERIES, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Query latency and recall of the semantic verse index (semantic_index.py).
+
+Run from the server directory:
+
+    python -m benchmarks.bench_semantic                        # synthetic full-size index, no model
+    python -m benchmarks.bench_semantic --index verses.emb --db bible-sqlite.db --out results/semantic.json
+
+Without --index, a synthetic index the size of the full corpus (31,102
+verses x 2 translations, 384 dimensions) is built with clustered random
+vectors, so vector search can be timed without a model. Queries are stored
+rows plus noise, standing in for paraphrases. Vector search is timed as a
+float32 brute-force scan (the baseline), a scan of the stored int8/float16
+matrix, and the IVF index at several nprobe values; recall@10 is measured
+against the float32 scan.
+
+With --index and --db, full text queries (verse fragments, embedding
+included) are timed too, with how often the verse they came from is the
+top hit.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.results import print_table, save, summarize
+from semantic_index import SemanticIndex, _normalize, write_index
+
+FULL_CORPUS_VERSES = 31102
+
+
+def synthetic_index(path, rows, dim, dtype, seed=0):
+    """Write an index of clustered random unit vectors, like embeddings of related verses"""
+    rng = np.random.default_rng(seed)
+    topics = _normalize(rng.standard_normal((rows // 16, dim)).astype(np.float32))
+    embeddings = topics[rng.integers(0, len(topics), rows)]
+    embeddings = _normalize(embeddings + 0.8 * _normalize(rng.standard_normal((rows, dim)).astype(np.float32)))
+    ids = np.arange(rows, dtype=np.int32) % FULL_CORPUS_VERSES + 1001001
+    write_index(path, embeddings, ids, f'hashing:{dim}', ['kjv', 'web'], dtype)
+
+
+def dequantized(index):
+    vectors = index.vectors.astype(np.float32)
+    if index.scales is not None:
+        vectors *= index.scales[:, None]
+    return vectors
+
+
+def time_vector_search(search, queries):
+    latencies = []
+    found = []
+    for query in queries:
+        started = time.perf_counter()
+        found.append(search(query))
+        latencies.append(time.perf_counter() - started)
+    return latencies, found
+
+
+def recall(found, exact, k):
+    hits = sum(len({v for _, v in f[:k]} & {v for _, v in e[:k]}) for f, e in zip(found, exact))
+    return hits / (k * len(exact))
+
+
+def text_queries(db_path, translations, count, rng):
+    """(packed verse id, 8-14 word fragment of its text) pairs"""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    rows = conn.execute(
+        f"SELECT b * 1000000 + c * 1000 + v, t FROM t_{translations[0]} WHERE length(t) > 80"
+    ).fetchall()
+    conn.close()
+    queries = []
+    for verse_id, text in rng.sample(rows, min(count, len(rows))):
+        words = text.split()
+        start = rng.randrange(0, max(1, len(words) - 14))
+        queries.append((verse_id, ' '.join(words[start:start + rng.randint(8, 14)])))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--index', help='index built by semantic_index.py (default: synthetic)')
+    parser.add_argument('--db', help='database the index was built from, for text queries')
+    parser.add_argument('--rows', type=int, default=2 * FULL_CORPUS_VERSES, help='rows of the synthetic index')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--dtype', choices=('int8', 'float16'), default='int8')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nprobe', default='4,8,16,32')
+    parser.add_argument('--out', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    path = args.index
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.emb')
+        print(f"Building a synthetic {args.rows} x {args.dim} {args.dtype} index...")
+        synthetic_index(path, args.rows, args.dim, args.dtype)
+    index = SemanticIndex.load(path)
+    print(f"{len(index)} rows, {index.vectors.shape[1]} dimensions, {index.dtype}, "
+          f"{len(index.centroids)} clusters, {os.path.getsize(path) / 1e6:.1f} MB on disk")
+
+    rng = np.random.default_rng(1)
+    sample = rng.integers(0, len(index), args.queries)
+    matrix = dequantized(index)
+    queries = _normalize(matrix[sample] + 0.3 * _normalize(rng.standard_normal(matrix[sample].shape)).astype(np.float32))
+    queries = queries.astype(np.float32)
+
+    def brute_force(query):
+        scores = matrix @ query
+        top = np.argpartition(scores, -args.k)[-args.k:]
+        return sorted(((float(scores[row]), int(index.ids[row])) for row in top), reverse=True)
+
+    results = {}
+    latencies, exact = time_vector_search(brute_force, queries)
+    results['float32 brute force'] = summarize(latencies)
+    latencies, found = time_vector_search(lambda q: index.search_vectors(q, args.k, nprobe=0), queries)
+    results[f'{index.dtype} scan'] = dict(summarize(latencies), recall=recall(found, exact, args.k))
+    for nprobe in [int(n) for n in args.nprobe.split(',')]:
+        latencies, found = time_vector_search(lambda q: index.search_vectors(q, args.k, nprobe=nprobe), queries)
+        results[f'ivf nprobe={nprobe}'] = dict(summarize(latencies), recall=recall(found, exact, args.k))
+
+    if args.index and args.db:
+        py_rng = random.Random(1)
+        pairs = text_queries(args.db, index.translations, args.queries, py_rng)
+        index.warm_up()
+        latencies = []
+        top1 = 0
+        for verse_id, text in pairs:
+            started = time.perf_counter()
+            hits = index.search(text, args.k)
+            latencies.append(time.perf_counter() - started)
+            if hits and hits[0]['book_id'] * 1000000 + hits[0]['chapter'] * 1000 + hits[0]['verse'] == verse_id:
+                top1 += 1
+        results[f'text query ({index.model})'] = dict(summarize(latencies), top1=top1 / len(pairs))
+
+    print_table(results)
+    for name, summary in results.items():
+        extra = ', '.join(f"{key} {summary[key]:.3f}" for key in ('recall', 'top1') if key in summary)
+        if extra:
+            print(f"{name}: {extra}")
+    if args.out:
+        save(args.out, 'bench_semantic', results, config=vars(args))
+
+
+if __name__ == '__main__':
+    main()
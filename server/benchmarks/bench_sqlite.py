@@ -0,0 +1,132 @@
+"""Compare verse query latency of the tuned read-only SQLite layer with per-call sessions.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_sqlite --db bible-sqlite.db
+
+Works on a temporary copy of the database: measures the old approach (a
+default engine, a new Session and an f-string query per call) against a
+read-only pooled engine with pragmas and compiled statements, before and
+after the database.py migrations add the (b, c, v) indexes.
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from database import create_readonly_engine, migrate
+from verse_store import pack_verse_id
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def sample_keys(db_path, count, seed=1):
+    conn = sqlite3.connect(db_path)
+    try:
+        keys = conn.execute("SELECT b, c, v FROM t_kjv").fetchall()
+    finally:
+        conn.close()
+    rng = random.Random(seed)
+    return [rng.choice(keys) for _ in range(count)]
+
+
+def per_call_session(db_path):
+    """The original BibleService access pattern"""
+    engine = create_engine(f'sqlite:///{db_path}')
+    Session = sessionmaker(bind=engine)
+
+    def lookup(book, chapter, verse, translation='kjv'):
+        session = Session()
+        try:
+            table_name = f't_{translation}'
+            return session.execute(
+                text(f"""
+                SELECT ke.n as book_name, v.c as chapter, v.v as verse, v.t as text
+                FROM {table_name} v
+                JOIN key_english ke ON ke.b = v.b
+                WHERE v.b = :book
+                AND v.c = :chapter
+                AND v.v = :verse
+                """),
+                {"book": book, "chapter": chapter, "verse": verse}
+            ).first()
+        finally:
+            session.close()
+
+    return lookup, engine
+
+
+def tuned(db_path, by_id=False):
+    """Pooled read-only connection and one compiled statement"""
+    engine = create_readonly_engine(db_path)
+    if by_id:
+        statement = text("SELECT t AS text FROM t_kjv WHERE id = :id")
+    else:
+        statement = text("SELECT t AS text FROM t_kjv WHERE b = :book AND c = :chapter AND v = :verse")
+
+    def lookup(book, chapter, verse):
+        with engine.connect() as conn:
+            if by_id:
+                return conn.execute(statement, {"id": pack_verse_id(book, chapter, verse)}).first()
+            return conn.execute(statement, {"book": book, "chapter": chapter, "verse": verse}).first()
+
+    return lookup, engine
+
+
+def measure(name, lookup, keys):
+    lookup(*keys[0])  # warm up
+    latencies = []
+    started = time.perf_counter()
+    for key in keys:
+        t0 = time.perf_counter()
+        lookup(*key)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<34} {len(keys) / elapsed:>10,.0f}/s   p50 {percentile(latencies, 50) * 1e6:>8.1f} us"
+        f"   p99 {percentile(latencies, 99) * 1e6:>8.1f} us"
+    )
+
+
+def run_all(db_path, keys):
+    for name, factory in (
+        ('per-call session', per_call_session),
+        ('tuned, (b, c, v) query', tuned),
+        ('tuned, packed id query', lambda path: tuned(path, by_id=True)),
+    ):
+        lookup, engine = factory(db_path)
+        measure(name, lookup, keys)
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bible-sqlite.db'))
+    parser.add_argument('--lookups', type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bible.db')
+        shutil.copyfile(args.db, db_path)
+        keys = sample_keys(db_path, args.lookups)
+
+        print(f"{args.lookups} random single-verse lookups\n\nBefore migrations:")
+        run_all(db_path, keys)
+
+        started = time.perf_counter()
+        migrate(db_path)
+        print(f"\nAfter migrations ({time.perf_counter() - started:.2f}s):")
+        run_all(db_path, keys)
+
+
+if __name__ == '__main__':
+    main()
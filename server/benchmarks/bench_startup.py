@@ -0,0 +1,132 @@
+"""Measure server startup: import time, time until /healthz answers and time until /readyz passes.
+
+Run from the server directory (needs bible-sqlite.db):
+
+    python -m benchmarks.bench_startup --runs 5 --model tiny
+    python -m benchmarks.bench_startup --simulate-asr --asr-load-seconds 5 --out results/startup.json
+    python -m benchmarks.bench_startup --importtime   # slowest modules to import
+
+Each run starts app.py in a fresh process and polls both endpoints. /healthz
+should answer as soon as the port is bound, long before the model has
+loaded; /readyz reports the server's own timings, which are included.
+--simulate-asr swaps Whisper for the scripted backend with a fixed load
+time, so the run needs no model.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.results import print_table, save, summarize
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve(args):
+    """Entry point of the server process when --simulate-asr is set"""
+    from benchmarks.stubs import register_scripted_asr
+
+    register_scripted_asr(50.0, args.asr_load_seconds)
+    import app
+
+    app.main()
+
+
+def poll(url, deadline):
+    """(seconds until url answered 200 or None, last JSON body)"""
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                return time.perf_counter() - started, json.loads(response.read())
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.02)
+    return None, None
+
+
+def run_once(args):
+    env = dict(os.environ, PORT=str(args.port), WHISPER_MODEL=args.model, LOG_LEVEL='WARNING')
+    env.setdefault('GOOGLE_AI_KEY', 'offline')
+    if args.simulate_asr:
+        env['ASR_BACKEND'] = 'scripted'
+        argv = [sys.executable, '-m', 'benchmarks.bench_startup', '--serve',
+                '--asr-load-seconds', str(args.asr_load_seconds)]
+    else:
+        argv = [sys.executable, 'app.py']
+
+    started = time.perf_counter()
+    process = subprocess.Popen(argv, env=env, cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + args.timeout
+        healthy, _ = poll(f"http://127.0.0.1:{args.port}/healthz", deadline)
+        if healthy is None:
+            raise RuntimeError("/healthz never answered")
+        healthy = time.perf_counter() - started
+        _, body = poll(f"http://127.0.0.1:{args.port}/readyz", deadline)
+        if body is None:
+            raise RuntimeError(f"/readyz did not pass within {args.timeout:.0f}s")
+        ready = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+    return healthy, ready, body['startup']
+
+
+def slowest_imports(count):
+    """Modules with the largest cumulative import time when importing app"""
+    env = dict(os.environ, LOG_LEVEL='ERROR')
+    env.setdefault('GOOGLE_AI_KEY', 'offline')
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        env=env, cwd=SERVER_DIR, capture_output=True, text=True
+    ).stderr
+    rows = []
+    for line in output.splitlines():
+        if line.startswith('import time:') and '|' in line and 'cumulative' not in line:
+            _, cumulative, module = line[len('import time:'):].split('|')
+            rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--model', default='tiny', help='Whisper model size')
+    parser.add_argument('--simulate-asr', action='store_true', help='scripted ASR instead of a real model')
+    parser.add_argument('--asr-load-seconds', type=float, default=3.0, help='load time of the scripted ASR')
+    parser.add_argument('--port', type=int, default=5111)
+    parser.add_argument('--timeout', type=float, default=600.0)
+    parser.add_argument('--importtime', action='store_true', help='list the slowest imports and exit')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+    if args.importtime:
+        for cumulative, module in slowest_imports(15):
+            print(f"{cumulative / 1000:9.1f} ms  {module}")
+        return
+
+    timings = {'process start -> /healthz': [], 'process start -> /readyz': [], 'import (server)': [],
+               'ready (server)': []}
+    for _ in range(args.runs):
+        healthy, ready, startup = run_once(args)
+        timings['process start -> /healthz'].append(healthy)
+        timings['process start -> /readyz'].append(ready)
+        timings['import (server)'].append(startup['import_seconds'])
+        timings['ready (server)'].append(startup['ready_seconds'])
+
+    results = {name: summarize(samples) for name, samples in timings.items()}
+    print_table(results)
+    if args.out:
+        save(args.out, 'bench_startup', results, config=vars(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Microbenchmarks for the audio decode and Bible lookup hot paths, saved as JSON.
+
+Run from the server directory (needs bible-sqlite.db):
+
+    python -m benchmarks.bench_suite --out results/$(git rev-parse --short HEAD)-suite.json
+    python -m benchmarks.results results/<old>-suite.json results/<new>-suite.json
+
+Covers AudioProcessor.process_base64_audio and BibleService._normalize_book_name,
+get_verse, get_verse_range and search_text. Lookups are measured twice:
+"cold" runs distinct keys once each against cleared caches, "warm" repeats
+a small hot set the way a sermon keeps coming back to the same passages.
+Keys are drawn with a fixed seed, so runs on the same database are comparable.
+"""
+import argparse
+import base64
+import random
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from audio_processor import AudioProcessor
+from benchmarks.bench_book_resolver import cases_for
+from benchmarks.clips import SAMPLE_RATE, synthetic_speech
+from benchmarks.results import print_table, save, summarize
+
+HOT_SET = 50
+
+
+def measure(fn, calls):
+    """Latencies of fn(*args) for each args tuple in calls"""
+    latencies = []
+    started = time.perf_counter()
+    for args in calls:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def cold_and_warm(results, name, fn, keys, clear, warm_calls):
+    clear()
+    results[f"{name} cold"] = measure(fn, keys)
+    hot = keys[:HOT_SET]
+    for args in hot:
+        fn(*args)
+    results[f"{name} warm"] = measure(fn, [hot[i % len(hot)] for i in range(warm_calls)])
+
+
+def audio_chunks(chunk_ms, count):
+    """Browser-style data-URL chunks of int16 PCM"""
+    audio = synthetic_speech(count * chunk_ms / 1000 + 1)
+    pcm = (np.clip(audio, -1, 1) * 32767).astype('<i2')
+    size = SAMPLE_RATE * chunk_ms // 1000
+    return [
+        ('data:audio/pcm;base64,' + base64.b64encode(pcm[i * size:(i + 1) * size].tobytes()).decode(),)
+        for i in range(count)
+    ]
+
+
+def book_queries(book_names):
+    return [(query,) for book_id, name in sorted(book_names.items()) for _, query, _ in cases_for(book_id, name, book_names)]
+
+
+def verse_keys(service, count, rng):
+    with service.engine.connect() as conn:
+        rows = conn.execute(text("SELECT b AS book_id, c AS chapter, v AS verse FROM t_kjv")).fetchall()
+    names = service.book_names
+    return [(names[row.book_id], row.chapter, row.verse) for row in rng.sample(rows, min(count, len(rows)))]
+
+
+def search_terms(service, count, rng):
+    """Two-word phrases taken from random verses"""
+    terms = []
+    for book, chapter, verse in verse_keys(service, count, rng):
+        words = [w.strip('.,;:!?') for w in (service.get_verse(book, chapter, verse) or {}).get('text', '').split()]
+        words = [w for w in words if w.isalpha()]
+        if len(words) >= 2:
+            start = rng.randrange(len(words) - 1)
+            terms.append((' '.join(words[start:start + 2]),))
+    return terms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=2000, help='calls per benchmark')
+    parser.add_argument('--chunk-ms', type=int, default=256, help='audio chunk size (the browser sends 256 ms)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    from bible_service import bible_service as service
+    rng = random.Random(args.seed)
+    results = {}
+
+    results['process_base64_audio'] = measure(AudioProcessor.process_base64_audio, audio_chunks(args.chunk_ms, args.calls))
+
+    queries = book_queries(service.book_names)
+    cold_and_warm(
+        results, '_normalize_book_name', service._normalize_book_name,
+        queries, service.book_cache.clear, args.calls
+    )
+
+    keys = verse_keys(service, args.calls, rng)
+    cold_and_warm(results, 'get_verse', service.get_verse, keys, service.verse_cache.clear, args.calls)
+
+    ranges = [(book, chapter, 1, 5) for book, chapter, _ in keys]
+    cold_and_warm(results, 'get_verse_range', service.get_verse_range, ranges, service.verse_cache.clear, args.calls)
+
+    terms = search_terms(service, min(args.calls, 500), rng)
+    # The FTS index keeps its own ranking cache, so a fresh one is cold
+    cold_and_warm(
+        results, 'search_text', service.search_text, terms,
+        lambda: service.search_index._hits.clear(), args.calls
+    )
+
+    print_table(results)
+    if args.out:
+        save(args.out, 'bench_suite', results, verse_store=bool(service.verse_store),
+             fts=bool(service.search_index.translations))
+
+
+if __name__ == '__main__':
+    main()
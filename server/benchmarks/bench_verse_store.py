@@ -0,0 +1,85 @@
+"""Measure VerseStore startup cost, RSS and lookup latency against SQLite.
+
+Run from the server directory:
+
+    python -m benchmarks.bench_verse_store --db bible-sqlite.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from verse_store import VerseStore
+
+
+def rss_mb():
+    """Current resident set size in MB (Linux), or peak RSS elsewhere"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def time_lookups(name, lookup, keys):
+    started = time.perf_counter()
+    for key in keys:
+        lookup(*key)
+    elapsed = time.perf_counter() - started
+    print(f"{name}: {len(keys) / elapsed:,.0f} lookups/sec ({elapsed / len(keys) * 1e6:.1f} us each)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'bible-sqlite.db'))
+    parser.add_argument('--lookups', type=int, default=20000)
+    args = parser.parse_args()
+
+    baseline = rss_mb()
+    started = time.perf_counter()
+    store = VerseStore.from_database(args.db)
+    print(f"Build from database: {time.perf_counter() - started:.2f}s, "
+          f"+{rss_mb() - baseline:.1f} MB RSS, {len(store.verse_ids)} verses")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'verses.bvs')
+        store.save(path)
+        print(f"Prebuilt file: {os.path.getsize(path) / 1e6:.1f} MB")
+        del store
+
+        baseline = rss_mb()
+        started = time.perf_counter()
+        store = VerseStore.load(path)
+        print(f"Load from mmap: {(time.perf_counter() - started) * 1000:.1f} ms, +{rss_mb() - baseline:.1f} MB RSS")
+
+        rng = random.Random(0)
+        keys = []
+        for _ in range(args.lookups):
+            book, chapter = rng.choice(list(store.chapter_index))
+            keys.append((book, chapter, rng.randint(1, 20), 'kjv'))
+
+        time_lookups('VerseStore.get_verse', store.get_verse, keys)
+        time_lookups('VerseStore.find_verse', lambda b, c, v, t: store.find_verse(b, c, v), keys)
+
+        def sqlite_lookup(book, chapter, verse, translation):
+            # Mirrors the connection-per-call pattern of BibleService.get_verse
+            conn = sqlite3.connect(args.db)
+            try:
+                return conn.execute(
+                    f"SELECT ke.n, v.c, v.v, v.t FROM t_{translation} v JOIN key_english ke ON ke.b = v.b "
+                    "WHERE v.b = ? AND v.c = ? AND v.v = ?", (book, chapter, verse)
+                ).fetchone()
+            finally:
+                conn.close()
+
+        time_lookups('sqlite per-call connection', sqlite_lookup, keys[:max(1, args.lookups // 10)])
+        store = None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Load test for batched Whisper decoding: throughput vs latency by session count.
+
+Each simulated session submits a window of audio, waits for its text and
+submits the next one. Run from the server directory:
+
+    python -m benchmarks.load_batching --model tiny --batch-size 8
+    python -m benchmarks.load_batching --simulate        # no model, synthetic cost
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from batch_scheduler import BatchScheduler
+
+
+def simulated_decoder(fixed_ms, per_item_ms):
+    """Cost model of a batched forward pass: fixed overhead plus a per-window cost"""
+    def decode_batch(audios):
+        time.sleep((fixed_ms + per_item_ms * len(audios)) / 1000)
+        return [''] * len(audios)
+    return decode_batch
+
+
+def run_load(transcribe, sessions, duration, window):
+    latencies = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def session():
+        audio = (np.random.default_rng().standard_normal(window) * 0.05).astype(np.float32)
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            transcribe(audio)
+            with lock:
+                latencies.append(time.monotonic() - started)
+
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    latencies.sort()
+    return (
+        len(latencies) / elapsed,
+        latencies[len(latencies) // 2],
+        latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', help='Whisper model size to load (tiny, base, ...)')
+    parser.add_argument('--simulate', action='store_true', help='use a synthetic cost model instead of Whisper')
+    parser.add_argument('--fixed-ms', type=float, default=300, help='simulated per-batch cost')
+    parser.add_argument('--per-item-ms', type=float, default=40, help='simulated per-window cost')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=20)
+    parser.add_argument('--sessions', default='1,2,4,8,16')
+    parser.add_argument('--duration', type=float, default=10, help='seconds per run')
+    parser.add_argument('--window', type=float, default=3, help='seconds of audio per request')
+    args = parser.parse_args()
+
+    if args.simulate or not args.model:
+        decode_batch = simulated_decoder(args.fixed_ms, args.per_item_ms)
+    else:
+        from asr_backends import WhisperBackend
+        backend = WhisperBackend(args.model)
+        backend.load()
+        decode_batch = backend.decode_batch
+
+    window = int(args.window * 16000)
+    print(f"{'batch':>5} {'sessions':>8} {'windows/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for batch_size in sorted({1, args.batch_size}):
+        scheduler = BatchScheduler(decode_batch, max_batch=batch_size, max_wait_ms=args.max_wait_ms)
+        scheduler.start()
+        for sessions in (int(n) for n in args.sessions.split(',')):
+            throughput, p50, p95 = run_load(lambda audio: scheduler.transcribe(audio), sessions, args.duration, window)
+            print(f"{batch_size:>5} {sessions:>8} {throughput:>10.2f} {p50 * 1000:>8.0f} {p95 * 1000:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
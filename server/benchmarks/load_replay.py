@@ -0,0 +1,150 @@
+"""Replay sermon audio through N simulated Socket.IO clients, end to end through app.py.
+
+Run from the server directory (needs bible-sqlite.db):
+
+    python -m benchmarks.load_replay --clients 8 --audio sermon.wav --model tiny
+    python -m benchmarks.load_replay --clients 8 --simulate-asr --out results/replay.json
+
+Each client connects, streams the clip as 256 ms audio_pcm chunks at real
+time (or --speed times faster), then a second of silence, and disconnects.
+Chunks go through the same handlers, VAD, inference queue, reference
+extraction, verse lookup and emit as live traffic; every handler call runs
+in its own greenthread like python-socketio's async handlers, and only the
+websocket transport is skipped. The LLM is always the offline stub;
+--simulate-asr also swaps Whisper for a scripted backend with a fixed cost
+per audio second, so the run needs no model at all.
+
+Reports chunk handling latency, end-of-speech to transcription emitted,
+throughput and peak RSS.
+"""
+import argparse
+import base64
+import os
+import time
+
+import numpy as np
+
+from benchmarks.clips import SAMPLE_RATE, benchmark_clip
+from benchmarks.results import print_table, save, summarize
+
+
+def configure_server(args):
+    """Environment for app.py; must run before it is imported"""
+    if args.simulate_asr:
+        from benchmarks.stubs import register_scripted_asr
+        register_scripted_asr(args.asr_ms_per_second)
+        os.environ['ASR_BACKEND'] = 'scripted'
+    os.environ['WHISPER_MODEL'] = args.model
+    os.environ.setdefault('REFERENCE_LLM_FALLBACK', 'true')
+    os.environ.setdefault('GOOGLE_AI_KEY', 'offline')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+
+def client_chunks(audio, chunk_ms, transport):
+    """The clip plus trailing silence, as payloads for the chosen event"""
+    pcm = (np.clip(audio, -1, 1) * 32767).astype('<i2')
+    pcm = np.concatenate((pcm, np.zeros(SAMPLE_RATE, dtype='<i2')))
+    size = SAMPLE_RATE * chunk_ms // 1000
+    chunks = [pcm[i:i + size].tobytes() for i in range(0, len(pcm), size)]
+    if transport == 'base64':
+        return [f"data:audio/pcm;base64,{base64.b64encode(chunk).decode()}" for chunk in chunks]
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--audio', help='16-bit mono WAV to replay (default: synthetic speech)')
+    parser.add_argument('--seconds', type=float, default=30.0, help='length of the synthetic clip')
+    parser.add_argument('--chunk-ms', type=int, default=256)
+    parser.add_argument('--speed', type=float, default=1.0, help='replay speed, 1.0 is real time')
+    parser.add_argument('--transport', choices=('pcm', 'base64'), default='pcm')
+    parser.add_argument('--model', default='tiny', help='Whisper model size')
+    parser.add_argument('--simulate-asr', action='store_true', help='scripted ASR instead of a real model')
+    parser.add_argument('--asr-ms-per-second', type=float, default=50.0, help='cost of the scripted ASR')
+    parser.add_argument('--llm-ms', type=float, default=300.0, help='latency of the stub LLM')
+    parser.add_argument('--out', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    configure_server(args)
+    import eventlet
+    import app as server
+    from benchmarks.stubs import StubLLM
+
+    server.model = StubLLM(args.llm_ms)
+    server.asr_backend.wait_until_ready()
+
+    chunk_latencies = []
+    transcript_latencies = []
+    session_stats = []
+    emit_transcripts = server.emit_transcripts
+
+    def timed_emit(sid, events):
+        started = time.monotonic()
+        emit_transcripts(sid, events)
+        spent = time.monotonic() - started
+        for event in events:
+            if event['type'] == 'final':
+                # end of speech -> transcript, plus extraction, lookup and emit
+                transcript_latencies.append(event['latency'] + spent)
+
+    server.emit_transcripts = timed_emit
+    handler = server.handle_audio_pcm if args.transport == 'pcm' else server.handle_audio_data
+
+    def handle(sid, chunk):
+        started = time.monotonic()
+        handler(sid, chunk)
+        chunk_latencies.append(time.monotonic() - started)
+
+    chunks = client_chunks(benchmark_clip(args.audio, args.seconds), args.chunk_ms, args.transport)
+    interval = args.chunk_ms / 1000 / args.speed
+
+    def client(index):
+        sid = f"replay-{index}"
+        server.connect(sid, {})
+        pending = eventlet.GreenPool()
+        # Stagger the clients so they don't all speak in lockstep
+        eventlet.sleep(index * interval / max(args.clients, 1))
+        next_send = time.monotonic()
+        for chunk in chunks:
+            pending.spawn_n(handle, sid, chunk)
+            next_send += interval
+            eventlet.sleep(max(0.0, next_send - time.monotonic()))
+        pending.waitall()
+        session = server.sessions.get(sid)
+        if session is not None:
+            session_stats.append(session.stats())
+        server.disconnect(sid)
+
+    audio_seconds = len(chunks) * args.chunk_ms / 1000
+    print(
+        f"Replaying {audio_seconds:.1f}s of audio to {args.clients} clients "
+        f"({args.transport}, {'scripted ASR' if args.simulate_asr else server.asr_backend}, speed {args.speed}x)"
+    )
+    started = time.monotonic()
+    pool = eventlet.GreenPool(args.clients)
+    for index in range(args.clients):
+        pool.spawn_n(client, index)
+    pool.waitall()
+    elapsed = time.monotonic() - started
+
+    results = {
+        'chunk': summarize(chunk_latencies, elapsed),
+        'transcript': summarize(transcript_latencies, elapsed),
+    }
+    print_table(results)
+    audio_per_second = audio_seconds * args.clients / elapsed
+    dropped = sum(stats['dropped_seconds'] for stats in session_stats)
+    print(f"\n{audio_per_second:.1f} audio seconds/s across clients, {dropped:.1f}s of speech dropped by backpressure")
+    print(f"LLM stub calls: {server.model.calls}, inference queue: {server.inference.stats()}")
+
+    if args.out:
+        save(
+            args.out, 'load_replay', results,
+            config=vars(args), elapsed_seconds=elapsed, audio_seconds_per_second=audio_per_second,
+            dropped_speech_seconds=dropped, llm_calls=server.model.calls, inference=server.inference.stats()
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""Load test a multi-process deployment (serve.py) over real websockets, per ASR worker count.
+
+Run from the server directory (needs bible-sqlite.db and websocket-client):
+
+    python -m benchmarks.load_scaling --clients 16 --workers 2 --asr-workers 1,2,4
+    python -m benchmarks.load_scaling --clients 16 --asr-workers 1,4 --out results/scaling.json
+
+For each ASR worker count the deployment is started as serve.py would
+start it: a local queue broker, socket workers sharing one port, and ASR
+workers that run a scripted backend costing --asr-ms-per-second of compute
+per audio second, so no model is needed. Clients stream the benchmark clip
+as audio_pcm chunks at real time over the websocket transport.
+
+Reports chunk acknowledgement latency, end of speech to final transcript
+received (this includes the VAD's end-of-utterance silence), and
+transcript throughput. With a heavy enough ASR cost, one ASR worker falls
+behind and latency climbs; adding workers should bring it back down.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.clips import benchmark_clip
+from benchmarks.load_replay import client_chunks
+from benchmarks.results import print_table, save, summarize
+
+SILENCE_RMS = 0.01
+
+
+def run_asr_worker(args):
+    """Entry point of the ASR worker processes started by this benchmark"""
+    import logging
+
+    import asr_worker
+    from asr_backends import create_backend
+    from benchmarks.stubs import register_scripted_asr
+    from message_queue import connect_queue
+
+    logging.basicConfig(level=logging.WARNING)
+    register_scripted_asr(args.asr_ms_per_second)
+    asr_worker.run(create_backend('scripted'), connect_queue(args.queue), args.batch_size)
+
+
+def speech_flags(chunks):
+    """Whether each int16 PCM chunk has speech in it, by RMS"""
+    flags = []
+    for chunk in chunks:
+        samples = np.frombuffer(chunk, dtype='<i2').astype(np.float32) / 32768
+        flags.append(bool(samples.size) and float(np.sqrt(np.mean(samples ** 2))) > SILENCE_RMS)
+    return flags
+
+
+def run_client(index, args, chunks, has_speech, chunk_latencies, transcript_latencies, errors):
+    import socketio
+
+    client = socketio.Client()
+    lock = threading.Lock()
+    last_speech_sent = [None]
+
+    @client.on('transcription')
+    def on_transcription(data):
+        with lock:
+            sent = last_speech_sent[0]
+        if data.get('final') and sent is not None:
+            transcript_latencies.append(time.monotonic() - sent)
+
+    try:
+        client.connect(f"http://127.0.0.1:{args.port}", transports=['websocket'])
+    except Exception as e:
+        errors.append(f"client {index}: {e}")
+        return
+
+    interval = args.chunk_ms / 1000
+    # Stagger the clients so they don't all speak in lockstep
+    time.sleep(index * interval / max(args.clients, 1))
+    next_send = time.monotonic()
+    for chunk, speech in zip(chunks, has_speech):
+        sent = time.monotonic()
+        if speech:
+            with lock:
+                last_speech_sent[0] = sent
+        client.emit('audio_pcm', chunk, callback=lambda *_, sent=sent: chunk_latencies.append(time.monotonic() - sent))
+        next_send += interval
+        time.sleep(max(0.0, next_send - time.monotonic()))
+    # Give the last utterance time to come back
+    time.sleep(args.drain)
+    client.disconnect()
+
+
+def run_deployment(args, asr_workers, chunks, has_speech):
+    import serve
+
+    queue_url = f"local://127.0.0.1:{args.queue_port}"
+    deployment = SimpleNamespace(
+        workers=args.workers, asr_workers=asr_workers, queue=queue_url,
+        external_queue=False, port=args.port, port_per_worker=False
+    )
+    asr_command = [
+        sys.executable, '-m', 'benchmarks.load_scaling', '--asr-worker', '--queue', queue_url,
+        '--asr-ms-per-second', str(args.asr_ms_per_second), '--batch-size', str(args.batch_size)
+    ]
+    os.environ.setdefault('GOOGLE_AI_KEY', 'offline')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    supervisor = serve.build(deployment, asr_command)
+    try:
+        supervisor.start()
+        if not serve.wait_for_port('127.0.0.1', args.port, timeout=60.0):
+            raise RuntimeError("socket workers did not come up")
+        # Every worker binds the port; give the slower ones a moment too
+        time.sleep(args.startup_seconds)
+
+        chunk_latencies = []
+        transcript_latencies = []
+        errors = []
+        threads = [
+            threading.Thread(target=run_client, args=(
+                index, args, chunks, has_speech, chunk_latencies, transcript_latencies, errors
+            ))
+            for index in range(args.clients)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+    finally:
+        supervisor.stop()
+
+    for error in errors:
+        print(f"  {error}")
+    return {
+        'chunk': summarize(chunk_latencies, elapsed),
+        'transcript': summarize(transcript_latencies, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=2, help='socket worker processes')
+    parser.add_argument('--asr-workers', default='1,2,4', help='comma-separated ASR worker counts to run')
+    parser.add_argument('--audio', help='16-bit mono WAV to stream (default: synthetic speech)')
+    parser.add_argument('--seconds', type=float, default=20.0, help='length of the synthetic clip')
+    parser.add_argument('--chunk-ms', type=int, default=256)
+    parser.add_argument('--asr-ms-per-second', type=float, default=300.0,
+                        help='compute the scripted ASR spends per audio second')
+    parser.add_argument('--batch-size', type=int, default=1, help='ASR worker batch size')
+    parser.add_argument('--port', type=int, default=5101)
+    parser.add_argument('--queue-port', type=int, default=6499)
+    parser.add_argument('--startup-seconds', type=float, default=3.0)
+    parser.add_argument('--drain', type=float, default=3.0, help='seconds to wait for transcripts after streaming')
+    parser.add_argument('--asr-worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--queue', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help='write results to this JSON file')
+    args = parser.parse_args()
+
+    if args.asr_worker:
+        run_asr_worker(args)
+        return
+
+    chunks = client_chunks(benchmark_clip(args.audio, args.seconds), args.chunk_ms, 'pcm')
+    has_speech = speech_flags(chunks)
+    audio_seconds = len(chunks) * args.chunk_ms / 1000
+
+    results = {}
+    for asr_workers in [int(count) for count in args.asr_workers.split(',')]:
+        print(
+            f"\n{args.clients} clients x {audio_seconds:.1f}s, {args.workers} socket workers, "
+            f"{asr_workers} ASR workers ({args.asr_ms_per_second:.0f} ms per audio second)"
+        )
+        run = run_deployment(args, asr_workers, chunks, has_speech)
+        print_table(run)
+        for stage, summary in run.items():
+            results[f"asr_workers={asr_workers} {stage}"] = summary
+
+    print()
+    print_table(results)
+    if args.out:
+        save(args.out, 'load_scaling', results, config=vars(args), audio_seconds=audio_seconds)
+
+
+if __name__ == '__main__':
+    main()
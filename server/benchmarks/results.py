@@ -0,0 +1,119 @@
+"""Benchmark result files: latency summaries, peak RSS, and JSON to compare across commits.
+
+Compare two runs from the server directory:
+
+    python -m benchmarks.results results/before.json results/after.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def summarize(latencies, elapsed=None):
+    """Count, throughput and p50/p95/p99/max latency (ms) for a list of seconds"""
+    if not latencies:
+        return {'count': 0}
+    elapsed = elapsed if elapsed is not None else sum(latencies)
+    return {
+        'count': len(latencies),
+        'per_second': len(latencies) / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def save(path, benchmark, results, **extra):
+    """Write a run as JSON and return the document"""
+    document = dict(benchmark=benchmark, environment=environment(), peak_rss_mb=peak_rss_mb(), **extra)
+    document['results'] = results
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nResults written to {path}")
+    return document
+
+
+def print_table(results):
+    print(f"{'benchmark':<34} {'count':>8} {'per sec':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in results.items():
+        if not row.get('count'):
+            print(f"{name:<34} {0:>8}")
+            continue
+        print(
+            f"{name:<34} {row['count']:>8} {row['per_second'] or 0:>12,.1f} "
+            f"{row['p50_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['p99_ms']:>9.3f}"
+        )
+
+
+def compare(old, new):
+    """Print p50/p99 and throughput of two result documents side by side"""
+    print(f"old: {old['environment'].get('commit')}  new: {new['environment'].get('commit')}\n")
+    print(f"{'benchmark':<34} {'p50 old':>9} {'p50 new':>9} {'p99 old':>9} {'p99 new':>9} {'throughput':>11}")
+    for name, row in new['results'].items():
+        before = old['results'].get(name)
+        if not before or not before.get('count') or not row.get('count'):
+            continue
+        speedup = (row['per_second'] or 0) / before['per_second'] if before.get('per_second') else 0
+        print(
+            f"{name:<34} {before['p50_ms']:>9.3f} {row['p50_ms']:>9.3f} "
+            f"{before['p99_ms']:>9.3f} {row['p99_ms']:>9.3f} {speedup:>10.2f}x"
+        )
+    if old.get('peak_rss_mb') and new.get('peak_rss_mb'):
+        print(f"\npeak RSS: {old['peak_rss_mb']:.0f} MB -> {new['peak_rss_mb']:.0f} MB")
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args()
+    compare(load(args.old), load(args.new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Offline stand-ins for the models, so pipeline benchmarks run without a GPU or an API key.
+
+``ScriptedASRBackend`` takes a fixed amount of time per second of audio and
+returns phrases from a sermon-style script; ``StubLLM`` answers like
+``genai.GenerativeModel`` after a fixed delay, using the local reference
+grammar for its answer. Neither is accurate, both are deterministic.
+"""
+import itertools
+import json
+import threading
+import time
+
+from asr_backends import ASRBackend, BACKENDS, SAMPLE_RATE
+from benchmarks.bench_references import TRANSCRIPTS
+from reference_parser import ReferenceParser
+
+
+class ScriptedASRBackend(ASRBackend):
+    """ASR backend that sleeps ms_per_second per second of audio and returns scripted text"""
+
+    name = 'scripted'
+    ms_per_second = 50.0
+    # Seconds _load takes, standing in for reading model weights
+    load_delay = 0.0
+
+    def _load(self):
+        time.sleep(self.load_delay)
+        self._script = itertools.cycle(TRANSCRIPTS)
+        self._lock = threading.Lock()
+
+    def _transcribe(self, audio, prompt):
+        time.sleep(self.ms_per_second * len(audio) / SAMPLE_RATE / 1000)
+        with self._lock:
+            return next(self._script)
+
+
+def register_scripted_asr(ms_per_second, load_delay=0.0):
+    """Make ASR_BACKEND=scripted available to create_backend"""
+    ScriptedASRBackend.ms_per_second = ms_per_second
+    ScriptedASRBackend.load_delay = load_delay
+    BACKENDS[ScriptedASRBackend.name] = ScriptedASRBackend
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubLLM:
+    """Drop-in for the Gemini model used by llm_references"""
+
+    def __init__(self, latency_ms=300.0):
+        self.latency_ms = latency_ms
+        self.parser = ReferenceParser()
+        self.calls = 0
+
+    def generate_content(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+        text = prompt.split('Text:', 1)[-1].split('Return format:', 1)[0]
+        return _Response(json.dumps({'references': self.parser.parse(text)}))
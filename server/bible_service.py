@@ -1,27 +1,99 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
+from database import DEFAULT_TRANSLATIONS, create_readonly_engine, pending_migrations, translation_tables
+from verse_store import VerseStore, pack_verse_id
+from search_index import SearchIndex
+from cache import create_cache
+from book_resolver import BookResolver
+import logging
 import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 class BibleService:
-    def __init__(self):
-        db_path = os.path.join(os.path.dirname(__file__), 'bible-sqlite.db')
-        self.engine = create_engine(f'sqlite:///{db_path}')
-        self.Session = sessionmaker(bind=self.engine)
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.getenv('BIBLE_DB', os.path.join(os.path.dirname(__file__), 'bible-sqlite.db'))
+        # Read-only engine with one tuned connection per thread (see database.py)
+        self.engine = create_readonly_engine(
+            self.db_path,
+            immutable=os.getenv('BIBLE_DB_IMMUTABLE', 'false').lower() in ('1', 'true', 'yes')
+        )
+        # Compiled statements, built once per query shape and translation
+        self._statements = {}
+        if pending_migrations(self.db_path) > 0:
+            logger.warning("Database indexes are missing, run: python database.py")
 
         # Cache book mappings
         self.book_mappings = self._initialize_book_mappings()
+        self.book_resolver = BookResolver(self.book_names, self.book_abbreviations)
+
+        # Resolved book names never change; verse payloads from SQLite are
+        # cached with a TTL and can be shared across processes via Redis.
+        self.book_cache = create_cache('book_names', maxsize=1024)
+        self.verse_cache = create_cache(
+            'verses',
+            maxsize=int(os.getenv('VERSE_CACHE_SIZE', 4096)),
+            ttl=float(os.getenv('VERSE_CACHE_TTL', 3600)),
+            shared=True
+        )
+
+        # Optional preloaded verse store: "memory" copies the tables into RAM,
+        # any other value is the path of a prebuilt file to mmap. It loads in
+        # the background; lookups use SQLite until verses_ready is set.
+        self.verse_store = None
+        self.verses_ready = threading.Event()
+        verse_store_setting = os.getenv('VERSE_STORE')
+        if verse_store_setting:
+            threading.Thread(
+                target=self._load_verse_store_quietly,
+                args=(None if verse_store_setting == 'memory' else verse_store_setting,),
+                name='verse-store-loader', daemon=True
+            ).start()
+        else:
+            self.verses_ready.set()
+
+        # Full-text search uses the fts_* tables when they have been built
+        # (python search_index.py); otherwise search_text falls back to LIKE.
+        self.search_index = SearchIndex(self.db_path)
+        if not self.search_index.translations:
+            logger.warning("No full-text search tables found, search_text will scan with LIKE")
+
+    def load_verse_store(self, path=None):
+        """Serve verse lookups from a VerseStore instead of SQLite"""
+        started = time.perf_counter()
+        if path:
+            self.verse_store = VerseStore.load(path)
+        else:
+            self.verse_store = VerseStore.from_database(self.db_path)
+        self.verses_ready.set()
+        logger.info(
+            f"Verse store ready in {time.perf_counter() - started:.2f}s: "
+            f"{len(self.verse_store.verse_ids)} verses, translations {self.verse_store.translations}"
+        )
+
+    def _load_verse_store_quietly(self, path):
+        try:
+            self.load_verse_store(path)
+        except Exception as e:
+            logger.error(f"Failed to load the verse store, serving verses from SQLite: {e}")
+            self.verses_ready.set()
 
     def _initialize_book_mappings(self):
         """Initialize book mappings from the database"""
-        session = self.Session()
-        try:
+        with self.engine.connect() as conn:
             # Get both key_english and key_abbreviations_english mappings
-            main_mappings = session.execute(
+            main_mappings = conn.execute(
                 text("SELECT b, n FROM key_english")  # Changed from 'id' to 'b'
             ).all()
-            abbr_mappings = session.execute(
+            abbr_mappings = conn.execute(
                 text("SELECT a, b FROM key_abbreviations_english")
             ).all()
+            self.translations = {table[2:] for table in translation_tables(conn.connection)}
+
+            # Keep the raw tables around for the reference parser
+            self.book_names = {r[0]: r[1] for r in main_mappings}
+            self.book_abbreviations = [(r[0], r[1]) for r in abbr_mappings]
 
             # Create a dictionary of book IDs to names and include abbreviations
             mappings = {}
@@ -33,137 +105,241 @@ class BibleService:
                     mappings[book_name.lower()] = book_id
 
             return mappings
-        finally:
-            session.close()
+
+    def _statement(self, key, build_sql):
+        """Compiled statement for key, built from build_sql() on first use"""
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = self._statements[key] = text(build_sql())
+        return statement
 
     def _normalize_book_name(self, book_name):
         """Convert book name or abbreviation to book ID"""
-        # Handle common variations
         book_name = book_name.lower().strip()
-        book_name = book_name.replace('1st', '1').replace('2nd', '2').replace('3rd', '3')
-        book_name = book_name.replace('first', '1').replace('second', '2').replace('third', '3')
-        
-        # Try direct lookup
-        book_id = self.book_mappings.get(book_name)
-        if book_id:
-            return book_id
-        
-        # Try partial matches
-        for stored_name, stored_id in self.book_mappings.items():
-            if stored_name.startswith(book_name):
-                return stored_id
-        
-        return None
+        return self.book_cache.get_or_compute(book_name, lambda: self._resolve_book_name(book_name))
+
+    def _resolve_book_name(self, book_name):
+        match = self.book_resolver.match(book_name)
+        if match.kind == 'ambiguous':
+            candidates = ', '.join(self.book_names.get(book_id, str(book_id)) for book_id in match.candidates)
+            logger.warning(f"Ambiguous book name '{book_name}', could be: {candidates}")
+        return match.book_id
+
+    def resolve_book(self, book_name):
+        """Book id for a book name or abbreviation, or None"""
+        return self._normalize_book_name(str(book_name))
 
     def get_verse(self, book, chapter, verse, translation='kjv'):
         """Get a single verse from the Bible database"""
-        session = self.Session()
-        try:
-            book_id = self._normalize_book_name(book)
-            if not book_id:
-                return None
-
-            # Select the appropriate translation table
-            table_name = f't_{translation.lower()}'
-            
-            result = session.execute(
-                text(f"""
-                SELECT ke.n as book_name, v.c as chapter, v.v as verse, v.t as text
-                FROM {table_name} v
-                JOIN key_english ke ON ke.b = v.b  # Changed from 'id' to 'b'
-                WHERE v.b = :book 
-                AND v.c = :chapter 
-                AND v.v = :verse
-                """),
-                {"book": book_id, "chapter": chapter, "verse": verse}
-            ).first()
-
-            if result:
-                return {
-                    'reference': f"{result.book_name} {result.chapter}:{result.verse}",
-                    'text': result.text,
-                    'translation': translation.upper()
-                }
+        book_id = self._normalize_book_name(book)
+        if not book_id:
             return None
-        finally:
-            session.close()
+
+        if self.verse_store and self.verse_store.has_translation(translation):
+            return self.verse_store.get_verse(book_id, chapter, verse, translation)
+
+        return self.verse_cache.get_or_compute(
+            (book_id, chapter, verse, translation.lower()),
+            lambda: self._query_verse(book_id, chapter, verse, translation)
+        )
+
+    def _query_verse(self, book_id, chapter, verse, translation):
+        translation = translation.lower()
+        if translation not in self.translations:
+            return None
+        statement = self._statement(
+            ('verse', translation),
+            lambda: f"SELECT t AS text FROM t_{translation} WHERE b = :book AND c = :chapter AND v = :verse"
+        )
+        with self.engine.connect() as conn:
+            result = conn.execute(statement, {"book": book_id, "chapter": chapter, "verse": verse}).first()
+
+        if result:
+            return {
+                'reference': f"{self.book_names.get(book_id)} {chapter}:{verse}",
+                'text': result.text,
+                'translation': translation.upper()
+            }
+        return None
+
+    def find_verse(self, book, chapter, verse, translations=DEFAULT_TRANSLATIONS):
+        """Get a verse from the first translation in order that has it"""
+        passage = self.get_verses([{'book': book, 'chapter': chapter, 'verse': verse}], translations)[0]
+        return passage['verses'][0] if passage['verses'] else None
 
     def get_verse_range(self, book, chapter, start_verse, end_verse, translation='kjv'):
         """Get a range of verses from the Bible database"""
-        session = self.Session()
-        try:
-            book_id = self._normalize_book_name(book)
+        reference = {'book': book, 'chapter': chapter, 'verse': start_verse, 'end_verse': end_verse}
+        return self.get_verses([reference], [translation])[0]['verses']
+
+    def get_verses(self, references, translations=DEFAULT_TRANSLATIONS):
+        """Look up many references across translations in one pass.
+
+        References are dicts with ``book``, ``chapter``, ``verse`` (None for
+        the whole chapter) and optional ``end_verse``. Returns one dict per
+        reference, in order, with the reference, the first translation in
+        ``translations`` that has any of its verses, and those verses.
+
+        Translations are tried in the caller's order, each from the verse
+        store if it holds it and from SQLite otherwise, falling through to the
+        next translation when one lacks the verses.
+        """
+        translations = tuple(t.lower() for t in translations)
+        results = [{'reference': ref, 'translation': None, 'verses': []} for ref in references]
+
+        spans = {}
+        for index, ref in enumerate(references):
+            book_id = self._normalize_book_name(str(ref['book']))
             if not book_id:
-                return []
-
-            # Select the appropriate translation table
-            table_name = f't_{translation.lower()}'
-            
-            results = session.execute(
-                text(f"""
-                SELECT ke.n as book_name, v.c as chapter, v.v as verse, v.t as text
-                FROM {table_name} v
-                JOIN key_english ke ON ke.b = v.b  # Changed from 'id' to 'b'
-                WHERE v.b = :book 
-                AND v.c = :chapter 
-                AND v.v BETWEEN :start_verse AND :end_verse
-                ORDER BY v.v
-                """),
-                {
-                    "book": book_id,
-                    "chapter": chapter,
-                    "start_verse": start_verse,
-                    "end_verse": end_verse
-                }
-            ).all()
+                continue
+            verse = ref.get('verse')
+            end_verse = ref.get('end_verse') or verse
+            spans[index] = (
+                book_id, int(ref['chapter']),
+                int(verse) if verse is not None else None,
+                int(end_verse) if end_verse is not None else None,
+            )
 
-            return [
-                {
-                    'reference': f"{r.book_name} {r.chapter}:{r.verse}",
-                    'text': r.text,
-                    'translation': translation.upper()
-                }
-                for r in results
-            ]
-        finally:
-            session.close()
+        store = self.verse_store
+        stored = {t for t in translations if store and store.has_translation(t)}
+
+        # Store lookups are cheap, so SQLite is only asked about references
+        # the store can't answer before the first translation it lacks
+        pending = {}
+        for index, span in spans.items():
+            for translation in translations:
+                if translation not in stored:
+                    pending[index] = span
+                    break
+                found = store.find_passage(*span, translations=(translation,))
+                if found[1]:
+                    results[index]['translation'], results[index]['verses'] = found
+                    break
+        if not pending:
+            return results
+
+        # SQLite's answer is the first of its translations with the verses,
+        # so the ones before it have none and the ones after it don't matter
+        queried = tuple(t for t in translations if t not in stored)
+        from_sqlite = self._sqlite_passages(pending, queried)
+        for index, span in pending.items():
+            winner, verses = from_sqlite[index]
+            for translation in translations:
+                if translation in stored:
+                    found = store.find_passage(*span, translations=(translation,))
+                elif winner == translation.upper():
+                    found = (winner, verses)
+                else:
+                    continue
+                if found[1]:
+                    results[index]['translation'], results[index]['verses'] = found
+                    break
+        return results
+
+    def _sqlite_passages(self, spans, translations):
+        """Cached _query_passages: index -> (winning translation, verses)"""
+        passages = {}
+        missing = {}
+        for index, span in spans.items():
+            found = self.verse_cache.get(span + (translations,))
+            if found is None:
+                missing[index] = span
+            else:
+                passages[index] = found
+        if missing:
+            for index, found in self._query_passages(missing, translations).items():
+                self.verse_cache.set(missing[index] + (translations,), found)
+                passages[index] = found
+        return passages
+
+    def _query_passages(self, spans, translations):
+        """One UNION ALL query over every translation table for all spans.
+
+        spans maps a caller's index to (book_id, chapter, start, end), with
+        start None for a whole chapter; returns index -> (winning translation, verses).
+        """
+        # Spans become ranges of packed verse ids, which are the t_* primary
+        # key, so each one is a single index range seek per translation.
+        params = {}
+        for position, (index, (book_id, chapter, start, end)) in enumerate(spans.items()):
+            params.update({
+                f"ref{position}": index,
+                f"lo{position}": pack_verse_id(book_id, chapter, 0 if start is None else start),
+                f"hi{position}": pack_verse_id(book_id, chapter, 999 if end is None else end),
+            })
+        tables = tuple(t for t in translations if t in self.translations)
+        if not tables:
+            return {index: (None, []) for index in spans}
+
+        def build_sql():
+            values = ', '.join(f"(:ref{p}, :lo{p}, :hi{p})" for p in range(len(spans)))
+            selects = ' UNION ALL '.join(
+                f"""SELECT w.ref, '{translation}' AS translation, v.b, v.c, v.v, v.t
+                FROM wanted w
+                JOIN t_{translation} v ON v.id BETWEEN w.lo AND w.hi"""
+                for translation in tables
+            )
+            return f"WITH wanted(ref, lo, hi) AS (VALUES {values}) {selects} ORDER BY 1, 5"
+
+        statement = self._statement(('passages', len(spans), tables), build_sql)
+        with self.engine.connect() as conn:
+            rows = conn.execute(statement, params).all()
+
+        found = {index: {} for index in spans}
+        for ref, translation, book_id, chapter, verse, verse_text in rows:
+            found[ref].setdefault(translation, []).append({
+                'reference': f"{self.book_names.get(book_id)} {chapter}:{verse}",
+                'text': verse_text,
+                'translation': translation.upper()
+            })
+        passages = {}
+        for index, by_translation in found.items():
+            winner = next((t for t in translations if by_translation.get(t)), None)
+            passages[index] = (winner.upper(), by_translation[winner]) if winner else (None, [])
+        return passages
+
+    def cache_stats(self):
+        """Hit/miss/eviction counters of the lookup caches"""
+        return {cache.name: cache.stats() for cache in (self.book_cache, self.verse_cache)}
+
+    def search_verses(self, query, translations=None, limit=10, offset=0, mode='all'):
+        """Ranked full-text search across one or more translations.
+
+        Supports "quoted phrases" and prefix* terms; see search_index.to_fts_query.
+        """
+        return self.search_index.search(query, translations, limit=limit, offset=offset, mode=mode)
 
     def search_text(self, search_term, translation='kjv'):
         """Search for verses containing specific text"""
-        session = self.Session()
-        try:
-            # Select the appropriate translation table
-            table_name = f't_{translation.lower()}'
-            
-            results = session.execute(
-                text(f"""
-                SELECT ke.n as book_name, v.c as chapter, v.v as verse, v.t as text
-                FROM {table_name} v
-                JOIN key_english ke ON ke.b = v.b  # Changed from 'id' to 'b'
-                WHERE v.t LIKE :search_term
-                LIMIT 10
-                """),
-                {"search_term": f"%{search_term}%"}
-            ).all()
+        if self.search_index.has_translation(translation):
+            return self.search_index.search(search_term, [translation], limit=10, mode='phrase')
 
-            return [
-                {
-                    'reference': f"{r.book_name} {r.chapter}:{r.verse}",
-                    'text': r.text,
-                    'translation': translation.upper()
-                }
-                for r in results
-            ]
-        finally:
-            session.close()
+        translation = translation.lower()
+        if translation not in self.translations:
+            return []
+        statement = self._statement(
+            ('search', translation),
+            lambda: f"SELECT b AS book_id, c AS chapter, v AS verse, t AS text FROM t_{translation} "
+                    "WHERE t LIKE :search_term LIMIT 10"
+        )
+        with self.engine.connect() as conn:
+            results = conn.execute(statement, {"search_term": f"%{search_term}%"}).all()
+
+        return [
+            {
+                'reference': f"{self.book_names.get(r.book_id)} {r.chapter}:{r.verse}",
+                'text': r.text,
+                'translation': translation.upper()
+            }
+            for r in results
+        ]
 
     def get_available_translations(self):
         """Get list of available translations"""
-        session = self.Session()
-        try:
-            results = session.execute(
+        with self.engine.connect() as conn:
+            results = conn.execute(
                 text("""
-                SELECT table, abbreviation, version
+                SELECT "table", abbreviation, version
                 FROM bible_version_key
                 """)
             ).all()
@@ -175,7 +351,5 @@ class BibleService:
                 }
                 for r in results
             ]
-        finally:
-            session.close()
 
 bible_service = BibleService()
\ No newline at end of file
@@ -0,0 +1,249 @@
+import re
+from collections import namedtuple
+
+from reference_parser import BOOKS, ORDINAL_PREFIXES, SPOKEN_ALIASES
+
+# How Whisper and other ASR engines tend to spell book names they mishear.
+# Anything within a couple of edits is already caught by fuzzy matching;
+# these are the ones that drift further (or sound like another word).
+ASR_MISSPELLINGS = {
+    2: ('exodis',),
+    5: ('duteronomy', 'deuteronomie'),
+    16: ('nehemia',),
+    19: ('sams', 'salms', 'psalmes'),
+    21: ('ecclesiastics', 'ecclesiasticus', 'ecclesiasties'),
+    23: ('isiah', 'isaih'),
+    26: ('ezekial',),
+    35: ('habakuk', 'habacuc', 'habbakuk'),
+    38: ('zacharia', 'zachariah', 'zecharia'),
+    40: ('mathew', 'matthews'),
+    50: ('philippines', 'phillipians', 'filipians'),
+    51: ('collosians', 'colossions'),
+}
+
+# Book codes in canonical order (index + 1 is the book id)
+OSIS_BOOKS = [
+    'Gen', 'Exod', 'Lev', 'Num', 'Deut', 'Josh', 'Judg', 'Ruth', '1Sam', '2Sam', '1Kgs', '2Kgs',
+    '1Chr', '2Chr', 'Ezra', 'Neh', 'Esth', 'Job', 'Ps', 'Prov', 'Eccl', 'Song', 'Isa', 'Jer',
+    'Lam', 'Ezek', 'Dan', 'Hos', 'Joel', 'Amos', 'Obad', 'Jonah', 'Mic', 'Nah', 'Hab', 'Zeph',
+    'Hag', 'Zech', 'Mal', 'Matt', 'Mark', 'Luke', 'John', 'Acts', 'Rom', '1Cor', '2Cor', 'Gal',
+    'Eph', 'Phil', 'Col', '1Thess', '2Thess', '1Tim', '2Tim', 'Titus', 'Phlm', 'Heb', 'Jas',
+    '1Pet', '2Pet', '1John', '2John', '3John', 'Jude', 'Rev',
+]
+USFM_BOOKS = [
+    'GEN', 'EXO', 'LEV', 'NUM', 'DEU', 'JOS', 'JDG', 'RUT', '1SA', '2SA', '1KI', '2KI',
+    '1CH', '2CH', 'EZR', 'NEH', 'EST', 'JOB', 'PSA', 'PRO', 'ECC', 'SNG', 'ISA', 'JER',
+    'LAM', 'EZK', 'DAN', 'HOS', 'JOL', 'AMO', 'OBA', 'JON', 'MIC', 'NAM', 'HAB', 'ZEP',
+    'HAG', 'ZEC', 'MAL', 'MAT', 'MRK', 'LUK', 'JHN', 'ACT', 'ROM', '1CO', '2CO', 'GAL',
+    'EPH', 'PHP', 'COL', '1TH', '2TH', '1TI', '2TI', 'TIT', 'PHM', 'HEB', 'JAS',
+    '1PE', '2PE', '1JN', '2JN', '3JN', 'JUD', 'REV',
+]
+# Short forms seen in JSON and plain-text Bibles that are neither OSIS nor
+# USFM codes. Where one clashes with a code above, the code wins.
+COMMON_ABBREVIATIONS = {
+    1: ('gn', 'ge'), 2: ('ex', 'exo'), 3: ('lv', 'le'), 4: ('nm', 'nu'), 5: ('dt', 'de'),
+    6: ('js', 'jsh'), 7: ('jg', 'jdgs'), 8: ('rt', 'ru'), 9: ('1sm', '1s'), 10: ('2sm', '2s'),
+    11: ('1kg', '1k'), 12: ('2kg', '2k'), 13: ('1ch', '1chron'), 14: ('2ch', '2chron'),
+    15: ('ezr',), 16: ('ne',), 17: ('es', 'et'), 18: ('jb',), 19: ('psa', 'pss'),
+    20: ('prv', 'pr'), 21: ('ec', 'qoh'), 22: ('so', 'sos', 'song of songs'), 23: ('is',),
+    24: ('jr', 'je'), 25: ('lm', 'la'), 26: ('ez', 'eze'), 27: ('dn', 'da'), 28: ('ho',),
+    29: ('jl', 'joe'), 30: ('am',), 31: ('ob',), 32: ('jnh', 'jon'), 33: ('mi', 'mc'),
+    34: ('na',), 35: ('hk',), 36: ('zp', 'zep'), 37: ('hg',), 38: ('zc', 'zec'),
+    39: ('ml',), 40: ('mt',), 41: ('mk', 'mr'), 42: ('lk', 'lu'), 43: ('jn', 'jhn'),
+    44: ('ac',), 45: ('rm', 'ro'), 46: ('1co',), 47: ('2co',), 48: ('gl', 'ga'),
+    49: ('ep',), 50: ('ph', 'pp'), 51: ('cl', 'co'), 52: ('1ts', '1th'), 53: ('2ts', '2th'),
+    54: ('1tm', '1ti'), 55: ('2tm', '2ti'), 56: ('tt', 'ti'), 57: ('phm', 'pm'),
+    58: ('hb', 'hbr'), 59: ('jm', 'jas'), 60: ('1pe', '1pt'), 61: ('2pe', '2pt'),
+    62: ('1jo', '1jn'), 63: ('2jo', '2jn'), 64: ('3jo', '3jn'), 65: ('jd', 'jud'),
+    66: ('re', 'rv'),
+}
+
+# Words that can precede a book name without being part of it
+LEADING_WORDS = (('the', 'book', 'of'), ('book', 'of'), ('the', 'gospel', 'of'), ('gospel', 'of'))
+
+# Fuzzy matching only applies to names at least this long; shorter
+# abbreviations are too close to each other to guess between.
+MIN_FUZZY_LENGTH = 4
+
+_ORDINALS = {spoken: digit for digit, spellings in ORDINAL_PREFIXES.items() for spoken in spellings}
+_JOINED_NUMBER_RE = re.compile(r'^([123])([a-z].*)$')
+
+BookMatch = namedtuple('BookMatch', ['book_id', 'kind', 'candidates'])
+BookMatch.__doc__ = """Outcome of resolving a book name.
+
+kind is 'exact', 'prefix', 'fuzzy', 'ambiguous' (book_id None, candidates
+lists the possible book ids) or None when nothing matched.
+"""
+
+
+def source_abbreviations():
+    """(abbreviation, book_id) pairs for the book codes used in Bible source files.
+
+    OSIS and USFM codes come first; a common short form is only added when
+    it doesn't clash with one of them.
+    """
+    pairs = []
+    codes = set()
+    for book_id, (osis, usfm) in enumerate(zip(OSIS_BOOKS, USFM_BOOKS), start=1):
+        for code in (osis, usfm):
+            pairs.append((code, book_id))
+            codes.add(normalize_book_key(code))
+    for book_id, abbreviations in COMMON_ABBREVIATIONS.items():
+        for abbr in abbreviations:
+            if normalize_book_key(abbr) not in codes:
+                pairs.append((abbr, book_id))
+    return pairs
+
+
+def normalize_book_key(name):
+    """Canonical lookup key: lowercase words, numbered-book prefix as a digit.
+
+    Ordinals are only rewritten as a whole leading word, so "First John"
+    becomes "1 john" while "firstborn" stays as it is.
+    """
+    tokens = name.lower().replace('.', ' ').split()
+    for words in LEADING_WORDS:
+        if len(tokens) > len(words) and tuple(tokens[:len(words)]) == words:
+            tokens = tokens[len(words):]
+            break
+    if len(tokens) > 1 and tokens[0] in _ORDINALS:
+        tokens[0] = _ORDINALS[tokens[0]]
+    elif tokens:
+        joined = _JOINED_NUMBER_RE.match(tokens[0])
+        if joined:
+            tokens[:1] = joined.groups()
+    return ' '.join(tokens)
+
+
+def _deletes(word, distance):
+    """All strings obtained by removing up to distance characters from word"""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance between a and b, or limit + 1 if it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Typos are local, so most of both strings is a shared prefix and suffix
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if not a or not b:
+        return len(a) + len(b)
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class BookResolver:
+    """Precomputed book-name lookup.
+
+    Every alias (database names and abbreviations, ordinal spellings, spoken
+    aliases and known ASR misspellings) is normalized once into an exact
+    table, a table of every prefix, and a deletion index for fuzzy matching
+    (the symmetric-delete scheme), so resolving a name is a handful of dict
+    lookups regardless of how many aliases there are.
+    """
+
+    def __init__(self, book_names=None, abbreviations=(), max_distance=2):
+        if not book_names:
+            book_names = {book_id: name for book_id, (name, _) in enumerate(BOOKS, start=1)}
+        self.book_names = dict(book_names)
+        self.max_distance = max_distance
+
+        names = {}
+        for book_id, name in self.book_names.items():
+            names[normalize_book_key(name)] = {book_id}
+            for alias in SPOKEN_ALIASES.get(book_id, ()) + ASR_MISSPELLINGS.get(book_id, ()):
+                names.setdefault(normalize_book_key(alias), set()).add(book_id)
+
+        # Full names win over abbreviations that collide with them
+        self._exact = dict(names)
+        for abbr, book_id in abbreviations:
+            if book_id in self.book_names:
+                key = normalize_book_key(abbr)
+                if key and key not in names:
+                    self._exact.setdefault(key, set()).add(book_id)
+
+        self._prefixes = {}
+        for key, book_ids in self._exact.items():
+            for end in range(1, len(key) + 1):
+                self._prefixes.setdefault(key[:end], set()).update(book_ids)
+
+        # Answers for exact and prefix keys are built once up front
+        self._exact = {key: self._single(book_ids, 'exact') for key, book_ids in self._exact.items()}
+        self._prefixes = {key: self._single(book_ids, 'prefix') for key, book_ids in self._prefixes.items()}
+
+        self._deletions = {}
+        for key in names:
+            if len(key) >= MIN_FUZZY_LENGTH:
+                for variant in _deletes(key, self._allowed_distance(key)):
+                    self._deletions.setdefault(variant, set()).add(key)
+        self._fuzzy_names = names
+
+    def _allowed_distance(self, key):
+        return min(self.max_distance, 1 if len(key) < 6 else 2)
+
+    def match(self, name):
+        """Resolve a name to a BookMatch"""
+        # Most names arrive already in canonical form ("John", "1 Kings")
+        found = self._exact.get(name.lower())
+        if found:
+            return found
+
+        key = normalize_book_key(name)
+        if not key:
+            return BookMatch(None, None, ())
+        found = self._exact.get(key) or self._prefixes.get(key)
+        if found:
+            return found
+
+        if len(key) >= MIN_FUZZY_LENGTH:
+            return self._fuzzy(key)
+        return BookMatch(None, None, ())
+
+    def resolve(self, name):
+        """Book id for name, or None if it is unknown or ambiguous"""
+        return self.match(name).book_id
+
+    def _single(self, book_ids, kind):
+        if len(book_ids) == 1:
+            return BookMatch(next(iter(book_ids)), kind, tuple(book_ids))
+        return BookMatch(None, 'ambiguous', tuple(sorted(book_ids)))
+
+    def _fuzzy(self, key):
+        # One edit first: anything that close is found from single deletions
+        # of the key, and only misses pay for the two-edit neighbourhood.
+        for limit in range(1, self._allowed_distance(key) + 1):
+            candidates = set()
+            for variant in _deletes(key, limit):
+                candidates.update(self._deletions.get(variant, ()))
+
+            book_ids = set()
+            for candidate in candidates:
+                candidate_limit = min(limit, self._allowed_distance(candidate))
+                if edit_distance(key, candidate, candidate_limit) <= candidate_limit:
+                    book_ids.update(self._fuzzy_names[candidate])
+            if book_ids:
+                return self._single(book_ids, 'fuzzy')
+        return BookMatch(None, None, ())
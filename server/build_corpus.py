@@ -0,0 +1,400 @@
+"""Build bible-sqlite.db and a packed verse snapshot from local source files.
+
+Run from the server directory:
+
+    python build_corpus.py --source kjv=sources/kjv.osis.xml --source web=sources/web_usfm \\
+        --source bbe=sources/bbe.json --out bible-sqlite.db --snapshot verses.bvs
+
+Each --source is TRANSLATION=PATH. Supported sources:
+- OSIS XML (.xml/.osis), container or milestone <verse> elements
+- USFM, a directory of book files or a single file (.usfm/.sfm). Front/back matter
+  and deuterocanonical books are skipped; any other unknown \\id stops the build.
+- JSON (.json): a list of books, each {"name" or "abbrev", "chapters": [[text, ...], ...]}
+  or with chapters as {"chapter": n, "verses": [{"verse": n, "text": s}]}; or a flat
+  list of {"book", "chapter", "verse", "text"} records. Book names may be full names or
+  OSIS, USFM or common abbreviations; a list of exactly 66 books is taken in canonical
+  order. The build stops if any book can't be identified.
+
+USFM books are parsed in parallel in a process pool; OSIS and JSON sources
+are parsed in the main process as they are read, since handing their books
+to workers costs as much as parsing them. Everything is inserted in one
+transaction, then the indexes and FTS tables are built and the
+snapshot is written. The database is built next to --out and renamed into
+place at the end, so a running server keeps reading the old file meanwhile.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from book_resolver import OSIS_BOOKS, USFM_BOOKS, BookResolver, source_abbreviations
+from database import migrate
+from reference_parser import BOOKS
+from search_index import build_search_index
+from verse_store import VerseStore, pack_verse_id
+
+logger = logging.getLogger(__name__)
+
+OSIS_IDS = {code: book_id for book_id, code in enumerate(OSIS_BOOKS, start=1)}
+USFM_IDS = {code: book_id for book_id, code in enumerate(USFM_BOOKS, start=1)}
+# USFM front/back matter and deuterocanonical books, which are left out on purpose
+USFM_NON_CANONICAL = {
+    'FRT', 'BAK', 'OTH', 'INT', 'CNC', 'GLO', 'TDX', 'NDX', 'XXA', 'XXB', 'XXC', 'XXD', 'XXE', 'XXF', 'XXG',
+    'TOB', 'JDT', 'ESG', 'WIS', 'SIR', 'BAR', 'LJE', 'S3Y', 'SUS', 'BEL', '1MA', '2MA', '3MA', '4MA',
+    '1ES', '2ES', 'MAN', 'PS2', 'ODA', 'PSS', 'EZA', '5EZ', '6EZ', 'DAG', 'PS3', '2BA', 'LBA', 'JUB',
+    'ENO', '1MQ', '2MQ', '3MQ', 'REP', '4BA', 'LAO',
+}
+
+# key_genre_english, and the first book id of each genre
+GENRES = [
+    (1, 'Law', 1), (2, 'History', 6), (3, 'Wisdom', 18), (4, 'Prophets', 23),
+    (5, 'Gospels', 40), (6, 'Acts', 44), (7, 'Epistles', 45), (8, 'Apocalyptic', 66),
+]
+
+# OSIS elements whose content is not verse text
+OSIS_SKIP = {'note', 'title', 'rdg', 'reference'}
+
+_USFM_SKIP_RE = re.compile(r'\\(f|fe|x)\s.*?\\\1\*', re.DOTALL)
+_USFM_WORD_RE = re.compile(r'\\\+?w\s+([^|\\]*)(?:\|[^\\]*)?\\\+?w\*')
+_USFM_MARKER_RE = re.compile(r'\\\+?[a-z]+\d*\*?\s?')
+_USFM_SPLIT_RE = re.compile(r'\\(c|v)\s+(\d+)[^\s\\]*\s?')
+_USFM_ID_RE = re.compile(r'\\id\s+(\w+)')
+
+
+def _clean(text):
+    return ' '.join(text.split())
+
+
+def _genre(book_id):
+    return max(genre for genre, _, first in GENRES if first <= book_id)
+
+
+# --- Parsers. Each returns (book_id, [(chapter, verse, text)]); USFM books run in worker processes.
+
+def parse_usfm_book(path):
+    """(None, []) for a non-canonical book; an unknown or missing \\id is an error"""
+    with open(path, encoding='utf-8-sig') as f:
+        source = f.read()
+    match = _USFM_ID_RE.search(source)
+    if not match:
+        raise ValueError(f"{path}: no \\id line, can't tell which book this is")
+    code = match.group(1).upper()
+    if code in USFM_NON_CANONICAL:
+        return None, []
+    book_id = USFM_IDS.get(code)
+    if book_id is None:
+        raise ValueError(f"{path}: unknown book \\id {match.group(1)}")
+
+    source = _USFM_SKIP_RE.sub(' ', source)
+    source = _USFM_WORD_RE.sub(r'\1', source)
+    parts = _USFM_SPLIT_RE.split(source)
+    verses = []
+    chapter = None
+    # parts: [preamble, marker, number, text, marker, number, text, ...]
+    for i in range(1, len(parts) - 2, 3):
+        marker, number, text = parts[i], int(parts[i + 1]), parts[i + 2]
+        if marker == 'c':
+            chapter = number
+        elif chapter is not None:
+            text = _clean(_USFM_MARKER_RE.sub(' ', text))
+            if text:
+                verses.append((chapter, number, text))
+    return book_id, verses
+
+
+def _local(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_osis_book(root):
+    book_id = OSIS_IDS.get(root.get('osisID', '').split('.')[0])
+    if book_id is None:
+        return None, []
+
+    texts = {}
+    order = []
+    current = [None]
+
+    def add(text):
+        if text and current[0] is not None:
+            texts[current[0]].append(text)
+
+    def start(osis_id):
+        # "Gen.1.1 Gen.1.2" marks a bridged verse; file it under the first
+        osis_id = osis_id.split()[0]
+        if osis_id not in texts:
+            texts[osis_id] = []
+            order.append(osis_id)
+        current[0] = osis_id
+
+    def walk(elem):
+        tag = _local(elem.tag)
+        if tag in OSIS_SKIP:
+            return
+        if tag == 'verse' and elem.get('eID'):
+            current[0] = None
+        elif tag == 'verse' and elem.get('sID'):
+            start(elem.get('osisID') or elem.get('sID'))
+        elif tag == 'verse' and elem.get('osisID'):
+            start(elem.get('osisID'))
+            add(elem.text)
+            for child in elem:
+                walk(child)
+                add(child.tail)
+            current[0] = None
+            return
+        add(elem.text)
+        for child in elem:
+            walk(child)
+            add(child.tail)
+
+    walk(root)
+    verses = []
+    for osis_id in order:
+        parts = osis_id.split('.')
+        text = _clean(''.join(texts[osis_id]))
+        if len(parts) == 3 and text:
+            verses.append((int(parts[1]), int(parts[2]), text))
+    return book_id, verses
+
+
+def parse_json_book(book):
+    book_id, chapters = book
+    verses = []
+    for index, chapter in enumerate(chapters, start=1):
+        if isinstance(chapter, dict):
+            number = int(chapter.get('chapter', index))
+            for item in chapter.get('verses', []):
+                text = _clean(item.get('text', ''))
+                if text:
+                    verses.append((number, int(item['verse']), text))
+        else:
+            for verse, text in enumerate(chapter, start=1):
+                text = _clean(text)
+                if text:
+                    verses.append((index, verse, text))
+    return book_id, verses
+
+
+# --- Splitting a source into books (main process)
+
+def _osis_books(path):
+    # The book element is already parsed by the time iterparse hands it over,
+    # so it is read here rather than serialized for a worker to parse again
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if _local(elem.tag) == 'div' and elem.get('type') == 'book':
+            yield parse_osis_book(elem)
+            elem.clear()
+
+
+def _usfm_paths(path):
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(('.usfm', '.sfm')))
+        return [os.path.join(path, name) for name in names]
+    return [path]
+
+
+def _json_books(path, resolver):
+    """(book_id, chapters) for each book of a JSON source"""
+    with open(path, encoding='utf-8-sig') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('books', [])
+
+    books = []
+    skipped = set()
+    if data and 'text' in data[0]:
+        # Flat verse records: group them into books first
+        grouped = {}
+        for record in data:
+            book = record['book']
+            book_id = book if isinstance(book, int) else resolver.resolve(str(book))
+            if not book_id:
+                skipped.add(str(book))
+                continue
+            chapter = grouped.setdefault(book_id, {}).setdefault(int(record['chapter']), [])
+            chapter.append({'verse': record['verse'], 'text': record['text']})
+        for book_id, chapters in grouped.items():
+            books.append((book_id, [{'chapter': c, 'verses': v} for c, v in chapters.items()]))
+    else:
+        # A list of exactly 66 books is a whole canon in order, so a book's
+        # position is more reliable than whatever abbreviation it carries
+        canonical = len(data) == len(BOOKS)
+        for index, book in enumerate(data, start=1):
+            name = book.get('name') or book.get('book') or book.get('abbrev')
+            book_id = resolver.resolve(str(name)) if name else index
+            if canonical and book_id != index:
+                if book_id:
+                    logger.warning(f"{path}: book {index} is named {name!r}, using its position")
+                book_id = index
+            if book_id:
+                books.append((book_id, book.get('chapters', [])))
+            else:
+                skipped.add(str(name))
+
+    if skipped:
+        raise ValueError(f"{path}: don't know which books these are: {', '.join(sorted(skipped))}")
+    return books
+
+
+def _is_usfm(path):
+    return os.path.isdir(path) or path.lower().endswith(('.usfm', '.sfm'))
+
+
+def read_books(path, resolver):
+    """(book_id, verses) for each book of an OSIS or JSON source, parsed in this process"""
+    lower = path.lower()
+    if lower.endswith(('.xml', '.osis')):
+        return _osis_books(path)
+    if lower.endswith('.json'):
+        return map(parse_json_book, _json_books(path, resolver))
+    raise ValueError(f"Don't know how to read {path}, expected OSIS .xml, USFM or .json")
+
+
+def parse_sources(sources, workers):
+    """Parse every translation -> {translation: {packed_id: text}}"""
+    resolver = BookResolver(abbreviations=source_abbreviations())
+    texts = {translation: {} for translation, _ in sources}
+    usfm = []
+    for translation, path in sources:
+        if _is_usfm(path):
+            usfm.extend((translation, book_path) for book_path in _usfm_paths(path))
+        else:
+            for book_id, verses in read_books(path, resolver):
+                _collect(texts[translation], book_id, verses)
+
+    paths = [book_path for _, book_path in usfm]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_usfm_book, paths, chunksize=4))
+    else:
+        results = map(parse_usfm_book, paths)
+    for (translation, book_path), (book_id, verses) in zip(usfm, results):
+        if book_id is None:
+            logger.info(f"Skipping {book_path}, not one of the 66 books")
+        _collect(texts[translation], book_id, verses)
+    return texts
+
+
+def _collect(by_id, book_id, verses):
+    if book_id is None:
+        return
+    for chapter, verse, text in verses:
+        by_id[pack_verse_id(book_id, chapter, verse)] = text
+
+
+def write_database(path, texts, book_names):
+    """Create the scrollmapper schema and bulk insert everything in one transaction"""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        with conn:
+            conn.execute("CREATE TABLE key_english (b INTEGER PRIMARY KEY, n TEXT NOT NULL, t TEXT NOT NULL, g INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE key_genre_english (g INTEGER PRIMARY KEY, n TEXT NOT NULL)")
+            conn.execute("CREATE TABLE key_abbreviations_english (id INTEGER PRIMARY KEY, a TEXT NOT NULL, b INTEGER NOT NULL, p INTEGER)")
+            conn.execute(
+                'CREATE TABLE bible_version_key (id INTEGER PRIMARY KEY, "table" TEXT NOT NULL, '
+                'abbreviation TEXT NOT NULL, language TEXT, version TEXT)'
+            )
+            conn.executemany(
+                "INSERT INTO key_english VALUES (?, ?, ?, ?)",
+                [(b, n, 'OT' if b < 40 else 'NT', _genre(b)) for b, n in book_names.items()]
+            )
+            conn.executemany("INSERT INTO key_genre_english VALUES (?, ?)", [(g, n) for g, n, _ in GENRES])
+            # OSIS ids are the primary abbreviations; USFM codes are added where they differ
+            abbreviations = []
+            for book_id in book_names:
+                osis, usfm = OSIS_BOOKS[book_id - 1], USFM_BOOKS[book_id - 1].title()
+                abbreviations.append((osis, book_id, 1))
+                if usfm.lower() != osis.lower():
+                    abbreviations.append((usfm, book_id, 0))
+            conn.executemany("INSERT INTO key_abbreviations_english (a, b, p) VALUES (?, ?, ?)", abbreviations)
+
+            for version_id, (translation, by_id) in enumerate(texts.items(), start=1):
+                conn.execute(
+                    f"CREATE TABLE t_{translation} (id INTEGER PRIMARY KEY, b INTEGER NOT NULL, "
+                    f"c INTEGER NOT NULL, v INTEGER NOT NULL, t TEXT NOT NULL)"
+                )
+                conn.executemany(
+                    f"INSERT INTO t_{translation} VALUES (?, ?, ?, ?, ?)",
+                    ((i, i // 1000000, i // 1000 % 1000, i % 1000, by_id[i]) for i in sorted(by_id))
+                )
+                conn.execute(
+                    'INSERT INTO bible_version_key (id, "table", abbreviation, language, version) VALUES (?, ?, ?, ?, ?)',
+                    (version_id, f't_{translation}', translation.upper(), 'english', translation.upper())
+                )
+    finally:
+        conn.close()
+
+
+def build(sources, out, snapshot=None, workers=None):
+    """Run the whole pipeline; returns {stage: seconds}"""
+    timings = {}
+    started = time.perf_counter()
+
+    def stage(name):
+        nonlocal started
+        now = time.perf_counter()
+        timings[name] = now - started
+        started = now
+
+    texts = parse_sources(sources, workers or os.cpu_count() or 1)
+    stage('parse')
+    for translation, by_id in texts.items():
+        if not by_id:
+            raise ValueError(f"No verses found for {translation}")
+
+    book_names = {book_id: name for book_id, (name, _) in enumerate(BOOKS, start=1)}
+    building = f"{out}.building"
+    if os.path.exists(building):
+        os.remove(building)
+    write_database(building, texts, book_names)
+    stage('insert')
+
+    migrate(building)
+    stage('indexes')
+    build_search_index(building, list(texts))
+    stage('fts')
+    os.replace(building, out)
+
+    if snapshot:
+        VerseStore.from_texts(book_names, texts).save(snapshot)
+        stage('snapshot')
+    return texts, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', action='append', required=True, metavar='TRANSLATION=PATH')
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(__file__), 'bible-sqlite.db'))
+    parser.add_argument('--snapshot', help='also write a packed VerseStore file (e.g. verses.bvs)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='USFM parser processes (1 = no pool)')
+    args = parser.parse_args()
+
+    sources = []
+    for source in args.source:
+        translation, sep, path = source.partition('=')
+        if not sep or not translation.isalnum():
+            parser.error(f"--source must be TRANSLATION=PATH, got {source!r}")
+        sources.append((translation.lower(), path))
+
+    logging.basicConfig(level=logging.INFO)
+    texts, timings = build(sources, args.out, args.snapshot, args.workers)
+
+    for translation, by_id in texts.items():
+        print(f"t_{translation}: {len(by_id)} verses")
+    for name, seconds in timings.items():
+        print(f"{name:<10} {seconds:8.2f}s")
+    print(f"{'total':<10} {sum(timings.values()):8.2f}s  ->  {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB)")
+    if args.snapshot:
+        print(f"snapshot   {args.snapshot} ({os.path.getsize(args.snapshot) / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
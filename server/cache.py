@@ -0,0 +1,150 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded LRU cache with an optional time-to-live per entry.
+
+    ``None`` is a valid cached value, so "no such verse" answers are cached
+    too. A plain lock guards the dict: critical sections never yield, which
+    makes the cache safe for both greenthreads and tpool worker threads.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute() and caching its result on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class RedisCache(LRUCache):
+    """LRU cache backed by Redis so several server processes share results.
+
+    The local LRU stays in front as a first level; on a local miss the value
+    is fetched from Redis (and kept locally), and every set is written
+    through with the TTL. Redis errors are logged and treated as misses, so
+    a Redis outage only costs cache hits.
+    """
+
+    def __init__(self, name, url, maxsize=1024, ttl=None):
+        import redis
+
+        super().__init__(name, maxsize, ttl)
+        self.client = redis.Redis.from_url(url)
+        self.prefix = f"bible-app:{name}:"
+        self.shared_hits = 0
+
+    def _redis_key(self, key):
+        return self.prefix + repr(key)
+
+    def get(self, key, default=None):
+        value = super().get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            payload = self.client.get(self._redis_key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache {self.name} unavailable: {e}")
+            return default
+        if payload is None:
+            return default
+        value = pickle.loads(payload)
+        self.shared_hits += 1
+        super().set(key, value)
+        return value
+
+    def set(self, key, value):
+        super().set(key, value)
+        try:
+            self.client.set(self._redis_key(key), pickle.dumps(value), ex=int(self.ttl) if self.ttl else None)
+        except Exception as e:
+            logger.warning(f"Redis cache {self.name} unavailable: {e}")
+
+    def clear(self):
+        super().clear()
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + '*'))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Redis cache {self.name} unavailable: {e}")
+
+    def stats(self):
+        stats = super().stats()
+        stats['shared_hits'] = self.shared_hits
+        return stats
+
+
+def create_cache(name, maxsize=1024, ttl=None, shared=False):
+    """Build a cache; shared caches use Redis when CACHE_REDIS_URL is set"""
+    redis_url = os.getenv('CACHE_REDIS_URL')
+    if shared and redis_url:
+        try:
+            return RedisCache(name, redis_url, maxsize, ttl)
+        except ImportError:
+            logger.warning("redis is not installed, keeping the cache in-process")
+    return LRUCache(name, maxsize, ttl)
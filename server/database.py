@@ -0,0 +1,117 @@
+import argparse
+import logging
+import os
+import sqlite3
+import time
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import SingletonThreadPool
+
+logger = logging.getLogger(__name__)
+
+# Read-side pragmas applied to every pooled connection
+MMAP_SIZE = 256 * 1024 * 1024
+CACHE_SIZE_KB = 64 * 1024
+STATEMENT_CACHE_SIZE = 256
+
+# Translations loaded, indexed and looked up when none are named
+DEFAULT_TRANSLATIONS = ('kjv', 'asv', 'web', 'ylt', 'bbe')
+
+
+def create_readonly_engine(db_path, immutable=False):
+    """SQLAlchemy engine over a read-only SQLite file, one pooled connection per thread.
+
+    ``immutable`` tells SQLite the file never changes while the server runs,
+    which skips file locking altogether; leave it off if the database may be
+    rebuilt underneath a running server.
+    """
+    uri = f"file:{quote(os.path.abspath(db_path))}?mode=ro{'&immutable=1' if immutable else ''}&uri=true"
+    engine = create_engine(
+        f"sqlite:///{uri}",
+        poolclass=SingletonThreadPool,
+        # Connections past this many threads get closed, even if still in use
+        pool_size=64,
+        connect_args={'check_same_thread': False, 'cached_statements': STATEMENT_CACHE_SIZE},
+    )
+
+    @event.listens_for(engine, 'connect')
+    def configure(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA query_only = ON")
+        cursor.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+        cursor.close()
+
+    return engine
+
+
+def translation_tables(conn):
+    """Names of the t_* verse tables in a sqlite3 connection"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 't\\_%' ESCAPE '\\'")
+    return sorted(name for (name,) in rows)
+
+
+def existing_translations(conn, translations):
+    """The given translations that have a t_* table, in order; warns about the rest"""
+    available = {table[2:] for table in translation_tables(conn)}
+    for translation in translations:
+        if translation not in available:
+            logger.warning(f"Translation table t_{translation} not found, skipping")
+    return [translation for translation in translations if translation in available]
+
+
+def _add_verse_indexes(conn):
+    # Lookups filter on (b, c, v); the rowid rides along in every index entry
+    for table in translation_tables(conn):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_bcv ON {table} (b, c, v)")
+
+
+def _analyze(conn):
+    conn.execute("ANALYZE")
+
+
+# Schema migrations in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    ('(b, c, v) indexes on every t_* table', _add_verse_indexes),
+    ('planner statistics', _analyze),
+]
+
+
+def migrate(db_path):
+    """Apply pending migrations to the database file; returns how many ran"""
+    conn = sqlite3.connect(db_path)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, (description, apply) in enumerate(MIGRATIONS[version:], start=version + 1):
+            started = time.perf_counter()
+            with conn:
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+            logger.info(f"Migration {number} ({description}) applied in {time.perf_counter() - started:.2f}s")
+        return len(MIGRATIONS) - version
+    finally:
+        conn.close()
+
+
+def pending_migrations(db_path):
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        return len(MIGRATIONS) - conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply schema migrations to the Bible database")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), 'bible-sqlite.db'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    applied = migrate(args.db)
+    print(f"{args.db}: {applied} migration(s) applied, schema version {len(MIGRATIONS)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+import logging
+import time
+from collections import deque
+
+import eventlet
+from eventlet import tpool
+from eventlet.event import Event
+from eventlet.semaphore import Semaphore
+
+logger = logging.getLogger(__name__)
+
+
+class JobDropped(Exception):
+    """Raised to a waiter whose job was discarded by backpressure"""
+
+
+class _Job:
+    __slots__ = ('session_id', 'key', 'fn', 'args', 'event', 'submitted')
+
+    def __init__(self, session_id, key, fn, args):
+        self.session_id = session_id
+        self.key = key
+        self.fn = fn
+        self.args = args
+        self.event = Event()
+        self.submitted = time.monotonic()
+
+
+class InferenceExecutor:
+    """Fair, bounded queue in front of the model-owning workers.
+
+    Jobs are queued per session and served round robin, so one busy client
+    cannot starve the others, and at most one job per session runs at a time.
+    Each worker is a greenthread that hands the blocking call to a native
+    thread (eventlet.tpool), so the hub keeps serving sockets meanwhile.
+
+    Backpressure: submitting a job whose ``key`` matches a job the session
+    already has queued is coalesced into it (``submit`` returns None), and
+    when a session or the whole queue is over its limit the oldest queued job
+    is dropped and its waiter gets ``JobDropped``.
+    """
+
+    def __init__(self, workers=1, max_queue=32, max_session_jobs=2):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_session_jobs = max_session_jobs
+
+        self._queues = {}
+        self._order = deque()
+        self._busy = set()
+        self._wakeups = Semaphore(0)
+        self.depth = 0
+
+        self.submitted = 0
+        self.completed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.wait_times = deque(maxlen=500)
+        self.run_times = deque(maxlen=500)
+
+    def start(self):
+        for _ in range(self.workers):
+            eventlet.spawn(self._worker)
+
+    def submit(self, session_id, fn, *args, key=None):
+        """Queue fn(*args) for a session. Returns the job's Event, or None if coalesced."""
+        queue = self._queues.get(session_id)
+        if key is not None and queue:
+            for job in queue:
+                if job.key == key:
+                    self.coalesced += 1
+                    return None
+
+        if queue and len(queue) >= self.max_session_jobs:
+            self._drop(session_id)
+        elif self.depth >= self.max_queue:
+            self._drop(max(self._queues, key=lambda s: len(self._queues[s])))
+
+        queue = self._queues.get(session_id)
+        if queue is None:
+            queue = self._queues[session_id] = deque()
+            self._order.append(session_id)
+        job = _Job(session_id, key, fn, args)
+        queue.append(job)
+        self.depth += 1
+        self.submitted += 1
+        self._wakeups.release()
+        return job.event
+
+    def run(self, session_id, fn, *args, key=None):
+        """Submit and wait for the result (None if coalesced into a queued job)"""
+        event = self.submit(session_id, fn, *args, key=key)
+        return event.wait() if event is not None else None
+
+    def cancel_session(self, session_id):
+        """Drop every queued job of a session, e.g. on disconnect"""
+        while session_id in self._queues:
+            self._drop(session_id)
+
+    def _drop(self, session_id):
+        queue = self._queues[session_id]
+        job = queue.popleft()
+        self.depth -= 1
+        self.dropped += 1
+        if not queue:
+            del self._queues[session_id]
+            self._order.remove(session_id)
+        job.event.send_exception(JobDropped(f"Dropped stale job for {session_id}"))
+
+    def _next_job(self):
+        """Pop the next job round robin, skipping sessions that already have one running"""
+        for _ in range(len(self._order)):
+            session_id = self._order.popleft()
+            if session_id in self._busy:
+                self._order.append(session_id)
+                continue
+            queue = self._queues[session_id]
+            job = queue.popleft()
+            self.depth -= 1
+            if queue:
+                self._order.append(session_id)
+            else:
+                del self._queues[session_id]
+            return job
+        return None
+
+    def _worker(self):
+        while True:
+            self._wakeups.acquire()
+            job = self._next_job()
+            if job is None:
+                continue
+
+            started = time.monotonic()
+            self.wait_times.append(started - job.submitted)
+            self._busy.add(job.session_id)
+            try:
+                result = tpool.execute(job.fn, *job.args)
+            except Exception as e:
+                logger.error(f"Inference job for {job.session_id} failed: {e}")
+                job.event.send_exception(e)
+            else:
+                job.event.send(result)
+            finally:
+                self._busy.discard(job.session_id)
+                self.completed += 1
+                self.run_times.append(time.monotonic() - started)
+                if job.session_id in self._queues:
+                    # Wake a worker for the jobs that were skipped while this one ran
+                    self._wakeups.release()
+
+    def stats(self):
+        """Queue depth, counters and wait/run time percentiles in seconds"""
+        def percentile(samples, pct):
+            if not samples:
+                return 0.0
+            ordered = sorted(samples)
+            return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+        return {
+            'queue_depth': self.depth,
+            'running': len(self._busy),
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'wait_p50': percentile(self.wait_times, 50),
+            'wait_p95': percentile(self.wait_times, 95),
+            'run_p50': percentile(self.run_times, 50),
+        }
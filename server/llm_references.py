@@ -0,0 +1,50 @@
+import json
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TEMPLATE = """Extract all Bible references from the text. Return ONLY valid Bible references in JSON format.
+        Text: {text}
+        Return format:
+        {{"references": [
+            {{"book": "BookName", "chapter": Number, "verse": Number}}
+        ]}}
+        Rules:
+        1. Handle both formal ("John 3:16") and informal ("John chapter 3 verse 16") formats
+        2. Convert ordinal words to numbers ("First John" → "1 John")
+        3. Handle chapter and verse mentioned separately ("reading from Genesis chapter one verse one")
+        4. Use proper book name format ("1 John" not "First John" or "1st John")
+        
+        Examples:
+        - "John 3:16" → {{"references": [{{"book": "John", "chapter": 3, "verse": 16}}]}}
+        - "First John chapter 2 verse 15" → {{"references": [{{"book": "1 John", "chapter": 2, "verse": 15}}]}}
+        - "reading from Genesis chapter one verse one" → {{"references": [{{"book": "Genesis", "chapter": 1, "verse": 1}}]}}
+        - "Second Chronicles 7:14" → {{"references": [{{"book": "2 Chronicles", "chapter": 7, "verse": 14}}]}}
+        - "Third John verse 4" → {{"references": [{{"book": "3 John", "chapter": 1, "verse": 4}}]}}
+        
+        Note: If no valid Bible reference is found, return an empty references array.
+        """
+
+
+def extract_references_llm(model, text):
+    """Ask a Gemini model for the Bible references in text"""
+    try:
+        logger.debug(f"Extracting Bible references with LLM from: {text}")
+        response = model.generate_content(PROMPT_TEMPLATE.format(text=text))
+        try:
+            result = json.loads(response.text)
+            logger.info(f"Extracted references: {result}")
+            return result
+        except json.JSONDecodeError:
+            # If the response isn't valid JSON, try to extract just the JSON part
+            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
+            if json_match:
+                result = json.loads(json_match.group())
+                logger.info(f"Extracted references (after cleanup): {result}")
+                return result
+            logger.warning("No valid references found in text")
+            return {"references": []}
+    except Exception as e:
+        logger.error(f"Error extracting references: {e}")
+        return {"references": [], "error": str(e)}
@@ -0,0 +1,279 @@
+"""Queues shared by the processes of a multi-worker deployment (see serve.py).
+
+Two things travel between processes: ASR jobs (socket workers push audio,
+ASR workers pop it and push the text back on a per-job reply queue) and
+Socket.IO's pub/sub messages, so any worker can emit to any client.
+
+Both run over Redis (``redis://...``) or, on a single machine without
+Redis, over a small local broker (``local://127.0.0.1:6399``) that this
+module serves with ``python message_queue.py``.
+
+Messages are pickled, so whoever can write to the queue can run code in
+every worker. The local broker only falls back to its built-in key on a
+loopback address; anywhere else QUEUE_AUTHKEY must be set.
+"""
+import argparse
+import ipaddress
+import logging
+import math
+import os
+import pickle
+import queue
+import threading
+import time
+import uuid
+from multiprocessing.managers import BaseManager
+from urllib.parse import urlparse
+
+import socketio
+from eventlet import tpool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCAL_ADDRESS = ('127.0.0.1', 6399)
+KEY_PREFIX = 'bible-app:'
+# Queue the socket workers push transcription jobs onto
+ASR_JOB_QUEUE = 'asr:jobs'
+# How often the local broker deletes queues whose TTL has passed
+SWEEP_INTERVAL = 10.0
+
+
+def _is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def broker_authkey(host):
+    """Key the local broker on host is served and reached with; ValueError if it needs QUEUE_AUTHKEY"""
+    key = os.getenv('QUEUE_AUTHKEY')
+    if key:
+        return key.encode()
+    if not _is_loopback(host):
+        raise ValueError(
+            f"Set QUEUE_AUTHKEY to a shared secret to use a queue broker on {host or 'every interface'}: "
+            f"its messages are pickled, so anyone who can reach it could run code in the workers"
+        )
+    return b'bible-app'
+
+
+def _address(url):
+    parsed = urlparse(url)
+    return (parsed.hostname or DEFAULT_LOCAL_ADDRESS[0], parsed.port or DEFAULT_LOCAL_ADDRESS[1])
+
+
+class Broker:
+    """Named FIFO queues and fan-out channels held in the broker process"""
+
+    def __init__(self):
+        self._queues = {}
+        self._channels = {}
+        self._expiry = {}
+        self._next_sweep = time.monotonic() + SWEEP_INTERVAL
+        self._lock = threading.Lock()
+
+    def _queue(self, name):
+        with self._lock:
+            q = self._queues.get(name)
+            if q is None:
+                q = self._queues[name] = queue.Queue()
+            return q
+
+    def push(self, name, item, ttl=None):
+        """Append item; with ttl, the queue is deleted that many seconds later unless discarded first"""
+        self._queue(name).put(item)
+        now = time.monotonic()
+        with self._lock:
+            if ttl is not None:
+                self._expiry[name] = now + ttl
+            if now >= self._next_sweep:
+                self._next_sweep = now + SWEEP_INTERVAL
+                for expired in [n for n, deadline in self._expiry.items() if deadline <= now]:
+                    del self._expiry[expired]
+                    self._queues.pop(expired, None)
+
+    def pop(self, name, timeout=None):
+        try:
+            return self._queue(name).get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def pop_nowait(self, name):
+        try:
+            return self._queue(name).get_nowait()
+        except queue.Empty:
+            return None
+
+    def discard(self, name):
+        with self._lock:
+            self._queues.pop(name, None)
+            self._expiry.pop(name, None)
+
+    def subscribe(self, channel):
+        """Register a subscriber; returns the name of the queue its messages arrive on"""
+        name = f"{channel}:{uuid.uuid4().hex}"
+        self._queue(name)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(name)
+        return name
+
+    def unsubscribe(self, channel, name):
+        with self._lock:
+            self._channels.get(channel, set()).discard(name)
+            self._queues.pop(name, None)
+
+    def publish(self, channel, item):
+        with self._lock:
+            names = list(self._channels.get(channel, ()))
+        for name in names:
+            self._queue(name).put(item)
+
+
+class BrokerManager(BaseManager):
+    pass
+
+
+_broker = None
+
+
+def _get_broker():
+    return _broker
+
+
+BrokerManager.register('get_broker', callable=_get_broker)
+
+
+def serve_broker(address=DEFAULT_LOCAL_ADDRESS):
+    """Run the local broker in this process until it is killed"""
+    global _broker
+    _broker = Broker()
+    manager = BrokerManager(address=address, authkey=broker_authkey(address[0]))
+    server = manager.get_server()
+    logger.info(f"Queue broker listening on {address[0]}:{address[1]}")
+    server.serve_forever()
+
+
+def connect_broker(url):
+    address = _address(url)
+    manager = BrokerManager(address=address, authkey=broker_authkey(address[0]))
+    manager.connect()
+    return manager.get_broker()
+
+
+class LocalQueue:
+    """Job queues on the local broker. Each thread talks over its own connection."""
+
+    def __init__(self, url):
+        self.url = url
+        self._local = threading.local()
+        self._broker()
+
+    def _broker(self):
+        broker = getattr(self._local, 'broker', None)
+        if broker is None:
+            broker = self._local.broker = connect_broker(self.url)
+        return broker
+
+    def push(self, name, item, ttl=None):
+        self._broker().push(name, item, ttl)
+
+    def pop(self, name, timeout=None):
+        """Next item, waiting up to timeout seconds (0 for no wait); None if there is none"""
+        if timeout == 0:
+            return self._broker().pop_nowait(name)
+        return self._broker().pop(name, timeout)
+
+    def discard(self, name):
+        self._broker().discard(name)
+
+
+class RedisQueue:
+    """Job queues as Redis lists of pickled items"""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def push(self, name, item, ttl=None):
+        if ttl is None:
+            self.client.rpush(KEY_PREFIX + name, pickle.dumps(item))
+            return
+        pipeline = self.client.pipeline()
+        pipeline.rpush(KEY_PREFIX + name, pickle.dumps(item))
+        pipeline.expire(KEY_PREFIX + name, max(1, math.ceil(ttl)))
+        pipeline.execute()
+
+    def pop(self, name, timeout=None):
+        """Next item, waiting up to timeout seconds (0 for no wait); None if there is none"""
+        if timeout == 0:
+            payload = self.client.lpop(KEY_PREFIX + name)
+        else:
+            found = self.client.blpop([KEY_PREFIX + name], timeout=timeout or 0)
+            payload = found[1] if found else None
+        return pickle.loads(payload) if payload is not None else None
+
+    def discard(self, name):
+        self.client.delete(KEY_PREFIX + name)
+
+
+def connect_queue(url):
+    """Job queue client for a local:// or redis:// URL"""
+    scheme = urlparse(url).scheme
+    if scheme == 'local':
+        return LocalQueue(url)
+    if scheme in ('redis', 'rediss'):
+        return RedisQueue(url)
+    raise ValueError(f"Unsupported queue URL {url!r}, expected local://host:port or redis://...")
+
+
+def create_client_manager(url, channel='bible-app'):
+    """python-socketio client manager that shares emits through the queue at url"""
+    scheme = urlparse(url).scheme
+    if scheme in ('redis', 'rediss'):
+        return socketio.RedisManager(url, channel=channel)
+    if scheme == 'local':
+        return LocalPubSubManager(url, channel=channel)
+    # amqp:// and the other transports kombu supports
+    return socketio.KombuManager(url, channel=channel)
+
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """Socket.IO pub/sub over the local broker; broker calls run on native threads off the hub"""
+
+    name = 'local'
+
+    def __init__(self, url, channel='socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.queue = LocalQueue(url)
+        self.subscription = None
+
+    def _publish(self, data):
+        tpool.execute(lambda: self.queue._broker().publish(self.channel, data))
+
+    def _listen(self):
+        self.subscription = tpool.execute(lambda: self.queue._broker().subscribe(self.channel))
+        while True:
+            message = tpool.execute(self.queue.pop, self.subscription, 1.0)
+            if message is not None:
+                yield message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local queue broker for multi-worker deployments")
+    parser.add_argument('--listen', default=f"{DEFAULT_LOCAL_ADDRESS[0]}:{DEFAULT_LOCAL_ADDRESS[1]}")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    host, _, port = args.listen.rpartition(':')
+    try:
+        serve_broker((host or DEFAULT_LOCAL_ADDRESS[0], int(port)))
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main()
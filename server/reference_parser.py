@@ -0,0 +1,300 @@
+import re
+
+# Canonical book order. Index + 1 matches the book id (key_english.b) used by
+# the scrollmapper bible_databases schema, so chapter counts can be looked up
+# by id even when names come from the database.
+BOOKS = [
+    ('Genesis', 50), ('Exodus', 40), ('Leviticus', 27), ('Numbers', 36),
+    ('Deuteronomy', 34), ('Joshua', 24), ('Judges', 21), ('Ruth', 4),
+    ('1 Samuel', 31), ('2 Samuel', 24), ('1 Kings', 22), ('2 Kings', 25),
+    ('1 Chronicles', 29), ('2 Chronicles', 36), ('Ezra', 10), ('Nehemiah', 13),
+    ('Esther', 10), ('Job', 42), ('Psalms', 150), ('Proverbs', 31),
+    ('Ecclesiastes', 12), ('Song of Solomon', 8), ('Isaiah', 66),
+    ('Jeremiah', 52), ('Lamentations', 5), ('Ezekiel', 48), ('Daniel', 12),
+    ('Hosea', 14), ('Joel', 3), ('Amos', 9), ('Obadiah', 1), ('Jonah', 4),
+    ('Micah', 7), ('Nahum', 3), ('Habakkuk', 3), ('Zephaniah', 3),
+    ('Haggai', 2), ('Zechariah', 14), ('Malachi', 4), ('Matthew', 28),
+    ('Mark', 16), ('Luke', 24), ('John', 21), ('Acts', 28), ('Romans', 16),
+    ('1 Corinthians', 16), ('2 Corinthians', 13), ('Galatians', 6),
+    ('Ephesians', 6), ('Philippians', 4), ('Colossians', 4),
+    ('1 Thessalonians', 5), ('2 Thessalonians', 3), ('1 Timothy', 6),
+    ('2 Timothy', 4), ('Titus', 3), ('Philemon', 1), ('Hebrews', 13),
+    ('James', 5), ('1 Peter', 5), ('2 Peter', 3), ('1 John', 5),
+    ('2 John', 1), ('3 John', 1), ('Jude', 1), ('Revelation', 22),
+]
+
+CHAPTER_COUNTS = {book_id: chapters for book_id, (_, chapters) in enumerate(BOOKS, start=1)}
+
+# Spoken ways of saying the leading number of "1 John", "2 Kings", ...
+ORDINAL_PREFIXES = {
+    '1': ('1', '1st', 'first', 'one', 'i'),
+    '2': ('2', '2nd', 'second', 'two', 'ii'),
+    '3': ('3', '3rd', 'third', 'three', 'iii'),
+}
+
+# Extra spoken names that are not in key_english
+SPOKEN_ALIASES = {
+    19: ('psalm',),
+    22: ('song of songs', 'song of sol'),
+    66: ('revelations', 'revelation of john'),
+}
+
+UNITS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11,
+    'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19,
+}
+TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50,
+    'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+}
+
+CHAPTER_WORDS = {'chapter', 'chapters', 'chap', 'ch'}
+VERSE_WORDS = {'verse', 'verses', 'vs', 'v', 'vv'}
+RANGE_WORDS = {'-', 'to', 'through', 'thru', 'till', 'until'}
+
+# Longest verse in the Bible (Psalm 119 has 176 verses)
+MAX_VERSE = 176
+# Longest spoken chapter range expanded into whole chapters ("chapters 3
+# through 5"); anything wider is read as its first chapter only
+MAX_CHAPTER_RANGE = 10
+
+_TOKEN_RE = re.compile(r"\d+(?:st|nd|rd|th)?|[a-z]+|[:\-]")
+_DASHES = str.maketrans({'–': '-', '—': '-'})
+
+# Key under which a trie node stores its (book_id, formal) terminal
+_END = None
+
+
+def tokenize(text):
+    """Split text into lowercase words, numbers, colons and dashes"""
+    return _TOKEN_RE.findall(text.lower().translate(_DASHES))
+
+
+class ReferenceParser:
+    """Finite-state matcher for written and spoken scripture references.
+
+    Book names are compiled into a token trie once; parsing a transcript is a
+    single left-to-right pass that needs no network or database access.
+    """
+
+    def __init__(self, book_names=None, abbreviations=()):
+        if not book_names:
+            book_names = {book_id: name for book_id, (name, _) in enumerate(BOOKS, start=1)}
+        self.book_names = dict(book_names)
+        self._trie = {}
+
+        # Abbreviations first so full and spoken names win on collisions
+        # ("Job", "Acts" and friends appear in both tables).
+        for abbr, book_id in abbreviations:
+            if book_id in self.book_names:
+                self._add_alias(abbr, book_id, formal=True)
+        for book_id, name in self.book_names.items():
+            tokens = tokenize(name)
+            self._add_alias(tokens, book_id)
+            if tokens and tokens[0] in ORDINAL_PREFIXES:
+                for prefix in ORDINAL_PREFIXES[tokens[0]]:
+                    self._add_alias([prefix] + tokens[1:], book_id)
+            for alias in SPOKEN_ALIASES.get(book_id, ()):
+                self._add_alias(alias, book_id)
+
+    def _add_alias(self, alias, book_id, formal=False):
+        tokens = tokenize(alias) if isinstance(alias, str) else alias
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        existing = node.get(_END)
+        if existing is None or existing[1]:
+            node[_END] = (book_id, formal)
+
+    def _match_book(self, tokens, i):
+        """Longest book alias starting at tokens[i] -> (book_id, formal, next_i)"""
+        node = self._trie
+        match = None
+        while i < len(tokens):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            i += 1
+            if _END in node:
+                match = node[_END] + (i,)
+        return match
+
+    @staticmethod
+    def _parse_number(tokens, i):
+        """Parse digits or number words ("one hundred and nineteen") at tokens[i]"""
+        n = len(tokens)
+        if i >= n:
+            return None, i
+        if tokens[i].isdigit():
+            return int(tokens[i]), i + 1
+
+        value = None
+        if tokens[i] == 'hundred' or (tokens[i] in ('a', 'one') and i + 1 < n and tokens[i + 1] == 'hundred'):
+            value = 100
+            i += 1 if tokens[i] == 'hundred' else 2
+            if i + 1 < n and tokens[i] == 'and' and (tokens[i + 1] in UNITS or tokens[i + 1] in TENS):
+                i += 1
+        if i < n and tokens[i] in TENS:
+            value = (value or 0) + TENS[tokens[i]]
+            i += 1
+            if i < n and tokens[i] == '-' and i + 1 < n and 0 < UNITS.get(tokens[i + 1], 0) < 10:
+                i += 1
+            if i < n and 0 < UNITS.get(tokens[i], 0) < 10:
+                value += UNITS[tokens[i]]
+                i += 1
+        elif i < n and tokens[i] in UNITS:
+            value = (value or 0) + UNITS[tokens[i]]
+            i += 1
+        return value, i
+
+    def _parse_location(self, tokens, i, book_id, formal):
+        """Parse chapter/verse/range after a book name -> (chapter, verse, end_verse, next_i)"""
+        n = len(tokens)
+        single_chapter = CHAPTER_COUNTS.get(book_id) == 1
+
+        if formal:
+            # Abbreviations are only trusted in the written "Gen 1:1" form
+            if not (i + 2 < n and tokens[i].isdigit() and tokens[i + 1] == ':'):
+                return None
+
+        saw_chapter_word = False
+        if i < n and tokens[i] in CHAPTER_WORDS:
+            saw_chapter_word = True
+            i += 1
+        elif i < n and tokens[i] in VERSE_WORDS and single_chapter:
+            # "Third John verse four"
+            verse, j = self._parse_number(tokens, i + 1)
+            if verse is None:
+                return None
+            return self._parse_range(tokens, j, 1, verse)
+
+        chapter, i = self._parse_number(tokens, i)
+        if chapter is None:
+            return None
+
+        j = i
+        if j + 1 < n and tokens[j] == 'and' and tokens[j + 1] in VERSE_WORDS:
+            j += 1
+        if j < n and (tokens[j] == ':' or tokens[j] in VERSE_WORDS):
+            j += 1
+        verse, j = self._parse_number(tokens, j)
+
+        if verse is None:
+            if single_chapter and not saw_chapter_word:
+                # "Jude 3" means verse 3 of the only chapter
+                return self._parse_range(tokens, i, 1, chapter)
+            if not saw_chapter_word:
+                # A book name and one number is too often ordinary speech
+                # ("mark two", "the judges three times"); whole chapters
+                # need the word "chapter"
+                return None
+            return chapter, None, None, i
+        return self._parse_range(tokens, j, chapter, verse)
+
+    def _parse_range(self, tokens, i, chapter, verse):
+        end_verse = None
+        if i < len(tokens) and tokens[i] in RANGE_WORDS:
+            end, j = self._parse_number(tokens, i + 1)
+            if end is not None and end > verse:
+                end_verse, i = end, j
+        return chapter, verse, end_verse, i
+
+    def _parse_chapter_range(self, tokens, i, chapter, verse, max_chapter=None):
+        """Chapters of a whole-chapter reference: "chapters 3 through 5" -> ([3, 4, 5], next_i)
+
+        Whole-chapter references only come from a spoken "chapter", so a range
+        is never read into "numbers one through ten".
+        """
+        if verse is None and chapter is not None and i < len(tokens) and tokens[i] in RANGE_WORDS:
+            end, j = self._parse_number(tokens, i + 1)
+            if end is not None and chapter < end < chapter + MAX_CHAPTER_RANGE and (not max_chapter or end <= max_chapter):
+                return list(range(chapter, end + 1)), j
+        return [chapter], i
+
+    def _parse_relative(self, tokens, i):
+        """Parse "verse N" or "chapter N (verse M)" with no book -> (chapter, verse, end_verse, next_i)"""
+        n = len(tokens)
+        if tokens[i] in VERSE_WORDS:
+            verse, j = self._parse_number(tokens, i + 1)
+            if verse is None or not 1 <= verse <= MAX_VERSE:
+                return None
+            return self._parse_range(tokens, j, None, verse)
+        if tokens[i] not in CHAPTER_WORDS:
+            return None
+
+        chapter, i = self._parse_number(tokens, i + 1)
+        if chapter is None or chapter < 1:
+            return None
+        j = i
+        if j + 1 < n and tokens[j] == 'and' and tokens[j + 1] in VERSE_WORDS:
+            j += 1
+        if j < n and (tokens[j] == ':' or tokens[j] in VERSE_WORDS):
+            verse, j = self._parse_number(tokens, j + 1)
+            if verse is not None and 1 <= verse <= MAX_VERSE:
+                return self._parse_range(tokens, j, chapter, verse)
+        return chapter, None, None, i
+
+    def _is_valid(self, book_id, chapter, verse, end_verse):
+        max_chapter = CHAPTER_COUNTS.get(book_id)
+        if chapter < 1 or (max_chapter and chapter > max_chapter):
+            return False
+        if verse is not None and not 1 <= verse <= MAX_VERSE:
+            return False
+        return end_verse is None or end_verse <= MAX_VERSE
+
+    def parse(self, text, relative=False):
+        """Extract references from text as a list of dicts.
+
+        Each reference has ``book``, ``chapter`` and ``verse`` keys (``verse`` is
+        None for a whole chapter) plus ``end_verse`` for ranges. With
+        ``relative``, references that name no book ("verse seventeen",
+        "chapter four verse two") are included too, with ``book`` None and,
+        for bare verses, ``chapter`` None; see ReferenceTracker.
+        """
+        tokens = tokenize(text)
+        references = []
+        seen = set()
+        i = 0
+        while i < len(tokens):
+            match = self._match_book(tokens, i)
+            if match:
+                book_id, formal, j = match
+                location = self._parse_location(tokens, j, book_id, formal)
+                if location and self._is_valid(book_id, *location[:3]):
+                    chapter, verse, end_verse, i = location
+                    chapters, i = self._parse_chapter_range(tokens, i, chapter, verse, CHAPTER_COUNTS.get(book_id))
+                    for chapter in chapters:
+                        key = (book_id, chapter, verse, end_verse)
+                        if key not in seen:
+                            seen.add(key)
+                            reference = {'book': self.book_names[book_id], 'chapter': chapter, 'verse': verse}
+                            if end_verse is not None:
+                                reference['end_verse'] = end_verse
+                            references.append(reference)
+                    continue
+            elif relative:
+                location = self._parse_relative(tokens, i)
+                if location:
+                    chapter, verse, end_verse, i = location
+                    chapters, i = self._parse_chapter_range(tokens, i, chapter, verse)
+                    for chapter in chapters:
+                        reference = {'book': None, 'chapter': chapter, 'verse': verse}
+                        if end_verse is not None:
+                            reference['end_verse'] = end_verse
+                        references.append(reference)
+                    continue
+            i += 1
+        return references
+
+    def mentions_book(self, text):
+        """Return True if text contains a spoken book name (abbreviations excluded)"""
+        tokens = tokenize(text)
+        for i in range(len(tokens)):
+            match = self._match_book(tokens, i)
+            if match and not match[1]:
+                return True
+        return False
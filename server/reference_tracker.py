@@ -0,0 +1,169 @@
+import time
+from collections import OrderedDict
+
+from reference_parser import BOOKS
+
+
+def format_passage(passage):
+    """'John 3', 'John 3:16' or 'John 3:16-18'"""
+    text = f"{passage['book']} {passage['chapter']}"
+    if passage['verse'] is not None:
+        text += f":{passage['verse']}"
+        if passage['end_verse'] not in (None, passage['verse']):
+            text += f"-{passage['end_verse']}"
+    return text
+
+
+class ReferenceTracker:
+    """Passages one session has already been sent, so only changes go out.
+
+    References from successive transcripts are folded into a sliding window
+    of recent passages: a repeat of something in the window is suppressed,
+    and a verse next to or overlapping a passage in the same chapter extends
+    it ("John 3:16", then "verse 17" -> John 3:16-17). References without a
+    book (from ``ReferenceParser.parse(text, relative=True)``) take the book
+    and chapter of the reference before them. Passages not mentioned for
+    ``window_seconds``, or pushed out by ``max_passages`` newer ones, are
+    forgotten and count as new when they come up again.
+    """
+
+    def __init__(self, max_passages=8, window_seconds=300.0, chapter_counts=None, clock=time.monotonic):
+        self.max_passages = max_passages
+        self.window_seconds = window_seconds
+        if chapter_counts is None:
+            chapter_counts = {name: chapters for name, chapters in BOOKS}
+        self.chapter_counts = chapter_counts
+        self.clock = clock
+
+        # id -> passage, least recently mentioned first
+        self.passages = OrderedDict()
+        self.context = None
+        self._next_id = 1
+
+        self.added = 0
+        self.updated = 0
+        self.duplicates = 0
+
+    def resolve(self, reference):
+        """Fill in a relative reference from the current book and chapter, or None"""
+        if reference.get('book'):
+            return reference
+        if self.context is None:
+            return None
+        book, chapter = self.context
+        resolved = dict(reference, book=book, chapter=reference.get('chapter') or chapter)
+        max_chapter = self.chapter_counts.get(book)
+        if max_chapter and resolved['chapter'] > max_chapter:
+            return None
+        return resolved
+
+    def update(self, references):
+        """Fold references into the window and return what changed.
+
+        Each change is a passage dict (``id``, ``book``, ``chapter``, ``verse``,
+        ``end_verse``, ``source``: 'cited', or 'quoted' for references from
+        semantic search) with ``status`` 'added' or 'updated' and ``spans``: the
+        (start, end) verse ranges the client has not been sent yet, or
+        [(None, None)] for a whole chapter.
+        """
+        now = self.clock()
+        self._expire(now)
+        before = {}
+        for reference in references:
+            reference = self.resolve(reference)
+            if reference is None:
+                continue
+            self.context = (reference['book'], reference['chapter'])
+            passage = self._find(reference)
+            if passage is None:
+                passage = self._add(reference)
+                before[passage['id']] = None
+            elif self._covers(passage, reference):
+                self.duplicates += 1
+            else:
+                before.setdefault(passage['id'], (passage['verse'], passage['end_verse']))
+                passage['verse'] = min(passage['verse'], reference['verse'])
+                passage['end_verse'] = max(passage['end_verse'], reference.get('end_verse') or reference['verse'])
+            passage['last_seen'] = now
+            self.passages.move_to_end(passage['id'])
+
+        # Report every change before trimming the window, so a transcript citing
+        # more passages than fit in it still sends them all
+        changes = []
+        for passage_id, previous in before.items():
+            passage = self.passages[passage_id]
+            change = {key: passage[key] for key in ('id', 'book', 'chapter', 'verse', 'end_verse', 'source')}
+            if previous is None:
+                self.added += 1
+                change.update(status='added', spans=[(passage['verse'], passage['end_verse'])])
+            else:
+                self.updated += 1
+                change.update(status='updated', spans=self._new_spans(previous, passage))
+            changes.append(change)
+
+        while len(self.passages) > self.max_passages:
+            self.passages.popitem(last=False)
+        return changes
+
+    def _expire(self, now):
+        while self.passages:
+            passage = next(iter(self.passages.values()))
+            if now - passage['last_seen'] <= self.window_seconds:
+                break
+            self.passages.popitem(last=False)
+
+    def _find(self, reference):
+        """Passage in the window that reference repeats, overlaps or adjoins"""
+        start = reference['verse']
+        end = reference.get('end_verse') or start
+        for passage in reversed(self.passages.values()):
+            if passage['book'] != reference['book'] or passage['chapter'] != reference['chapter']:
+                continue
+            if start is None or passage['verse'] is None:
+                # Whole chapters only match whole chapters
+                if start is None and passage['verse'] is None:
+                    return passage
+                continue
+            if start <= passage['end_verse'] + 1 and end >= passage['verse'] - 1:
+                return passage
+        return None
+
+    @staticmethod
+    def _covers(passage, reference):
+        if passage['verse'] is None:
+            return True
+        end = reference.get('end_verse') or reference['verse']
+        return passage['verse'] <= reference['verse'] and end <= passage['end_verse']
+
+    def _add(self, reference):
+        verse = reference['verse']
+        passage = {
+            'id': self._next_id,
+            'book': reference['book'],
+            'chapter': reference['chapter'],
+            'verse': verse,
+            'end_verse': reference.get('end_verse') or verse,
+            'source': reference.get('source', 'cited'),
+        }
+        self._next_id += 1
+        self.passages[passage['id']] = passage
+        return passage
+
+    @staticmethod
+    def _new_spans(previous, passage):
+        """Verse ranges of passage outside the previously sent (start, end)"""
+        start, end = previous
+        spans = []
+        if passage['verse'] < start:
+            spans.append((passage['verse'], start - 1))
+        if passage['end_verse'] > end:
+            spans.append((end + 1, passage['end_verse']))
+        return spans
+
+    def stats(self):
+        return {
+            'passages': len(self.passages),
+            'added': self.added,
+            'updated': self.updated,
+            'duplicates': self.duplicates,
+        }
@@ -0,0 +1,148 @@
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+
+from database import DEFAULT_TRANSLATIONS, existing_translations
+
+logger = logging.getLogger(__name__)
+
+# Ranked hit lists kept per query so later pages are slices, not new searches
+MAX_HITS = 1000
+CACHED_QUERIES = 256
+
+_QUERY_RE = re.compile(r'"([^"]*)"|(\w+\*?)')
+
+
+def fts_table(translation):
+    return f'fts_{translation.lower()}'
+
+
+def to_fts_query(text, mode='all'):
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Double-quoted segments become phrase queries and words ending in ``*``
+    become prefix queries. ``mode`` is 'all' (every term), 'any' (at least one
+    term, for matching loosely quoted verses) or 'phrase' (the whole text).
+    """
+    if mode == 'phrase':
+        words = re.findall(r'\w+', text)
+        return f'"{" ".join(words)}"' if words else ''
+
+    terms = []
+    for phrase, word in _QUERY_RE.findall(text):
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append(f'"{" ".join(words)}"')
+        elif word.endswith('*'):
+            terms.append(f'"{word[:-1]}"*')
+        else:
+            terms.append(f'"{word}"')
+    return (' OR ' if mode == 'any' else ' ').join(terms)
+
+
+def build_search_index(db_path, translations=DEFAULT_TRANSLATIONS):
+    """Create (or recreate) one FTS5 table per translation. Run offline."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            for translation in existing_translations(conn, translations):
+                table = fts_table(translation)
+                started = time.perf_counter()
+                conn.execute(f'DROP TABLE IF EXISTS {table}')
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE {table} USING fts5("
+                    f"t, b UNINDEXED, c UNINDEXED, v UNINDEXED, tokenize='porter unicode61')"
+                )
+                conn.execute(
+                    f'INSERT INTO {table} (rowid, t, b, c, v) '
+                    f'SELECT b * 1000000 + c * 1000 + v, t, b, c, v FROM t_{translation}'
+                )
+                conn.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+                logger.info(f"Built {table} in {time.perf_counter() - started:.2f}s")
+    finally:
+        conn.close()
+
+
+class SearchIndex:
+    """BM25-ranked verse search over the prebuilt fts_* tables"""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=False)
+        self.book_names = dict(self.conn.execute('SELECT b, n FROM key_english'))
+        self.translations = tuple(
+            name[4:] for (name,) in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'fts\\_%' ESCAPE '\\' "
+                "AND sql LIKE '%fts5%'"
+            )
+        )
+        self._hits = OrderedDict()
+
+    def has_translation(self, translation):
+        return translation.lower() in self.translations
+
+    def _ranked_hits(self, match, translations):
+        key = (match, translations)
+        hits = self._hits.get(key)
+        if hits is not None:
+            self._hits.move_to_end(key)
+            return hits
+
+        selects = [
+            f"SELECT '{t}' AS translation, b, c, v, t AS text, bm25({fts_table(t)}) AS score "
+            f"FROM {fts_table(t)} WHERE {fts_table(t)} MATCH :match"
+            for t in translations
+        ]
+        hits = self.conn.execute(
+            ' UNION ALL '.join(selects) + ' ORDER BY score LIMIT :limit',
+            {'match': match, 'limit': MAX_HITS}
+        ).fetchall()
+
+        self._hits[key] = hits
+        if len(self._hits) > CACHED_QUERIES:
+            self._hits.popitem(last=False)
+        return hits
+
+    def search(self, query, translations=None, limit=10, offset=0, mode='all'):
+        """Search one or more translations, best matches first.
+
+        Pages past the first are served from the cached ranking of the query.
+        """
+        translations = tuple(t.lower() for t in (translations or self.translations) if self.has_translation(t))
+        match = to_fts_query(query, mode)
+        if not match or not translations:
+            return []
+        try:
+            hits = self._ranked_hits(match, translations)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"Search failed for {query!r}: {e}")
+            return []
+        return [
+            {
+                'reference': f"{self.book_names.get(b)} {c}:{v}",
+                'text': text,
+                'translation': translation.upper(),
+                'score': -score
+            }
+            for translation, b, c, v, text, score in hits[offset:offset + limit]
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the FTS5 search tables")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), 'bible-sqlite.db'))
+    parser.add_argument('--translations', default=','.join(DEFAULT_TRANSLATIONS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    build_search_index(args.db, args.translations.split(','))
+    print(f"Search index built in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
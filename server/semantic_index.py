@@ -0,0 +1,378 @@
+"""Semantic verse retrieval: find verses a speaker quotes or paraphrases without citing them.
+
+Every verse of the chosen translations is embedded once, offline, with a
+local CPU sentence model, and stored in a flat file of int8 (or float16)
+vectors that is memory-mapped at startup:
+
+    pip install sentence-transformers
+    python semantic_index.py --db bible-sqlite.db --out verses.emb
+    python semantic_index.py --model hashing   # no model download; lexical, not semantic
+
+Rows are grouped into clusters (a small inverted-file index built with
+k-means), so a query scores the ``nprobe`` nearest clusters instead of the
+whole matrix. Transcripts are split into overlapping word windows; each is
+embedded and matched, and a verse keeps its best score.
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from database import existing_translations
+from verse_store import pack_verse_id
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'BSE1'
+DEFAULT_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+# Indexed by default, out of database.DEFAULT_TRANSLATIONS: KJV wording for
+# direct quotes, WEB for modern paraphrases
+INDEX_TRANSLATIONS = ('kjv', 'web')
+DEFAULT_NPROBE = 16
+# Transcripts are matched in windows of this many words, half overlapping
+SPAN_WORDS = 24
+MIN_QUERY_WORDS = 5
+_HEADER = struct.Struct('<4sI')
+_ALIGN = 64
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+def _padding(size):
+    return -size % _ALIGN
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEncoder:
+    """Sentence embeddings from a sentence-transformers model on the CPU, loaded on first use"""
+
+    def __init__(self, model_name, device='cpu'):
+        self.name = model_name
+        self.device = device
+        self.model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self.model is None:
+                from sentence_transformers import SentenceTransformer
+
+                self.model = SentenceTransformer(self.name, device=self.device)
+
+    def encode(self, texts, batch_size=64):
+        """Unit-length float32 embeddings, one row per text"""
+        self.load()
+        embeddings = self.model.encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False
+        )
+        return embeddings.astype(np.float32)
+
+
+class HashingEncoder:
+    """Signed hashes of words and word pairs. Needs no model, but only matches shared wording."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f'hashing:{dim}'
+
+    def load(self):
+        pass
+
+    def encode(self, texts, batch_size=None):
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            for feature in words + [f'{a} {b}' for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode('utf-8'))
+                embeddings[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(embeddings)
+
+
+def create_encoder(model):
+    """Encoder for a model name: 'hashing[:dim]' or a sentence-transformers model"""
+    if model.startswith('hashing'):
+        _, _, dim = model.partition(':')
+        return HashingEncoder(int(dim or 384))
+    return SentenceTransformerEncoder(model)
+
+
+def text_spans(text, size=SPAN_WORDS):
+    """Overlapping word windows of text, or [] if it is too short to match on"""
+    words = text.split()
+    if len(words) < MIN_QUERY_WORDS:
+        return []
+    if len(words) <= size:
+        return [' '.join(words)]
+    stride = size // 2
+    starts = range(0, len(words) - size + stride, stride)
+    return [' '.join(words[start:start + size]) for start in starts]
+
+
+def quantize(embeddings, dtype):
+    """(vectors, per-row scales) in the storage dtype; scales is None for float16"""
+    if dtype == 'float16':
+        return embeddings.astype(np.float16), None
+    if dtype == 'int8':
+        scales = np.abs(embeddings).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        vectors = np.rint(embeddings / scales[:, None]).astype(np.int8)
+        return vectors, scales.astype(np.float32)
+    raise ValueError(f"Unsupported dtype {dtype!r}, expected int8 or float16")
+
+
+def _assign(vectors, centroids, chunk=8192):
+    return np.concatenate([
+        np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), chunk)
+    ])
+
+
+def train_ivf(embeddings, nlist, iterations=10, seed=0):
+    """Spherical k-means on a sample -> (centroids, cluster of every row)"""
+    rng = np.random.default_rng(seed)
+    sample = embeddings[rng.choice(len(embeddings), min(len(embeddings), nlist * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=nlist) == 0
+        # Restart empty clusters from random rows
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32), _assign(embeddings, centroids)
+
+
+def load_verses(db_path, translations=INDEX_TRANSLATIONS):
+    """(packed verse ids, texts) for every verse of the translations that exist"""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        found = existing_translations(conn, translations)
+        ids, texts = [], []
+        for translation in found:
+            for b, c, v, t in conn.execute(f'SELECT b, c, v, t FROM t_{translation} ORDER BY b, c, v'):
+                ids.append(pack_verse_id(b, c, v))
+                texts.append(t)
+    finally:
+        conn.close()
+    return np.array(ids, dtype=np.int32), texts, found
+
+
+def build_index(db_path, out, model=DEFAULT_MODEL, translations=INDEX_TRANSLATIONS, dtype='int8',
+                nlist=None, batch_size=256):
+    """Embed every verse and write the index file. Run offline."""
+    started = time.perf_counter()
+    encoder = create_encoder(model)
+    ids, texts, translations = load_verses(db_path, translations)
+    if not texts:
+        raise ValueError(f"No verses found in {db_path}")
+
+    batches = []
+    for start in range(0, len(texts), batch_size):
+        batches.append(encoder.encode(texts[start:start + batch_size], batch_size=batch_size))
+        if start // batch_size % 20 == 0:
+            logger.info(f"Embedded {start + len(batches[-1])}/{len(texts)} verses")
+    embeddings = _normalize(np.concatenate(batches))
+    embedded = time.perf_counter()
+
+    write_index(out, embeddings, ids, encoder.name, translations, dtype, nlist)
+    logger.info(
+        f"Wrote {len(embeddings)} verse embeddings ({', '.join(translations)}, {dtype}) to {out} "
+        f"in {time.perf_counter() - started:.1f}s, {embedded - started:.1f}s of it embedding"
+    )
+
+
+def write_index(path, embeddings, ids, model, translations, dtype='int8', nlist=None):
+    """Cluster unit-length embeddings (one row per verse id) and write them in the storage dtype"""
+    nlist = nlist or max(1, int(2 * np.sqrt(len(embeddings))))
+    centroids, assignment = train_ivf(embeddings, nlist)
+    order = np.argsort(assignment, kind='stable')
+    offsets = np.searchsorted(assignment[order], np.arange(nlist + 1)).astype(np.int64)
+    vectors, scales = quantize(embeddings[order], dtype)
+
+    sections = [('centroids', centroids), ('offsets', offsets), ('ids', ids[order]), ('vectors', vectors)]
+    if scales is not None:
+        sections.append(('scales', scales))
+    _write(path, {
+        'byteorder': sys.byteorder,
+        'model': model,
+        'dim': int(embeddings.shape[1]),
+        'dtype': dtype,
+        'rows': len(embeddings),
+        'nlist': nlist,
+        'translations': list(translations),
+    }, sections)
+
+
+def _write(path, header, sections):
+    layout = {}
+    position = 0
+    for name, data in sections:
+        layout[name] = [position, data.dtype.str, list(data.shape)]
+        position += data.nbytes + _padding(data.nbytes)
+    header = json.dumps(dict(header, sections=layout)).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(header)))
+        f.write(header)
+        f.write(b'\0' * _padding(_HEADER.size + len(header)))
+        for name, data in sections:
+            f.write(np.ascontiguousarray(data).tobytes())
+            f.write(b'\0' * _padding(data.nbytes))
+
+
+class SemanticIndex:
+    """Memory-mapped verse embeddings with an inverted-file (IVF) top-k search.
+
+    Rows are sorted by cluster, so probing a cluster scores one contiguous
+    slice of the matrix. The encoder loads on first use; ``warm_up`` loads it
+    ahead of time and sets ``ready``.
+    """
+
+    def __init__(self, header, arrays, mapping=None, nprobe=DEFAULT_NPROBE):
+        self.model = header['model']
+        self.dtype = header['dtype']
+        self.translations = tuple(header['translations'])
+        self.centroids = arrays['centroids']
+        self.offsets = arrays['offsets']
+        self.ids = arrays['ids']
+        self.vectors = arrays['vectors']
+        self.scales = arrays.get('scales')
+        self.nprobe = nprobe
+        self.encoder = create_encoder(self.model)
+        self.ready = threading.Event()
+        self._mmap = mapping
+
+    @classmethod
+    def load(cls, path, nprobe=DEFAULT_NPROBE):
+        """Map a file written by ``build_index`` without copying it into the heap"""
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _HEADER.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a semantic index file")
+        header = json.loads(mapping[_HEADER.size:_HEADER.size + header_size])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {header['byteorder']}-endian machine")
+
+        data_start = _HEADER.size + header_size
+        data_start += _padding(data_start)
+        arrays = {}
+        for name, (offset, dtype, shape) in header['sections'].items():
+            count = int(np.prod(shape))
+            arrays[name] = np.frombuffer(mapping, dtype=dtype, count=count, offset=data_start + offset).reshape(shape)
+        return cls(header, arrays, mapping, nprobe)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def warm_up(self):
+        """Load the encoder and run one query, so the first real one is fast"""
+        started = time.perf_counter()
+        try:
+            self.search('in the beginning god created the heaven and the earth')
+        except Exception as e:
+            logger.error(f"Semantic index encoder {self.model} failed to load: {e}")
+            return
+        self.ready.set()
+        logger.info(f"Semantic index ready in {time.perf_counter() - started:.1f}s: {len(self)} verse embeddings, {self.model}")
+
+    def _score_rows(self, start, end, query):
+        scores = self.vectors[start:end].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales[start:end]
+        return scores
+
+    def search_vectors(self, query, k=10, nprobe=None, book=None):
+        """Best (score, verse_id) pairs for one unit-length float32 query, best first.
+
+        Scores the ``nprobe`` nearest clusters; ``nprobe=0`` scans every row.
+        With ``book`` (a book id), every row of that book is scored instead.
+        """
+        nprobe = self.nprobe if nprobe is None else nprobe
+        if book is not None:
+            rows = np.flatnonzero(self.ids // 1000000 == book)
+            ids = self.ids[rows]
+            scores = self.vectors[rows].astype(np.float32) @ query
+            if self.scales is not None:
+                scores *= self.scales[rows]
+        elif nprobe == 0 or nprobe >= len(self.centroids):
+            ids = self.ids
+            scores = np.concatenate([
+                self._score_rows(start, start + 16384, query) for start in range(0, len(self.ids), 16384)
+            ])
+        else:
+            probe = np.argpartition(self.centroids @ query, -nprobe)[-nprobe:]
+            spans = [(self.offsets[c], self.offsets[c + 1]) for c in probe]
+            ids = np.concatenate([self.ids[start:end] for start, end in spans])
+            scores = np.concatenate([self._score_rows(start, end, query) for start, end in spans])
+        if not len(scores):
+            return []
+
+        # The same verse can match in several translations; keep its best row
+        take = min(len(scores), k * len(self.translations))
+        top = np.argpartition(scores, -take)[-take:]
+        top = top[np.argsort(scores[top])[::-1]]
+        results = []
+        seen = set()
+        for row in top:
+            verse_id = int(ids[row])
+            if verse_id not in seen:
+                seen.add(verse_id)
+                results.append((float(scores[row]), verse_id))
+                if len(results) == k:
+                    break
+        return results
+
+    def search(self, text, k=5, book=None, nprobe=None):
+        """Verses text most likely quotes or paraphrases, best first.
+
+        Returns dicts with ``book_id``, ``chapter``, ``verse`` and ``score``
+        (cosine similarity); [] when the text is too short to match on.
+        """
+        spans = text_spans(text)
+        if not spans:
+            return []
+        best = {}
+        for query in self.encoder.encode(spans):
+            for score, verse_id in self.search_vectors(query, k, nprobe, book):
+                if score > best.get(verse_id, -1.0):
+                    best[verse_id] = score
+        ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            {'book_id': verse_id // 1000000, 'chapter': verse_id // 1000 % 1000, 'verse': verse_id % 1000, 'score': score}
+            for verse_id, score in ranked
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the semantic verse index")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), 'bible-sqlite.db'))
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(__file__), 'verses.emb'))
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="sentence-transformers model, or 'hashing'")
+    parser.add_argument('--translations', default=','.join(INDEX_TRANSLATIONS))
+    parser.add_argument('--dtype', choices=('int8', 'float16'), default='int8')
+    parser.add_argument('--nlist', type=int, help='number of clusters (default 2 * sqrt(rows))')
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    build_index(args.db, args.out, args.model, args.translations.split(','), args.dtype, args.nlist, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""Run the server as several processes: socket workers sharing one port, plus ASR workers.
+
+    python serve.py --workers 4 --asr-workers 2
+    python serve.py --workers 4 --asr-workers 2 --queue redis://localhost:6379/0
+    python serve.py --workers 4 --asr-workers 0 --queue redis://queue-host:6379/0   # ASR runs elsewhere
+
+Socket workers are app.py processes. They all listen on PORT with
+SO_REUSEPORT, so the kernel spreads new connections across them. Each
+client talks to one worker for its whole session, which holds that
+client's audio buffer and reference state. This needs the websocket
+transport, which the bundled client uses. For clients that fall back to
+long polling, start with --port-per-worker and put a proxy with sticky
+sessions in front (see the README).
+
+Transcription happens in asr_worker.py processes. They pull jobs from the
+queue, so throughput scales with --asr-workers however the sockets are
+spread. Socket.IO emits are shared through the same queue. With a local://
+queue URL, a broker process is started as well. A crashed process is
+restarted.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+RESTART_DELAY = 1.0
+
+
+class Supervisor:
+    """Starts named child processes, restarts them if they die, and stops them together"""
+
+    def __init__(self):
+        self.specs = []
+        self.ready_checks = {}
+        self.processes = {}
+        self.stopping = False
+
+    def add(self, name, argv, env=None, ready=None):
+        """Register a child; ready() is waited on after starting it, before the next one"""
+        self.specs.append((name, argv, dict(os.environ, **(env or {}))))
+        if ready is not None:
+            self.ready_checks[name] = ready
+
+    def _spawn(self, name, argv, env):
+        self.processes[name] = subprocess.Popen(argv, env=env, cwd=SERVER_DIR)
+        logger.info(f"Started {name} (pid {self.processes[name].pid})")
+
+    def start(self):
+        for name, argv, env in self.specs:
+            self._spawn(name, argv, env)
+            if name in self.ready_checks and not self.ready_checks[name]():
+                raise RuntimeError(f"{name} did not come up")
+
+    def watch(self):
+        """Restart children that exit until stop() is called"""
+        while not self.stopping:
+            for name, argv, env in self.specs:
+                process = self.processes[name]
+                if process.poll() is not None and not self.stopping:
+                    logger.warning(f"{name} exited with code {process.returncode}, restarting")
+                    time.sleep(RESTART_DELAY)
+                    self._spawn(name, argv, env)
+            time.sleep(0.5)
+
+    def stop(self, timeout=10.0):
+        self.stopping = True
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for name, process in self.processes.items():
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"{name} did not stop, killing it")
+                process.kill()
+
+
+def wait_for_port(host, port, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def build(args, asr_command=None):
+    """Supervisor for the deployment described by args (see main)"""
+    supervisor = Supervisor()
+    queue_url = args.queue
+    parsed = urlparse(queue_url)
+    if parsed.scheme == 'local':
+        from message_queue import broker_authkey
+
+        # Fail here rather than in every worker the supervisor would keep restarting
+        broker_authkey(parsed.hostname)
+    if parsed.scheme == 'local' and not args.external_queue:
+        supervisor.add(
+            'broker', [sys.executable, 'message_queue.py', '--listen', f"{parsed.hostname}:{parsed.port}"],
+            ready=lambda: wait_for_port(parsed.hostname, parsed.port)
+        )
+
+    asr_command = asr_command or [sys.executable, 'asr_worker.py', '--queue', queue_url]
+    for index in range(args.asr_workers):
+        supervisor.add(f"asr-{index}", asr_command)
+
+    for index in range(args.workers):
+        supervisor.add(f"socket-{index}", [sys.executable, 'app.py'], {
+            'PORT': str(args.port + index if args.port_per_worker else args.port),
+            'WORKER_ID': str(index),
+            'ASR_BACKEND': 'remote',
+            'ASR_QUEUE': queue_url,
+            'SOCKETIO_MESSAGE_QUEUE': queue_url,
+            # Enough jobs in flight per process to keep the ASR workers busy
+            'INFERENCE_WORKERS': os.getenv('INFERENCE_WORKERS', str(max(1, args.asr_workers))),
+            # Batching happens in the ASR workers
+            'WHISPER_BATCH_SIZE': '1',
+        })
+    return supervisor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', os.cpu_count() or 1)),
+                        help='socket worker processes')
+    parser.add_argument('--asr-workers', type=int, default=int(os.getenv('ASR_WORKERS', 1)),
+                        help='ASR worker processes on this machine (0 if they run elsewhere)')
+    parser.add_argument('--queue', default=os.getenv('QUEUE_URL', 'local://127.0.0.1:6399'),
+                        help='local://host:port (a broker is started) or redis://...')
+    parser.add_argument('--external-queue', action='store_true', help="don't start a local broker, one is already running")
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5001)))
+    parser.add_argument('--port-per-worker', action='store_true',
+                        help='give each socket worker its own port (PORT, PORT+1, ...) for a sticky proxy')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s serve: %(message)s')
+    try:
+        supervisor = build(args)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def shutdown(signum, frame):
+        logger.info("Stopping workers...")
+        supervisor.stopping = True
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    try:
+        supervisor.start()
+    except RuntimeError:
+        supervisor.stop()
+        raise
+    ports = f"ports {args.port}-{args.port + args.workers - 1}" if args.port_per_worker else f"port {args.port}"
+    logger.info(f"{args.workers} socket workers on {ports}, {args.asr_workers} ASR workers, queue {args.queue}")
+    try:
+        supervisor.watch()
+    finally:
+        supervisor.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from audio_processor import SAMPLE_RATE, AudioProcessor
+
+
+def test_raw_bytes_are_16khz_pcm():
+    pcm = np.array([0, 16384, -32768], dtype='<i2').tobytes()
+    assert AudioProcessor.pcm_payload(pcm) == (pcm, SAMPLE_RATE, None)
+    assert AudioProcessor.process_pcm16(pcm).tolist() == [0, 16384, -32768]
+
+
+def test_dict_payload():
+    pcm = b'\0\0' * 480
+    assert AudioProcessor.pcm_payload({'pcm': pcm, 'sample_rate': 48000, 'trace_id': 'abc'}) == (pcm, 48000, 'abc')
+    assert AudioProcessor.pcm_payload({'pcm': pcm, 'sample_rate': 44100.0}) == (pcm, 44100, None)
+    assert AudioProcessor.pcm_payload({'pcm': pcm, 'trace_id': {'not': 'a string'}}) == (pcm, SAMPLE_RATE, None)
+    assert len(AudioProcessor.process_pcm16(pcm, 48000)) == 160
+
+
+@pytest.mark.parametrize('data', [
+    None,
+    'pcm',
+    [0, 1, 2],
+    {'pcm': 'not bytes'},
+    {'pcm': b'\0\0', 'sample_rate': 'fast'},
+    {'pcm': b'\0\0', 'sample_rate': None},
+    {'pcm': b'\0\0', 'sample_rate': 0},
+    {'pcm': b'\0\0', 'sample_rate': -16000},
+    {'pcm': b'\0\0', 'sample_rate': 10 ** 9},
+    {'pcm': b'\0\0', 'sample_rate': float('nan')},
+    {'pcm': b'\0\0', 'sample_rate': True},
+])
+def test_malformed_payload_is_rejected(data):
+    with pytest.raises(ValueError):
+        AudioProcessor.pcm_payload(data)
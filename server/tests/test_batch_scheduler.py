@@ -0,0 +1,86 @@
+import threading
+import time
+
+import pytest
+
+from batch_scheduler import BatchScheduler, _Request
+
+
+def queued(scheduler, *audios):
+    requests = [_Request(audio) for audio in audios]
+    for request in requests:
+        scheduler._requests.put(request)
+    return requests
+
+
+def test_batch_is_capped_at_max_batch():
+    scheduler = BatchScheduler(lambda audios: audios, max_batch=4, max_wait_ms=50)
+    queued(scheduler, *range(6))
+    assert [request.audio for request in scheduler._collect()] == [0, 1, 2, 3]
+    assert [request.audio for request in scheduler._collect()] == [4, 5]
+
+
+def test_lone_request_waits_at_most_max_wait():
+    scheduler = BatchScheduler(lambda audios: audios, max_batch=8, max_wait_ms=50)
+    queued(scheduler, 'only')
+    started = time.monotonic()
+    assert [request.audio for request in scheduler._collect()] == ['only']
+    assert 0.03 < time.monotonic() - started < 0.5
+
+
+def test_late_request_joins_the_open_batch():
+    scheduler = BatchScheduler(lambda audios: audios, max_batch=8, max_wait_ms=200)
+    queued(scheduler, 'first')
+    timer = threading.Timer(0.05, queued, (scheduler, 'second'))
+    timer.start()
+    try:
+        assert [request.audio for request in scheduler._collect()][:2] == ['first', 'second']
+    finally:
+        timer.cancel()
+
+
+def test_overdue_request_takes_only_what_is_queued():
+    scheduler = BatchScheduler(lambda audios: audios, max_batch=8, max_wait_ms=20)
+    first, second = queued(scheduler, 'first', 'second')
+    first.submitted -= 1
+    started = time.monotonic()
+    assert [request.audio for request in scheduler._collect()] == ['first', 'second']
+    assert time.monotonic() - started < 0.02
+
+
+def test_concurrent_callers_share_a_batch_and_get_their_own_text():
+    gate = threading.Event()
+
+    def decode_batch(audios):
+        gate.wait(1)
+        return [f'text {audio}' for audio in audios]
+
+    scheduler = BatchScheduler(decode_batch, max_batch=8, max_wait_ms=200)
+    scheduler.start()
+    results = {}
+    callers = [threading.Thread(target=lambda n=n: results.update({n: scheduler.transcribe(n)})) for n in range(5)]
+    for caller in callers:
+        caller.start()
+    time.sleep(0.05)
+    gate.set()
+    for caller in callers:
+        caller.join(2)
+
+    assert results == {n: f'text {n}' for n in range(5)}
+    assert sum(scheduler.batch_sizes) == 5
+    assert scheduler.stats()['batches'] == len(scheduler.batch_sizes) < 5
+
+
+def test_decode_error_reaches_every_caller_in_the_batch():
+    def decode_batch(audios):
+        raise RuntimeError('out of memory')
+
+    scheduler = BatchScheduler(decode_batch, max_wait_ms=1)
+    scheduler.start()
+    with pytest.raises(RuntimeError, match='out of memory'):
+        scheduler.transcribe('audio')
+    assert scheduler.stats()['batches'] == 1
+
+
+def test_stats_before_any_batch():
+    assert BatchScheduler(lambda audios: audios).stats() == {'batches': 0}
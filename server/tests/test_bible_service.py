@@ -0,0 +1,69 @@
+import importlib
+import json
+import os
+
+import pytest
+
+from build_corpus import build
+from verse_store import VerseStore
+
+JOHN = {'book': 'John', 'chapter': 3, 'verse': 16}
+REVELATION = {'book': 'Revelation', 'chapter': 2, 'verse': 1}
+GENESIS = {'book': 'Genesis', 'chapter': 1, 'verse': 1}
+
+
+def records(*verses):
+    return [{'book': book, 'chapter': chapter, 'verse': verse, 'text': text} for book, chapter, verse, text in verses]
+
+
+@pytest.fixture(scope='module')
+def service(tmp_path_factory):
+    """SQLite with kjv (John, Revelation) and asv (John only); a store with asv and web"""
+    root = tmp_path_factory.mktemp('bible')
+    sources = {
+        'kjv': records(('John', 3, 16, 'For God so loved'), ('Revelation', 2, 1, 'Unto the angel')),
+        'asv': records(('John', 3, 16, 'For God so loved (asv)')),
+    }
+    paths = []
+    for translation, verses in sources.items():
+        path = root / f'{translation}.json'
+        path.write_text(json.dumps(verses))
+        paths.append((translation, str(path)))
+    db_path = str(root / 'bible.db')
+    build(paths, db_path, workers=1)
+
+    os.environ['BIBLE_DB'] = db_path
+    bible_service = importlib.import_module('bible_service')
+    service = bible_service.BibleService(db_path)
+    service.verse_store = VerseStore.from_texts(
+        {1: 'Genesis', 43: 'John', 66: 'Revelation'},
+        {'asv': {43003016: 'For God so loved (store)'}, 'web': {1001001: 'In the beginning (store)'}},
+    )
+    return service
+
+
+def answers(passages):
+    return [(p['translation'], [v['text'] for v in p['verses']]) for p in passages]
+
+
+def test_sqlite_translation_asked_first_wins_over_the_store(service):
+    assert answers(service.get_verses([JOHN, REVELATION], ['kjv', 'asv'])) == [
+        ('KJV', ['For God so loved']), ('KJV', ['Unto the angel'])
+    ]
+
+
+def test_store_translation_asked_first_wins(service):
+    assert answers(service.get_verses([JOHN], ['asv', 'kjv'])) == [('ASV', ['For God so loved (store)'])]
+
+
+def test_falls_through_from_store_to_sqlite(service):
+    assert answers(service.get_verses([REVELATION], ['asv', 'kjv'])) == [('KJV', ['Unto the angel'])]
+    assert service.find_verse('Revelation', 2, 1)['translation'] == 'KJV'
+
+
+def test_falls_through_from_sqlite_to_store(service):
+    assert answers(service.get_verses([GENESIS], ['kjv', 'web'])) == [('WEB', ['In the beginning (store)'])]
+
+
+def test_missing_everywhere(service):
+    assert answers(service.get_verses([GENESIS], ['kjv', 'asv'])) == [(None, [])]
@@ -0,0 +1,46 @@
+from book_resolver import BookResolver, normalize_book_key, source_abbreviations
+
+resolver = BookResolver()
+
+
+def test_normalize_book_key():
+    assert normalize_book_key("First John") == '1 john'
+    assert normalize_book_key("the Gospel of Mark") == 'mark'
+    assert normalize_book_key("1Sam.") == '1 sam'
+    assert normalize_book_key("firstborn") == 'firstborn'
+
+
+def test_exact_and_spoken_names():
+    assert resolver.match("John").kind == 'exact'
+    assert resolver.resolve("Second Kings") == 12
+    assert resolver.resolve("the book of Psalms") == 19
+
+
+def test_prefix():
+    match = resolver.match("Deut")
+    assert (match.book_id, match.kind) == (5, 'prefix')
+
+
+def test_asr_misspellings_and_typos():
+    assert resolver.resolve("Isiah") == 23
+    assert resolver.resolve("Philippines") == 50
+    match = resolver.match("Revelaton")
+    assert (match.book_id, match.kind) == (66, 'fuzzy')
+
+
+def test_ambiguous_prefix():
+    match = resolver.match("Jo")
+    assert match.book_id is None
+    assert match.kind == 'ambiguous'
+    assert {18, 29, 32, 43} <= set(match.candidates)
+
+
+def test_short_names_are_not_guessed():
+    assert resolver.resolve("xyz") is None
+
+
+def test_source_abbreviations():
+    source = BookResolver(abbreviations=source_abbreviations())
+    assert [source.resolve(code) for code in ('Gen', 'EXO', '1Sam', 'gn', 'lv', 'nm', 'dt', '1sm')] == [1, 2, 9, 1, 3, 4, 5, 9]
+    # USFM codes win over common short forms that clash with them
+    assert source.resolve('jud') == 65
@@ -0,0 +1,37 @@
+import logging
+
+import pytest
+
+from build_corpus import parse_sources, parse_usfm_book
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_usfm_book_is_parsed(tmp_path):
+    path = write(tmp_path, '44JHN.usfm', '\\id JHN\n\\c 3\n\\p \\v 16 For God so loved \\f + \\ft note\\f* the world.\n')
+    assert parse_usfm_book(path) == (43, [(3, 16, 'For God so loved the world.')])
+
+
+def test_non_canonical_usfm_book_is_skipped(tmp_path, caplog):
+    write(tmp_path, '00FRT.usfm', '\\id FRT\n\\mt Front matter\n')
+    write(tmp_path, '41TOB.usfm', '\\id TOB\n\\c 1\n\\v 1 Tobit.\n')
+    write(tmp_path, '44JHN.usfm', '\\id JHN\n\\c 1\n\\v 1 In the beginning was the Word.\n')
+    with caplog.at_level(logging.INFO, logger='build_corpus'):
+        texts = parse_sources([('web', str(tmp_path))], workers=1)
+    assert texts == {'web': {43001001: 'In the beginning was the Word.'}}
+    assert '00FRT.usfm' in caplog.text and '41TOB.usfm' in caplog.text
+
+
+@pytest.mark.parametrize('text, message', [
+    ('\\id XYZ\n\\c 1\n\\v 1 Text.\n', 'unknown book \\\\id XYZ'),
+    ('\\c 1\n\\v 1 Text.\n', 'no \\\\id line'),
+])
+def test_unknown_usfm_book_stops_the_build(tmp_path, text, message):
+    path = write(tmp_path, 'odd.usfm', text)
+    with pytest.raises(ValueError, match=message) as error:
+        parse_sources([('web', path)], workers=1)
+    assert 'odd.usfm' in str(error.value)
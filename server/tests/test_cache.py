@@ -0,0 +1,76 @@
+import types
+
+import pytest
+
+import cache
+from cache import LRUCache, create_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache('test', maxsize=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+    assert len(lru) == 2
+    assert lru.evictions == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    lru = LRUCache('test', maxsize=10, ttl=30)
+    lru.set('verse', 'text')
+    clock[0] += 29
+    assert lru.get('verse') == 'text'
+    clock[0] += 2
+    assert lru.get('verse', 'gone') == 'gone'
+    assert len(lru) == 0
+    assert lru.expirations == 1
+
+
+def test_none_is_cached():
+    lru = LRUCache('test')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return None
+
+    assert lru.get_or_compute('missing verse', compute) is None
+    assert lru.get_or_compute('missing verse', compute) is None
+    assert len(calls) == 1
+
+
+def test_stats(clock):
+    lru = LRUCache('test', maxsize=1, ttl=5)
+    assert lru.stats()['hit_rate'] == 0.0
+    lru.set('a', 1)
+    lru.get('a')
+    lru.get('b')
+    lru.set('b', 2)
+    clock[0] += 10
+    lru.get('b')
+    assert lru.stats() == {
+        'size': 0,
+        'maxsize': 1,
+        'hits': 1,
+        'misses': 2,
+        'evictions': 1,
+        'expirations': 1,
+        'hit_rate': 1 / 3,
+    }
+    lru.clear()
+    assert len(lru) == 0
+
+
+def test_create_cache_stays_local_without_redis(monkeypatch):
+    monkeypatch.delenv('CACHE_REDIS_URL', raising=False)
+    assert type(create_cache('verses', maxsize=5, ttl=60, shared=True)) is LRUCache
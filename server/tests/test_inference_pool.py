@@ -0,0 +1,67 @@
+import pytest
+
+from inference_pool import InferenceExecutor, JobDropped
+
+
+def test_jobs_run_and_return_results():
+    executor = InferenceExecutor(workers=2)
+    executor.start()
+    assert executor.run('a', lambda x: x * 2, 21) == 42
+    assert executor.stats()['completed'] == 1
+
+
+def test_failed_job_raises_to_its_waiter():
+    executor = InferenceExecutor()
+    executor.start()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        executor.run('a', fail)
+
+
+def test_same_key_is_coalesced():
+    executor = InferenceExecutor()
+    assert executor.submit('a', print, key='audio') is not None
+    assert executor.submit('a', print, key='audio') is None
+    assert executor.submit('b', print, key='audio') is not None
+    assert (executor.depth, executor.coalesced) == (2, 1)
+
+
+def test_session_over_its_limit_drops_its_oldest_job():
+    executor = InferenceExecutor(max_session_jobs=2)
+    first = executor.submit('a', print)
+    executor.submit('a', print)
+    executor.submit('a', print)
+    assert executor.dropped == 1
+    with pytest.raises(JobDropped):
+        first.wait()
+
+
+def test_full_queue_drops_from_the_longest_session():
+    executor = InferenceExecutor(max_queue=3, max_session_jobs=3)
+    busy = executor.submit('busy', print)
+    executor.submit('busy', print)
+    quiet = executor.submit('quiet', print)
+    executor.submit('new', print)
+    assert executor.depth == 3
+    with pytest.raises(JobDropped):
+        busy.wait()
+    assert not quiet.ready()
+
+
+def test_sessions_are_served_round_robin():
+    executor = InferenceExecutor(max_session_jobs=3)
+    for session_id in ('a', 'a', 'a', 'b'):
+        executor.submit(session_id, print)
+    assert [executor._next_job().session_id for _ in range(4)] == ['a', 'b', 'a', 'a']
+
+
+def test_cancel_session():
+    executor = InferenceExecutor()
+    event = executor.submit('a', print)
+    executor.cancel_session('a')
+    assert executor.depth == 0
+    with pytest.raises(JobDropped):
+        event.wait()
@@ -0,0 +1,39 @@
+import time
+
+import message_queue
+from message_queue import Broker
+
+
+def test_queues_are_fifo():
+    broker = Broker()
+    broker.push('jobs', 1)
+    broker.push('jobs', 2)
+    assert [broker.pop_nowait('jobs'), broker.pop('jobs', 0.01), broker.pop('jobs', 0.01)] == [1, 2, None]
+
+
+def test_expired_reply_queue_is_swept(monkeypatch):
+    monkeypatch.setattr(message_queue, 'SWEEP_INTERVAL', 0.0)
+    broker = Broker()
+    broker.push('asr:reply:late', {'text': 'nobody is waiting'}, ttl=0.01)
+    broker.push('asr:jobs', 'kept')
+    time.sleep(0.02)
+    broker.push('asr:jobs', 'sweeps')
+    assert broker.pop_nowait('asr:reply:late') is None
+    assert broker.pop_nowait('asr:jobs') == 'kept'
+
+
+def test_discard_forgets_the_ttl():
+    broker = Broker()
+    broker.push('asr:reply:done', 'text', ttl=60)
+    broker.discard('asr:reply:done')
+    assert broker._expiry == {}
+
+
+def test_broadcast_reaches_every_subscriber():
+    broker = Broker()
+    first, second = broker.subscribe('socketio'), broker.subscribe('socketio')
+    broker.publish('socketio', 'hello')
+    assert [broker.pop_nowait(first), broker.pop_nowait(second)] == ['hello', 'hello']
+    broker.unsubscribe('socketio', first)
+    broker.publish('socketio', 'again')
+    assert broker.pop_nowait(first) is None
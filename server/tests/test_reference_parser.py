@@ -0,0 +1,70 @@
+from reference_parser import ReferenceParser
+from reference_tracker import ReferenceTracker
+
+parser = ReferenceParser()
+
+
+def locations(text, relative=False):
+    return [(r['book'], r['chapter'], r['verse'], r.get('end_verse')) for r in parser.parse(text, relative)]
+
+
+def test_written_references():
+    assert locations("Turn to John 3:16 and Romans 8:28-30") == [('John', 3, 16, None), ('Romans', 8, 28, 30)]
+
+
+def test_spoken_numbers():
+    assert locations("John three sixteen") == [('John', 3, 16, None)]
+    assert locations("Psalm one hundred and nineteen verse one hundred and five") == [('Psalms', 119, 105, None)]
+    assert locations("Psalm chapter twenty-three") == [('Psalms', 23, None, None)]
+
+
+def test_spoken_book_prefix_and_range():
+    assert locations("first Corinthians thirteen four to seven") == [('1 Corinthians', 13, 4, 7)]
+    assert locations("First John chapter two verse fifteen") == [('1 John', 2, 15, None)]
+
+
+def test_single_chapter_book_number_is_a_verse():
+    assert locations("Jude 3") == [('Jude', 1, 3, None)]
+
+
+def test_book_name_alone_is_not_a_reference():
+    assert locations("I love the gospel of John") == []
+
+
+def test_relative_forms_need_relative():
+    assert locations("verse 5") == []
+    assert locations("verse 5", relative=True) == [(None, None, 5, None)]
+    assert locations("chapter four verse two", relative=True) == [(None, 4, 2, None)]
+
+
+def test_chapter_range():
+    assert locations("Romans chapters 3 through 5") == [
+        ('Romans', 3, None, None), ('Romans', 4, None, None), ('Romans', 5, None, None)
+    ]
+    assert locations("chapters 3 through 5", relative=True) == [
+        (None, 3, None, None), (None, 4, None, None), (None, 5, None, None)
+    ]
+
+
+def test_chapter_range_past_the_last_chapter_keeps_the_first():
+    assert locations("Romans chapter 15 to 17") == [('Romans', 15, None, None)]
+
+
+def test_book_and_bare_number_is_not_a_chapter():
+    assert locations("count the numbers one through ten") == []
+    assert locations("the judges three times") == []
+    assert locations("mark two") == []
+    assert locations("Psalm 23") == []
+
+
+def test_repeated_reference_is_listed_once():
+    assert locations("John 3:16, yes John 3:16") == [('John', 3, 16, None)]
+
+
+def test_relative_verse_follows_spoken_reference():
+    tracker = ReferenceTracker()
+    first = tracker.update(parser.parse("John three sixteen", relative=True))
+    changes = tracker.update(parser.parse("and verse seventeen", relative=True))
+    assert [c['status'] for c in changes] == ['updated']
+    assert changes[0]['id'] == first[0]['id']
+    assert (changes[0]['book'], changes[0]['chapter'], changes[0]['verse'], changes[0]['end_verse']) == ('John', 3, 16, 17)
@@ -0,0 +1,71 @@
+from reference_tracker import ReferenceTracker
+
+
+def ref(book, chapter, verse=None, end_verse=None):
+    return {'book': book, 'chapter': chapter, 'verse': verse, 'end_verse': end_verse}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_new_reference_is_added():
+    tracker = ReferenceTracker()
+    changes = tracker.update([ref('John', 3, 16)])
+    assert [(c['book'], c['chapter'], c['verse'], c['status']) for c in changes] == [('John', 3, 16, 'added')]
+    assert changes[0]['spans'] == [(16, 16)]
+
+
+def test_repeated_reference_is_suppressed():
+    tracker = ReferenceTracker()
+    tracker.update([ref('John', 3, 16)])
+    assert tracker.update([ref('John', 3, 16)]) == []
+    assert tracker.duplicates == 1
+
+
+def test_adjacent_verse_extends_passage():
+    tracker = ReferenceTracker()
+    first = tracker.update([ref('John', 3, 16)])
+    changes = tracker.update([{'book': None, 'chapter': None, 'verse': 17}])
+    assert len(changes) == 1
+    assert changes[0]['id'] == first[0]['id']
+    assert changes[0]['status'] == 'updated'
+    assert (changes[0]['verse'], changes[0]['end_verse']) == (16, 17)
+    assert changes[0]['spans'] == [(17, 17)]
+
+
+def test_relative_reference_without_context_is_ignored():
+    tracker = ReferenceTracker()
+    assert tracker.update([{'book': None, 'chapter': None, 'verse': 5}]) == []
+
+
+def test_more_references_than_window_are_all_reported():
+    tracker = ReferenceTracker(max_passages=8)
+    changes = tracker.update([ref('John', chapter) for chapter in range(1, 11)])
+    assert [c['chapter'] for c in changes] == list(range(1, 11))
+    assert all(c['status'] == 'added' for c in changes)
+    # Only the most recent passages stay in the window
+    assert len(tracker.passages) == 8
+
+
+def test_evicted_passage_counts_as_new_again():
+    tracker = ReferenceTracker(max_passages=2)
+    tracker.update([ref('John', 1, 1)])
+    tracker.update([ref('John', 2, 1)])
+    tracker.update([ref('John', 3, 1)])
+    changes = tracker.update([ref('John', 1, 1)])
+    assert [(c['chapter'], c['status']) for c in changes] == [(1, 'added')]
+
+
+def test_expired_passage_counts_as_new_again():
+    clock = FakeClock()
+    tracker = ReferenceTracker(window_seconds=60, clock=clock)
+    tracker.update([ref('John', 3, 16)])
+    clock.now = 30
+    assert tracker.update([ref('John', 3, 16)]) == []
+    clock.now = 100
+    assert [c['status'] for c in tracker.update([ref('John', 3, 16)])] == ['added']
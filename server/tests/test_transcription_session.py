@@ -0,0 +1,114 @@
+import numpy as np
+
+from transcription_session import AudioRingBuffer, TranscriptionSession, drop_overlap
+
+RATE = 100
+
+
+class ScriptedGate:
+    """Passes ready-made (audio, segment_ended) pieces straight through"""
+    received_samples = 0
+    passed_samples = 0
+
+    def process(self, pieces):
+        return pieces
+
+
+def speech(seconds, value=0.5):
+    return np.full(int(seconds * RATE), value, dtype=np.float32)
+
+
+def session(transcribe, **options):
+    return TranscriptionSession(transcribe, sample_rate=RATE, gate=ScriptedGate(), **options)
+
+
+def test_drop_overlap():
+    assert drop_overlap(['for', 'god', 'so', 'loved'], ['so', 'loved', 'the', 'world']) == ['the', 'world']
+    assert drop_overlap(['God', 'so', 'loved,'], ['Loved', 'the', 'world.']) == ['the', 'world.']
+    assert drop_overlap(['in', 'the', 'beginning'], ['was', 'the', 'word']) == ['was', 'the', 'word']
+    assert drop_overlap(['the', 'the'], ['the', 'the', 'end']) == ['end']
+    assert drop_overlap([], ['amen']) == ['amen']
+
+
+def test_ring_buffer_wraps_around():
+    ring = AudioRingBuffer(10)
+    ring.write(np.arange(7, dtype=np.float32))
+    ring.write(np.arange(7, 13, dtype=np.float32))
+    assert (ring.start, ring.end) == (3, 13)
+    assert ring.read(0, 13).tolist() == list(range(3, 13))
+    assert ring.read(8, 11).tolist() == [8, 9, 10]
+    assert len(ring.read(13, 20)) == 0
+
+
+def test_ring_buffer_keeps_the_tail_of_an_oversized_write():
+    ring = AudioRingBuffer(4)
+    ring.write(np.arange(3, dtype=np.float32))
+    ring.write(np.arange(3, 13, dtype=np.float32))
+    assert (ring.start, ring.end) == (9, 13)
+    assert ring.read(9, 13).tolist() == [9, 10, 11, 12]
+
+
+def test_ring_buffer_normalizes_int16():
+    ring = AudioRingBuffer(4)
+    ring.write(np.array([16384, -32768], dtype=np.int16))
+    assert ring.read(0, 2).tolist() == [0.5, -1.0]
+
+
+def test_overlapping_decodes_are_stitched():
+    replies = iter(['for god so loved', 'so loved the world', 'the world that he gave'])
+    prompts = []
+
+    def transcribe(audio, prompt):
+        prompts.append(prompt)
+        return next(replies)
+
+    stream = session(transcribe, step_seconds=2.0, overlap_seconds=1.0)
+    assert stream.feed([(speech(2), False)])[0]['text'] == 'for god so loved'
+    assert stream.feed([(speech(2), False)])[0]['text'] == 'for god so loved the world'
+    final = stream.feed([(speech(0.5), True)])
+    assert [event['type'] for event in final] == ['final']
+    assert final[0]['text'] == 'for god so loved the world that he gave'
+    assert prompts == [None, 'for god so loved', 'for god so loved the world']
+    assert stream.utterance_start is None
+
+
+def test_decoded_audio_includes_the_overlap():
+    lengths = []
+
+    def transcribe(audio, prompt):
+        lengths.append(len(audio))
+        return 'word'
+
+    stream = session(transcribe, step_seconds=2.0, overlap_seconds=1.0)
+    stream.feed([(speech(2), False)])
+    stream.feed([(speech(2), True)])
+    assert lengths == [200, 300]
+
+
+def test_pending_speech_drops_oldest_audio_but_keeps_boundaries():
+    stream = session(lambda audio, prompt: 'text', max_pending_seconds=3.0)
+    stream.enqueue([(speech(2, 0.1), True)])
+    stream.enqueue([(speech(1, 0.2), False)])
+    stream.enqueue([(speech(1.5, 0.3), False)])
+    assert stream.dropped_samples == 200
+    assert stream.pending_samples == 250
+    assert [(len(audio), ended) for audio, ended, _, _ in stream.pending] == [(0, True), (100, False), (150, False)]
+
+    stream.enqueue([(speech(2, 0.4), False)])
+    assert stream.dropped_samples == 450
+    assert [len(audio) for audio, _, _, _ in stream.pending] == [0, 0, 0, 200]
+    assert stream.stats()['dropped_seconds'] == 4.5
+
+
+def test_newest_piece_is_never_dropped():
+    stream = session(lambda audio, prompt: 'text', max_pending_seconds=1.0)
+    stream.enqueue([(speech(2), False)])
+    assert stream.pending_samples == 200
+    assert stream.dropped_samples == 0
+
+
+def test_long_utterance_is_cut_at_max_utterance():
+    stream = session(lambda audio, prompt: 'words', max_utterance_seconds=3.0)
+    events = stream.feed([(speech(3.5), False)])
+    assert [event['type'] for event in events] == ['final']
+    assert stream.utterance_start is None
@@ -0,0 +1,99 @@
+import numpy as np
+
+from vad import SpeechGate, VoiceActivityDetector
+
+
+class LoudFramesVAD:
+    """Scripted detector: a frame is speech when any of its samples is non-zero"""
+    frame_size = 10
+    sample_rate = 1000
+
+    def classify(self, samples):
+        count = len(samples) // self.frame_size
+        frames = samples[:count * self.frame_size].reshape(count, self.frame_size)
+        return np.any(frames != 0, axis=1)
+
+
+def frames(pattern, dtype=np.float32):
+    """One 10-sample frame per character: '#' speech, '.' silence; samples carry the frame number"""
+    audio = np.zeros(len(pattern) * 10, dtype=dtype)
+    for index, flag in enumerate(pattern):
+        if flag == '#':
+            audio[index * 10:(index + 1) * 10] = index + 1
+    return audio
+
+
+def gate():
+    # 10ms frames: two voiced frames open a segment, five silent ones close it
+    return SpeechGate(LoudFramesVAD(), preroll_ms=30, hangover_ms=50, min_speech_ms=20)
+
+
+def test_silence_is_dropped():
+    speech_gate = gate()
+    assert speech_gate.process(frames('.' * 20)) == []
+    assert speech_gate.received_samples == 200
+    assert speech_gate.passed_samples == 0
+
+
+def test_segment_keeps_preroll_and_closes_after_hangover():
+    speech_gate = gate()
+    pieces = speech_gate.process(frames('....##' + '.' * 5 + '...'))
+    assert len(pieces) == 1
+    audio, ended = pieces[0]
+    assert ended
+    # Three frames of preroll (one silent frame and the two voiced ones that
+    # opened the segment), then the five silent frames of hangover
+    assert len(audio) == 8 * 10
+    assert audio[:10].tolist() == [0] * 10
+    assert audio[10:30].tolist() == [5] * 10 + [6] * 10
+    assert speech_gate.segments == 1
+    assert not speech_gate.in_speech
+
+
+def test_short_pause_stays_in_one_segment():
+    speech_gate = gate()
+    pieces = speech_gate.process(frames('##...##' + '.' * 5))
+    assert [ended for _, ended in pieces] == [True]
+    assert speech_gate.segments == 1
+
+
+def test_long_pause_splits_segments():
+    speech_gate = gate()
+    pieces = speech_gate.process(frames('##' + '.' * 6 + '##'))
+    assert [ended for _, ended in pieces] == [True, False]
+    assert speech_gate.segments == 2
+    assert speech_gate.in_speech
+
+
+def test_single_voiced_frame_does_not_open_a_segment():
+    speech_gate = gate()
+    assert speech_gate.process(frames('.#..#.')) == []
+    assert speech_gate.segments == 0
+
+
+def test_open_segment_continues_across_calls_and_partial_frames():
+    speech_gate = gate()
+    audio = frames('##' + '#' * 3 + '.' * 5)
+    first = speech_gate.process(audio[:25])
+    second = speech_gate.process(audio[25:])
+    assert [ended for _, ended in first] == [False]
+    assert [ended for _, ended in second] == [True]
+    passed = np.concatenate([piece for piece, _ in first + second])
+    np.testing.assert_array_equal(passed, audio)
+    assert speech_gate.received_samples == speech_gate.passed_samples == 100
+
+
+def test_int16_stays_int16():
+    speech_gate = gate()
+    pieces = speech_gate.process(frames('###', dtype=np.int16))
+    assert [audio.dtype for audio, _ in pieces] == [np.int16]
+
+
+def test_energy_vad_tells_tone_from_silence():
+    vad = VoiceActivityDetector()
+    t = np.arange(vad.frame_size * 4) / vad.sample_rate
+    tone = (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32)
+    audio = np.concatenate([np.zeros(vad.frame_size * 4, dtype=np.float32), tone])
+    assert vad.classify(audio).tolist() == [False] * 4 + [True] * 4
+    pcm = (audio * 32767).astype(np.int16)
+    assert VoiceActivityDetector().classify(pcm).tolist() == [False] * 4 + [True] * 4
@@ -0,0 +1,93 @@
+import pytest
+
+from verse_store import VerseStore, pack_verse_id
+
+BOOK_NAMES = {1: 'Genesis', 43: 'John'}
+TEXTS = {
+    'kjv': {
+        pack_verse_id(1, 1, 1): 'In the beginning God created the heaven and the earth.',
+        pack_verse_id(43, 3, 16): 'For God so loved the world, that he gave his only begotten Son.',
+        pack_verse_id(43, 3, 17): 'For God sent not his Son into the world to condemn the world.',
+        pack_verse_id(43, 3, 19): 'And this is the condemnation, that light is come into the world.',
+    },
+    'web': {
+        pack_verse_id(43, 3, 17): 'For God didn’t send his Son into the world to judge the world.',
+        pack_verse_id(43, 3, 18): 'He who believes in him is not judged.',
+    },
+}
+
+
+@pytest.fixture(params=['memory', 'mmap'])
+def store(request, tmp_path):
+    built = VerseStore.from_texts(BOOK_NAMES, TEXTS)
+    if request.param == 'memory':
+        return built
+    path = tmp_path / 'verses.bvs'
+    built.save(str(path))
+    return VerseStore.load(str(path))
+
+
+def test_round_trip_keeps_every_verse(tmp_path):
+    built = VerseStore.from_texts(BOOK_NAMES, TEXTS)
+    path = tmp_path / 'verses.bvs'
+    built.save(str(path))
+    loaded = VerseStore.load(str(path))
+
+    assert loaded.translations == ('kjv', 'web')
+    assert loaded.book_names == BOOK_NAMES
+    assert list(loaded.verse_ids) == list(built.verse_ids)
+    assert loaded.chapter_index == built.chapter_index
+    for translation, by_id in TEXTS.items():
+        for verse_id, text in by_id.items():
+            verse = loaded.get_verse(verse_id // 1000000, verse_id // 1000 % 1000, verse_id % 1000, translation)
+            assert verse['text'] == text
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'SQLite format 3\0' + b'\0' * 64)
+    with pytest.raises(ValueError, match='not a verse store'):
+        VerseStore.load(str(path))
+
+
+def test_get_verse(store):
+    assert store.get_verse(43, 3, 16) == {
+        'reference': 'John 3:16',
+        'text': TEXTS['kjv'][pack_verse_id(43, 3, 16)],
+        'translation': 'KJV',
+    }
+    assert store.get_verse(43, 3, 18) is None
+    assert store.get_verse(43, 3, 18, 'WEB')['text'] == 'He who believes in him is not judged.'
+    assert store.get_verse(43, 3, 16, 'asv') is None
+    assert store.get_verse(43, 4, 1) is None
+
+
+def test_get_verse_range_skips_gaps(store):
+    verses = store.get_verse_range(43, 3, 16, 19)
+    assert [v['reference'] for v in verses] == ['John 3:16', 'John 3:17', 'John 3:19']
+
+
+def test_find_passage_takes_the_first_translation_with_any_verse(store):
+    translation, verses = store.find_passage(43, 3, 17, 18, translations=('kjv', 'web'))
+    assert translation == 'KJV'
+    assert [v['reference'] for v in verses] == ['John 3:17']
+
+    translation, verses = store.find_passage(43, 3, 18, translations=('kjv', 'web'))
+    assert translation == 'WEB'
+    assert [v['reference'] for v in verses] == ['John 3:18']
+
+    translation, verses = store.find_passage(43, 3, 17, 18, translations=('asv', 'web', 'kjv'))
+    assert translation == 'WEB'
+    assert [v['reference'] for v in verses] == ['John 3:17', 'John 3:18']
+
+
+def test_find_passage_whole_chapter(store):
+    translation, verses = store.find_passage(43, 3, translations=('kjv',))
+    assert translation == 'KJV'
+    assert [v['reference'] for v in verses] == ['John 3:16', 'John 3:17', 'John 3:19']
+
+
+def test_find_passage_misses(store):
+    assert store.find_passage(43, 3, 20, 25, translations=('kjv', 'web')) == (None, [])
+    assert store.find_passage(2, 1, translations=('kjv',)) == (None, [])
+    assert store.find_passage(1, 1, 1, translations=('web',)) == (None, [])
@@ -0,0 +1,232 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from audio_processor import PCM_SCALE
+from metrics import new_trace_id
+from vad import SpeechGate
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+# Longest run of words compared when stitching overlapping decodes together
+MAX_OVERLAP_WORDS = 12
+
+
+def _normalize_word(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+def drop_overlap(previous_words, new_words):
+    """Remove the words at the start of new_words already at the end of previous_words"""
+    previous = [_normalize_word(w) for w in previous_words[-MAX_OVERLAP_WORDS:]]
+    current = [_normalize_word(w) for w in new_words[:MAX_OVERLAP_WORDS]]
+    for size in range(min(len(previous), len(current)), 0, -1):
+        if previous[-size:] == current[:size]:
+            return new_words[size:]
+    return new_words
+
+
+class AudioRingBuffer:
+    """Fixed-size float32 ring buffer addressed by absolute sample position"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        self.end = 0
+
+    @property
+    def start(self):
+        """Oldest absolute sample position still held in the buffer"""
+        return max(0, self.end - self.capacity)
+
+    def write(self, samples):
+        """Append float32 or int16 samples; int16 PCM is normalized to float32 as it is copied in"""
+        total = len(samples)
+        samples = samples[-self.capacity:]
+        position = (self.end + total - len(samples)) % self.capacity
+        first = min(len(samples), self.capacity - position)
+        self._store(position, samples[:first])
+        self._store(0, samples[first:])
+        self.end += total
+
+    def _store(self, position, samples):
+        target = self._buffer[position:position + len(samples)]
+        if samples.dtype == np.int16:
+            np.multiply(samples, PCM_SCALE, out=target, casting='unsafe')
+        else:
+            target[:] = samples
+
+    def read(self, start, end):
+        """Copy out samples [start, end) in absolute positions"""
+        start = max(start, self.start)
+        end = min(end, self.end)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        begin = start % self.capacity
+        length = end - start
+        if begin + length <= self.capacity:
+            return self._buffer[begin:begin + length].copy()
+        return np.concatenate((self._buffer[begin:], self._buffer[:begin + length - self.capacity]))
+
+
+class TranscriptionSession:
+    """Streaming transcription state for one socket session.
+
+    Incoming audio first passes a SpeechGate, so silence and room noise never
+    reach the ASR engine, and the gate's segment boundaries delimit
+    utterances. Speech is appended to a ring buffer; while an utterance is in
+    progress, only the audio since the last decode (plus a short overlap for
+    words cut at the boundary) is transcribed, and the words are stitched
+    onto the utterance so far. Feeding returns 'partial' events as the
+    utterance grows and a 'final' event once the speaker pauses.
+
+    Every utterance gets a trace id (the client's, if the chunk that started
+    it carried one), which its events carry so a slow one can be followed
+    through the logs.
+    """
+
+    def __init__(self, transcribe, sample_rate=SAMPLE_RATE, buffer_seconds=30.0, step_seconds=2.0,
+                 overlap_seconds=1.0, max_utterance_seconds=15.0, max_pending_seconds=10.0, gate=None):
+        self.transcribe = transcribe
+        self.sample_rate = sample_rate
+        self.buffer = AudioRingBuffer(int(buffer_seconds * sample_rate))
+        self.gate = gate or SpeechGate()
+        self.step = int(step_seconds * sample_rate)
+        self.overlap = int(overlap_seconds * sample_rate)
+        self.max_utterance = int(max_utterance_seconds * sample_rate)
+
+        self.utterance_start = None
+        self.committed_until = 0
+        self.words = []
+        self.last_speech_time = None
+        self.transcribed_samples = 0
+        self.trace_id = None
+        self.utterance_asr_seconds = 0.0
+
+        # Gated speech not yet fed, as (audio, segment_ended, received_at, trace_id);
+        # filled on the hub, drained by the inference worker thread.
+        self.max_pending = int(max_pending_seconds * sample_rate)
+        self.pending = []
+        self.pending_samples = 0
+        self.dropped_samples = 0
+        self._pending_lock = threading.Lock()
+
+        # End-of-speech -> final transcript latencies, in seconds
+        self.latencies = deque(maxlen=200)
+
+    def enqueue(self, samples, trace_id=None):
+        """Gate incoming audio and queue its speech for feed_pending.
+
+        Returns False when the chunk held nothing to transcribe. Queued speech
+        past max_pending_seconds is dropped oldest first.
+        """
+        received = time.monotonic()
+        pieces = self.gate.process(samples)
+        if not pieces:
+            return False
+        with self._pending_lock:
+            for audio, ended in pieces:
+                self.pending.append((audio, ended, received, trace_id))
+                self.pending_samples += len(audio)
+            while self.pending_samples > self.max_pending:
+                # Oldest piece that still has audio, never the newest one.
+                # Emptied pieces stay queued so utterance boundaries survive.
+                index = next((i for i, item in enumerate(self.pending[:-1]) if len(item[0])), None)
+                if index is None:
+                    break
+                audio, ended, queued_at, queued_trace = self.pending[index]
+                self.pending[index] = (audio[:0], ended, queued_at, queued_trace)
+                self.pending_samples -= len(audio)
+                self.dropped_samples += len(audio)
+        return True
+
+    def feed_pending(self):
+        """Feed everything queued by enqueue and return transcript events"""
+        with self._pending_lock:
+            items, self.pending = self.pending, []
+            self.pending_samples = 0
+
+        events = []
+        for audio, ended, received, trace_id in items:
+            if len(audio):
+                if self.utterance_start is None:
+                    self.utterance_start = self.committed_until = self.buffer.end
+                    self.words = []
+                    self.trace_id = trace_id or new_trace_id()
+                    self.utterance_asr_seconds = 0.0
+                self.buffer.write(audio)
+                self.last_speech_time = received
+            if ended:
+                events.extend(self._finish(self.buffer.end))
+
+        if self.utterance_start is not None:
+            if self.buffer.end - self.utterance_start >= self.max_utterance:
+                events.extend(self._finish(self.buffer.end))
+            elif self.buffer.end - self.committed_until >= self.step:
+                if self._decode_tail(self.buffer.end):
+                    events.append({'type': 'partial', 'text': ' '.join(self.words), 'trace_id': self.trace_id})
+        return events
+
+    def feed(self, samples, trace_id=None):
+        """Gate and process float32 or int16 PCM samples immediately"""
+        self.enqueue(samples, trace_id)
+        return self.feed_pending()
+
+    def _decode_tail(self, end):
+        """Transcribe audio since the last decode and append the new words"""
+        start = max(self.utterance_start, self.committed_until - self.overlap, self.buffer.start)
+        overlapped = start < self.committed_until
+        audio = self.buffer.read(start, end)
+        self.committed_until = end
+        if len(audio) < self.sample_rate // 10:
+            return False
+
+        self.transcribed_samples += len(audio)
+        prompt = ' '.join(self.words[-50:]) or None
+        started = time.perf_counter()
+        new_words = (self.transcribe(audio, prompt) or '').split()
+        self.utterance_asr_seconds += time.perf_counter() - started
+        if overlapped and self.words:
+            new_words = drop_overlap(self.words, new_words)
+        self.words.extend(new_words)
+        return bool(new_words)
+
+    def _finish(self, end):
+        """Close the current utterance and emit its final transcript"""
+        if self.utterance_start is None:
+            return []
+        if end > self.committed_until:
+            self._decode_tail(end)
+        text = ' '.join(self.words)
+        speech_ended = self.last_speech_time
+        self.utterance_start = None
+        self.words = []
+        if not text:
+            return []
+
+        latency = time.monotonic() - speech_ended if speech_ended is not None else 0.0
+        self.latencies.append(latency)
+        return [{
+            'type': 'final', 'text': text, 'latency': latency,
+            'trace_id': self.trace_id, 'asr_seconds': self.utterance_asr_seconds
+        }]
+
+    def stats(self):
+        """Audio received vs. transcribed, and end-of-speech to final transcript latency"""
+        stats = {
+            'received_seconds': self.gate.received_samples / self.sample_rate,
+            'speech_seconds': self.gate.passed_samples / self.sample_rate,
+            'transcribed_seconds': self.transcribed_samples / self.sample_rate,
+            'dropped_seconds': self.dropped_samples / self.sample_rate,
+            'utterances': len(self.latencies),
+        }
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            stats['latency_p50'] = ordered[len(ordered) // 2]
+            stats['latency_p95'] = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+        return stats
@@ -0,0 +1,170 @@
+import logging
+from collections import deque
+
+import numpy as np
+
+from audio_processor import PCM_SCALE, AudioProcessor
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+
+class VoiceActivityDetector:
+    """Energy and zero-crossing-rate voice activity detection over fixed-size frames.
+
+    A frame is speech when its RMS energy clears an adaptive threshold (a
+    multiple of the tracked noise floor, never below ``energy_threshold``) and
+    it is either low in zero crossings, as voiced speech is, or loud enough to
+    be a fricative rather than hiss.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=30, energy_threshold=0.01,
+                 noise_ratio=3.0, zcr_threshold=0.25):
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self.energy_threshold = energy_threshold
+        self.noise_ratio = noise_ratio
+        self.zcr_threshold = zcr_threshold
+        self.noise_floor = energy_threshold / noise_ratio
+
+    def classify(self, samples):
+        """Return one bool per complete frame in float32 or int16 samples (True = speech)"""
+        count = len(samples) // self.frame_size
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:count * self.frame_size].reshape(count, self.frame_size)
+        if frames.dtype == np.int16:
+            # Scale the energy afterwards instead of normalizing every sample
+            scaled = frames.astype(np.float32)
+            rms = np.sqrt(np.einsum('ij,ij->i', scaled, scaled) / self.frame_size) * PCM_SCALE
+        else:
+            rms = np.sqrt(np.mean(frames * frames, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        threshold = max(self.energy_threshold, self.noise_floor * self.noise_ratio)
+        speech = (rms >= threshold) & ((zcr < self.zcr_threshold) | (rms >= 3 * threshold))
+
+        # Track the room noise (quietest frames, falling fast and rising
+        # slowly) so a steady fan or projector stops counting as speech
+        floor = float(np.percentile(rms, 10))
+        if floor < self.noise_floor:
+            self.noise_floor = floor
+        else:
+            self.noise_floor += 0.1 * (floor - self.noise_floor)
+        return speech
+
+
+class WebRTCVoiceActivityDetector:
+    """GMM-based detector from the optional webrtcvad package"""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, frame_ms=30, aggressiveness=2):
+        import webrtcvad
+
+        self.sample_rate = sample_rate
+        self.frame_size = int(sample_rate * frame_ms / 1000)
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def classify(self, samples):
+        count = len(samples) // self.frame_size
+        pcm = samples[:count * self.frame_size]
+        if pcm.dtype != np.int16:
+            pcm = (np.clip(pcm, -1, 1) * 32767).astype('<i2')
+        return np.array([
+            self._vad.is_speech(frame.tobytes(), self.sample_rate)
+            for frame in pcm.reshape(count, self.frame_size)
+        ], dtype=bool)
+
+
+def _join(frames):
+    """Concatenate frames, normalizing int16 ones if a client switched transports midway"""
+    if len({frame.dtype for frame in frames}) > 1:
+        frames = [AudioProcessor.pcm16_to_float32(f) if f.dtype == np.int16 else f for f in frames]
+    return np.concatenate(frames)
+
+
+def create_vad(backend='energy', sample_rate=SAMPLE_RATE, **options):
+    """Build a detector; falls back to the energy detector if webrtcvad is missing"""
+    if backend == 'webrtc':
+        try:
+            return WebRTCVoiceActivityDetector(sample_rate)
+        except ImportError:
+            logger.warning("webrtcvad is not installed, using the energy VAD")
+    elif backend != 'energy':
+        raise ValueError(f"Unknown VAD backend {backend!r}, expected 'energy' or 'webrtc'")
+    return VoiceActivityDetector(sample_rate, **options)
+
+
+class SpeechGate:
+    """Per-session silence gate in front of the ASR engine.
+
+    Passes through only frames inside speech segments: a segment opens after
+    ``min_speech_ms`` of consecutive speech (with ``preroll_ms`` of audio
+    before it so onsets aren't clipped) and stays open across pauses shorter
+    than ``hangover_ms``, which merges nearby segments. Everything else is
+    dropped. Counters record how much audio came in versus went through.
+
+    int16 PCM is gated and passed on as int16, so the only float32 copy of
+    it is the one the ring buffer makes.
+    """
+
+    def __init__(self, vad=None, preroll_ms=300, hangover_ms=600, min_speech_ms=90):
+        self.vad = vad or VoiceActivityDetector()
+        frame_ms = 1000 * self.vad.frame_size / self.vad.sample_rate
+        self.start_frames = max(1, int(min_speech_ms / frame_ms))
+        self.hangover_frames = max(1, int(hangover_ms / frame_ms))
+        self._preroll = deque(maxlen=max(self.start_frames, int(preroll_ms / frame_ms)))
+        self._remainder = np.zeros(0, dtype=np.float32)
+
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silent_run = 0
+
+        self.received_samples = 0
+        self.passed_samples = 0
+        self.segments = 0
+
+    def process(self, samples):
+        """Gate float32 or int16 samples into speech pieces of the same dtype.
+
+        Returns a list of (audio, segment_ended) pairs in order; only the last
+        piece can still be open (segment_ended False).
+        """
+        if samples.dtype not in (np.int16, np.float32):
+            samples = samples.astype(np.float32)
+        self.received_samples += len(samples)
+        if len(self._remainder):
+            samples = _join([self._remainder, samples])
+
+        frame_size = self.vad.frame_size
+        flags = self.vad.classify(samples)
+        self._remainder = samples[len(flags) * frame_size:]
+
+        pieces = []
+        current = []
+        for index, voiced in enumerate(flags):
+            frame = samples[index * frame_size:(index + 1) * frame_size]
+            if self.in_speech:
+                current.append(frame)
+                self._silent_run = 0 if voiced else self._silent_run + 1
+                if self._silent_run >= self.hangover_frames:
+                    self.in_speech = False
+                    self._voiced_run = 0
+                    pieces.append((_join(current), True))
+                    current = []
+                continue
+
+            self._preroll.append(frame)
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_frames:
+                self.in_speech = True
+                self._silent_run = 0
+                self.segments += 1
+                current.extend(self._preroll)
+                self._preroll.clear()
+
+        if current:
+            pieces.append((_join(current), False))
+        self.passed_samples += sum(len(audio) for audio, _ in pieces)
+        return pieces
@@ -0,0 +1,257 @@
+import argparse
+import array
+import bisect
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import time
+
+from database import DEFAULT_TRANSLATIONS, existing_translations
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'BVS1'
+_HEADER = struct.Struct('<4sI')
+_ALIGN = 8
+
+
+def pack_verse_id(book, chapter, verse):
+    """Pack a reference into the bbcccvvv id used by the t_* tables"""
+    return book * 1000000 + chapter * 1000 + verse
+
+
+def _padding(size):
+    return -size % _ALIGN
+
+
+class VerseStore:
+    """Read-only, array-backed copy of the verse tables.
+
+    All verse keys live in one sorted int32 array of packed ids. Each
+    translation is a column: a UTF-8 blob holding every verse text back to back
+    and a uint32 offsets array into it. A lookup is one dict probe for the
+    chapter span plus an index into the arrays; nothing touches the database.
+
+    The arrays can be backed by an mmap of a prebuilt file (see ``save`` and
+    ``load``), in which case worker processes share one copy via the page cache.
+    """
+
+    def __init__(self, book_names, verse_ids, columns, mapping=None):
+        self.book_names = {int(b): sys.intern(n) for b, n in book_names.items()}
+        self.verse_ids = verse_ids
+        self.columns = columns
+        self.translations = tuple(columns)
+        self._mmap = mapping
+
+        # (book, chapter) -> (start, end) rows into verse_ids
+        self.chapter_index = {}
+        start = 0
+        previous = None
+        for row, verse_id in enumerate(verse_ids):
+            key = (verse_id // 1000000, verse_id // 1000 % 1000)
+            if key != previous:
+                if previous is not None:
+                    self.chapter_index[previous] = (start, row)
+                previous, start = key, row
+        if previous is not None:
+            self.chapter_index[previous] = (start, len(verse_ids))
+
+    @classmethod
+    def from_database(cls, db_path, translations=DEFAULT_TRANSLATIONS):
+        """Load the key_english and t_* tables from a bible-sqlite database"""
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        try:
+            book_names = dict(conn.execute('SELECT b, n FROM key_english'))
+            texts = {}
+            for translation in existing_translations(conn, translations):
+                texts[translation] = {
+                    pack_verse_id(b, c, v): t
+                    for b, c, v, t in conn.execute(f'SELECT b, c, v, t FROM t_{translation}')
+                }
+        finally:
+            conn.close()
+        return cls.from_texts(book_names, texts)
+
+    @classmethod
+    def from_texts(cls, book_names, texts):
+        """Build a store from {translation: {packed_id: text}}"""
+        verse_ids = array.array('i', sorted(set().union(*texts.values())))
+        columns = {}
+        for translation, by_id in texts.items():
+            blob = bytearray()
+            offsets = array.array('I', [0])
+            for verse_id in verse_ids:
+                blob += (by_id.get(verse_id) or '').encode('utf-8')
+                offsets.append(len(blob))
+            columns[translation] = (offsets, bytes(blob))
+        return cls(book_names, verse_ids, columns)
+
+    def save(self, path):
+        """Write the store as a flat, mmap-friendly file"""
+        sections = [('ids', self.verse_ids)]
+        for translation, (offsets, blob) in self.columns.items():
+            sections.append((f'{translation}.offsets', offsets))
+            sections.append((f'{translation}.text', blob))
+
+        layout = {}
+        position = 0
+        for name, data in sections:
+            size = memoryview(data).nbytes
+            layout[name] = [position, size]
+            position += size + _padding(size)
+
+        header = json.dumps({
+            'byteorder': sys.byteorder,
+            'book_names': {str(b): n for b, n in self.book_names.items()},
+            'translations': list(self.translations),
+            'sections': layout,
+        }).encode('utf-8')
+
+        with open(path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, len(header)))
+            f.write(header)
+            f.write(b'\0' * _padding(_HEADER.size + len(header)))
+            for name, data in sections:
+                raw = memoryview(data).cast('B')
+                f.write(raw)
+                f.write(b'\0' * _padding(raw.nbytes))
+
+    @classmethod
+    def load(cls, path):
+        """Map a file written by ``save`` without copying it into the heap"""
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_size = _HEADER.unpack_from(mapping, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a verse store file")
+        header = json.loads(mapping[_HEADER.size:_HEADER.size + header_size])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {header['byteorder']}-endian machine")
+
+        data_start = _HEADER.size + header_size
+        data_start += _padding(data_start)
+        view = memoryview(mapping)
+
+        def section(name, fmt):
+            offset, size = header['sections'][name]
+            return view[data_start + offset:data_start + offset + size].cast(fmt)
+
+        columns = {
+            translation: (section(f'{translation}.offsets', 'I'), section(f'{translation}.text', 'B'))
+            for translation in header['translations']
+        }
+        return cls(header['book_names'], section('ids', 'i'), columns, mapping=mapping)
+
+    def has_translation(self, translation):
+        return translation.lower() in self.columns
+
+    def _row(self, book, chapter, verse):
+        span = self.chapter_index.get((book, chapter))
+        if span is None:
+            return None
+        start, end = span
+        verse_id = pack_verse_id(book, chapter, verse)
+        # Chapters are almost always contiguous, so guess the row directly
+        row = start + verse - self.verse_ids[start] % 1000
+        if start <= row < end and self.verse_ids[row] == verse_id:
+            return row
+        row = bisect.bisect_left(self.verse_ids, verse_id, start, end)
+        if row < end and self.verse_ids[row] == verse_id:
+            return row
+        return None
+
+    def _text(self, row, translation):
+        offsets, blob = self.columns[translation]
+        start, end = offsets[row], offsets[row + 1]
+        if start == end:
+            return None
+        return str(blob[start:end], 'utf-8')
+
+    def _payload(self, row, translation):
+        text = self._text(row, translation)
+        if text is None:
+            return None
+        verse_id = self.verse_ids[row]
+        book_name = self.book_names.get(verse_id // 1000000)
+        return {
+            'reference': f"{book_name} {verse_id // 1000 % 1000}:{verse_id % 1000}",
+            'text': text,
+            'translation': translation.upper()
+        }
+
+    def get_verse(self, book, chapter, verse, translation='kjv'):
+        """Get a single verse by book id"""
+        translation = translation.lower()
+        if translation not in self.columns:
+            return None
+        row = self._row(int(book), int(chapter), int(verse))
+        if row is None:
+            return None
+        return self._payload(row, translation)
+
+    def get_verse_range(self, book, chapter, start_verse, end_verse, translation='kjv'):
+        """Get a range of verses within one chapter by book id"""
+        translation = translation.lower()
+        span = self.chapter_index.get((int(book), int(chapter)))
+        if span is None or translation not in self.columns:
+            return []
+        start, end = span
+        lo = bisect.bisect_left(self.verse_ids, pack_verse_id(int(book), int(chapter), int(start_verse)), start, end)
+        hi = bisect.bisect_right(self.verse_ids, pack_verse_id(int(book), int(chapter), int(end_verse)), start, end)
+        verses = (self._payload(row, translation) for row in range(lo, hi))
+        return [v for v in verses if v]
+
+    def find_passage(self, book, chapter, start_verse=None, end_verse=None, translations=DEFAULT_TRANSLATIONS):
+        """Verses start..end (the whole chapter if start_verse is None) from the
+        first translation that has any of them -> (translation, verses)
+        """
+        span = self.chapter_index.get((int(book), int(chapter)))
+        if span is None:
+            return None, []
+        lo, hi = span
+        if start_verse is not None:
+            end_verse = end_verse or start_verse
+            lo = bisect.bisect_left(self.verse_ids, pack_verse_id(int(book), int(chapter), int(start_verse)), lo, hi)
+            hi = bisect.bisect_right(self.verse_ids, pack_verse_id(int(book), int(chapter), int(end_verse)), lo, hi)
+        for translation in translations:
+            translation = translation.lower()
+            if translation in self.columns:
+                verses = [v for v in (self._payload(row, translation) for row in range(lo, hi)) if v]
+                if verses:
+                    return translation.upper(), verses
+        return None, []
+
+    def find_verse(self, book, chapter, verse, translations=DEFAULT_TRANSLATIONS):
+        """Return the verse from the first translation that has it"""
+        row = self._row(int(book), int(chapter), int(verse))
+        if row is None:
+            return None
+        for translation in translations:
+            translation = translation.lower()
+            if translation in self.columns:
+                payload = self._payload(row, translation)
+                if payload:
+                    return payload
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a prebuilt verse store file")
+    parser.add_argument('--db', default=os.path.join(os.path.dirname(__file__), 'bible-sqlite.db'))
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(__file__), 'verses.bvs'))
+    parser.add_argument('--translations', default=','.join(DEFAULT_TRANSLATIONS))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    store = VerseStore.from_database(args.db, args.translations.split(','))
+    store.save(args.out)
+    print(f"Wrote {len(store.verse_ids)} verses x {len(store.translations)} translations "
+          f"to {args.out} ({os.path.getsize(args.out) / 1e6:.1f} MB) in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
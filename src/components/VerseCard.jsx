@@ -6,12 +6,12 @@ import { io } from "socket.io-client";
 const VerseCard = ({ onTranscriptionData }) => {
   const [isListening, setIsListening] = useState(false);
   const socketRef = useRef(null);
-  const mediaRecorderRef = useRef(null);
+  const audioCaptureRef = useRef(null);
   const [error, setError] = useState(null);
 
   useEffect(() => {
     // Connect to WebSocket server
-    socketRef.current = io('http://localhost:5001');
+    socketRef.current = io('http://localhost:5001', { transports: ['websocket'] });
 
     socketRef.current.on('connect', () => {
       console.log('Connected to server');
@@ -28,6 +28,11 @@ const VerseCard = ({ onTranscriptionData }) => {
       onTranscriptionData(data);  // Pass both transcript and verses to parent
     });
 
+    // In-progress text for the current utterance; verses arrive with the final transcript
+    socketRef.current.on('transcription_partial', (data) => {
+      onTranscriptionData({ text: data.text });
+    });
+
     return () => {
       if (socketRef.current) {
         socketRef.current.disconnect();
@@ -38,23 +43,28 @@ const VerseCard = ({ onTranscriptionData }) => {
   const startRecording = async () => {
     try {
       const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-      mediaRecorderRef.current = new MediaRecorder(stream, {
-        mimeType: 'audio/webm;codecs=opus'
-      });
-
-      mediaRecorderRef.current.ondataavailable = (event) => {
-        if (event.data.size > 0) {
-          const reader = new FileReader();
-          reader.onloadend = () => {
-            if (socketRef.current && socketRef.current.connected) {
-              socketRef.current.emit('audio_data', reader.result);
-            }
-          };
-          reader.readAsDataURL(event.data);
+      // Capture raw PCM at 16kHz (the browser may pick another rate; the server resamples)
+      const audioContext = new AudioContext({ sampleRate: 16000 });
+      const source = audioContext.createMediaStreamSource(stream);
+      const processor = audioContext.createScriptProcessor(4096, 1, 1);
+
+      processor.onaudioprocess = (event) => {
+        if (!socketRef.current || !socketRef.current.connected) {
+          return;
+        }
+        const input = event.inputBuffer.getChannelData(0);
+        const pcm = new Int16Array(input.length);
+        for (let i = 0; i < input.length; i++) {
+          const sample = Math.max(-1, Math.min(1, input[i]));
+          pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
         }
+        // Sent as a binary attachment, no base64 encoding
+        socketRef.current.emit('audio_pcm', { pcm: pcm.buffer, sample_rate: audioContext.sampleRate });
       };
 
-      mediaRecorderRef.current.start(1000); // Send chunks every second
+      source.connect(processor);
+      processor.connect(audioContext.destination);
+      audioCaptureRef.current = { stream, audioContext, source, processor };
       setIsListening(true);
       setError(null);
     } catch (err) {
@@ -64,9 +74,13 @@ const VerseCard = ({ onTranscriptionData }) => {
   };
 
   const stopRecording = () => {
-    if (mediaRecorderRef.current && mediaRecorderRef.current.state === 'recording') {
-      mediaRecorderRef.current.stop();
-      mediaRecorderRef.current.stream.getTracks().forEach(track => track.stop());
+    if (audioCaptureRef.current) {
+      const { stream, audioContext, source, processor } = audioCaptureRef.current;
+      processor.disconnect();
+      source.disconnect();
+      audioContext.close();
+      stream.getTracks().forEach(track => track.stop());
+      audioCaptureRef.current = null;
     }
     setIsListening(false);
   };